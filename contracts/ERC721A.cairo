@@ -0,0 +1,404 @@
+# Consecutive batch minting on top of openzeppelin/token/erc721/library.cairo, after ERC721A
+#
+# Tokens are minted in order in runs. A run only records its owner at the first token id and
+# leaves ERC721_owners empty for the rest, so ownership is resolved by scanning back to the
+# start of the run. Transferring or burning a token writes the owner of the token after it,
+# splitting the run so the tokens around it keep resolving to the right owner.
+#
+# Name, symbol, balances and operator approvals are shared with the openzeppelin library, so
+# ERC721_name, ERC721_symbol, ERC721_balanceOf, ERC721_isApprovedForAll and
+# ERC721_setApprovalForAll keep working unchanged.
+%lang starknet
+
+from starkware.cairo.common.cairo_builtins import HashBuiltin
+from starkware.cairo.common.math import assert_nn, assert_not_zero, assert_not_equal
+from starkware.cairo.common.math_cmp import is_le
+from starkware.starknet.common.syscalls import get_caller_address
+from starkware.cairo.common.uint256 import Uint256, uint256_check
+
+from openzeppelin.security.safemath import (
+    uint256_checked_add,
+    uint256_checked_sub_le
+)
+from openzeppelin.token.erc721.library import (
+    Transfer,
+    Approval,
+    ERC721_owners,
+    ERC721_balances,
+    ERC721_token_approvals,
+    ERC721_token_uri,
+    ERC721_isApprovedForAll,
+    _check_onERC721Received
+)
+from openzeppelin.utils.constants import TRUE, FALSE
+
+# Owner recorded for burned tokens: it is not an account, and stops the scan of later tokens
+const ERC721A_BURNED = -1
+
+#
+# Storage
+#
+
+# id of the next token to be minted, every id below it has been minted
+@storage_var
+func ERC721A_next_token_id_() -> (token_id: felt):
+end
+
+#
+# Getters
+#
+
+func ERC721A_next_token_id{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }() -> (token_id: felt):
+    let (token_id) = ERC721A_next_token_id_.read()
+    return (token_id)
+end
+
+func ERC721A_ownerOf{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: Uint256) -> (owner: felt):
+    uint256_check(token_id)
+    let (owner) = ERC721A__owner_or_zero(token_id)
+    # Ensuring the query is not for nonexistent token
+    assert_not_zero(owner)
+    return (owner)
+end
+
+func ERC721A_getApproved{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: Uint256) -> (approved: felt):
+    ERC721A_ownerOf(token_id)
+    let (approved) = ERC721_token_approvals.read(token_id)
+    return (approved)
+end
+
+func ERC721A_tokenURI{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: Uint256) -> (token_uri: felt):
+    ERC721A_ownerOf(token_id)
+
+    # if tokenURI is not set, it will return 0
+    let (token_uri) = ERC721_token_uri.read(token_id)
+    return (token_uri)
+end
+
+#
+# Externals
+#
+
+func ERC721A_approve{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(to: felt, token_id: Uint256):
+    alloc_locals
+    # Checks caller is not zero address
+    let (local caller) = get_caller_address()
+    assert_not_zero(caller)
+
+    # Ensures 'owner' does not equal 'to'
+    let (local owner) = ERC721A_ownerOf(token_id)
+    assert_not_equal(owner, to)
+
+    # Checks that either caller equals owner or
+    # caller isApprovedForAll on behalf of owner
+    if caller == owner:
+        ERC721A__approve(owner, to, token_id)
+        return ()
+    else:
+        let (is_approved) = ERC721_isApprovedForAll(owner, caller)
+        assert_not_zero(is_approved)
+        ERC721A__approve(owner, to, token_id)
+        return ()
+    end
+end
+
+func ERC721A_transferFrom{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(_from: felt, to: felt, token_id: Uint256):
+    alloc_locals
+    let (local caller) = get_caller_address()
+    let (local owner) = ERC721A_ownerOf(token_id)
+    let (is_approved) = ERC721A__is_approved_or_owner(owner, caller, token_id)
+    assert_not_zero(caller * is_approved)
+
+    ERC721A__transfer(owner, _from, to, token_id)
+    return ()
+end
+
+func ERC721A_safeTransferFrom{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(
+        _from: felt,
+        to: felt,
+        token_id: Uint256,
+        data_len: felt,
+        data: felt*
+    ):
+    alloc_locals
+    ERC721A_transferFrom(_from, to, token_id)
+
+    let (success) = _check_onERC721Received(_from, to, token_id, data_len, data)
+    assert_not_zero(success)
+    return ()
+end
+
+# Mints quantity consecutive tokens to `to`, returning the id of the first one. Costs the same
+# number of storage writes whatever the quantity.
+func ERC721A_mint_batch{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(to: felt, quantity: felt) -> (start_id: felt):
+    alloc_locals
+    assert_not_zero(to)
+    let (local start_id) = ERC721A_next_token_id_.read()
+
+    if quantity == 0:
+        return (start_id)
+    end
+
+    # token ids must stay in the low limb of their Uint256
+    assert_nn(quantity)
+    assert_nn(start_id + quantity)
+
+    let (balance: Uint256) = ERC721_balances.read(to)
+    let (new_balance: Uint256) = uint256_checked_add(balance, Uint256(quantity, 0))
+    ERC721_balances.write(to, new_balance)
+    ERC721_owners.write(Uint256(start_id, 0), to)
+    ERC721A_next_token_id_.write(start_id + quantity)
+
+    ERC721A__emit_mints(to, start_id, quantity)
+    return (start_id)
+end
+
+# Mints a single token, which has to be the next one in order
+func ERC721A_mint{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(to: felt, token_id: Uint256):
+    uint256_check(token_id)
+    let (next_token_id) = ERC721A_next_token_id_.read()
+    with_attr error_message("ERC721A: tokens are minted in order"):
+        assert token_id = Uint256(next_token_id, 0)
+    end
+
+    ERC721A_mint_batch(to, 1)
+    return ()
+end
+
+func ERC721A_burn{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(token_id: Uint256):
+    alloc_locals
+    let (local owner) = ERC721A_ownerOf(token_id)
+
+    # Clear approvals
+    ERC721A__clear_approval(owner, token_id)
+
+    # Decrease owner balance
+    let (balance: Uint256) = ERC721_balances.read(owner)
+    let (new_balance: Uint256) = uint256_checked_sub_le(balance, Uint256(1, 0))
+    ERC721_balances.write(owner, new_balance)
+
+    # Delete owner, keeping the rest of the run with the current owner
+    ERC721A__split_run(owner, token_id.low)
+    ERC721_owners.write(token_id, ERC721A_BURNED)
+    Transfer.emit(owner, 0, token_id)
+    return ()
+end
+
+func ERC721A_only_token_owner{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(token_id: Uint256):
+    alloc_locals
+    let (local caller) = get_caller_address()
+    let (owner) = ERC721A_ownerOf(token_id)
+    # Note `ERC721A_ownerOf` checks that the owner is not the zero address
+    assert caller = owner
+    return ()
+end
+
+func ERC721A_setTokenURI{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: Uint256, token_uri: felt):
+    ERC721A_ownerOf(token_id)
+    ERC721_token_uri.write(token_id, token_uri)
+    return ()
+end
+
+#
+# Internals
+#
+
+# Returns the owner of token_id, or zero if it was never minted or has been burned
+func ERC721A__owner_or_zero{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: Uint256) -> (owner: felt):
+    alloc_locals
+    if token_id.high != 0:
+        return (0)
+    end
+
+    let (next_token_id) = ERC721A_next_token_id_.read()
+    let (is_minted) = is_le(token_id.low + 1, next_token_id)
+    if is_minted == FALSE:
+        return (0)
+    end
+
+    let (owner) = ERC721A__run_owner(token_id.low)
+    if owner == ERC721A_BURNED:
+        return (0)
+    end
+    return (owner)
+end
+
+# Scans back from a minted token_id to the closest recorded owner. Every run records its first
+# token, so the scan stops at the start of the run at the latest.
+func ERC721A__run_owner{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(token_id: felt) -> (owner: felt):
+    let (owner) = ERC721_owners.read(Uint256(token_id, 0))
+    if owner != 0:
+        return (owner)
+    end
+    return ERC721A__run_owner(token_id - 1)
+end
+
+# Records owner for the token after token_id if it was resolved through token_id, so it keeps
+# its owner once token_id changes hands
+func ERC721A__split_run{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(owner: felt, token_id: felt):
+    alloc_locals
+    local next = token_id + 1
+    let (next_token_id) = ERC721A_next_token_id_.read()
+    if next == next_token_id:
+        return ()
+    end
+
+    let (next_owner) = ERC721_owners.read(Uint256(next, 0))
+    if next_owner == 0:
+        ERC721_owners.write(Uint256(next, 0), owner)
+        return ()
+    end
+    return ()
+end
+
+func ERC721A__emit_mints{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(to: felt, token_id: felt, quantity: felt):
+    if quantity == 0:
+        return ()
+    end
+
+    Transfer.emit(0, to, Uint256(token_id, 0))
+    return ERC721A__emit_mints(to, token_id + 1, quantity - 1)
+end
+
+func ERC721A__approve{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(owner: felt, to: felt, token_id: Uint256):
+    ERC721_token_approvals.write(token_id, to)
+    Approval.emit(owner, to, token_id)
+    return ()
+end
+
+# Clears the approval of token_id, skipping the write when there is none
+func ERC721A__clear_approval{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(owner: felt, token_id: Uint256):
+    let (approved) = ERC721_token_approvals.read(token_id)
+    if approved == 0:
+        return ()
+    end
+
+    ERC721A__approve(owner, 0, token_id)
+    return ()
+end
+
+func ERC721A__is_approved_or_owner{
+        pedersen_ptr: HashBuiltin*,
+        syscall_ptr: felt*,
+        range_check_ptr
+    }(owner: felt, spender: felt, token_id: Uint256) -> (res: felt):
+    alloc_locals
+    if owner == spender:
+        return (TRUE)
+    end
+
+    let (approved_addr) = ERC721_token_approvals.read(token_id)
+    if approved_addr == spender:
+        return (TRUE)
+    end
+
+    let (is_operator) = ERC721_isApprovedForAll(owner, spender)
+    if is_operator == TRUE:
+        return (TRUE)
+    end
+
+    return (FALSE)
+end
+
+func ERC721A__transfer{
+        syscall_ptr: felt*,
+        pedersen_ptr: HashBuiltin*,
+        range_check_ptr
+    }(owner: felt, _from: felt, to: felt, token_id: Uint256):
+    alloc_locals
+    # owner comes from ERC721A_ownerOf, so '_from' is not the zero address
+    assert owner = _from
+
+    assert_not_zero(to)
+
+    # Clear approvals
+    ERC721A__clear_approval(_from, token_id)
+
+    # Decrease owner balance
+    let (owner_bal) = ERC721_balances.read(_from)
+    let (new_balance: Uint256) = uint256_checked_sub_le(owner_bal, Uint256(1, 0))
+    ERC721_balances.write(_from, new_balance)
+
+    # Increase receiver balance
+    let (receiver_bal) = ERC721_balances.read(to)
+    let (new_balance: Uint256) = uint256_checked_add(receiver_bal, Uint256(1, 0))
+    ERC721_balances.write(to, new_balance)
+
+    # Update token_id owner, keeping the rest of the run with '_from'
+    ERC721A__split_run(_from, token_id.low)
+    ERC721_owners.write(token_id, to)
+    Transfer.emit(_from, to, token_id)
+    return ()
+end
@@ -0,0 +1,201 @@
+# Helpers shared by the discrete and continuous GDA
+%lang starknet
+
+from starkware.cairo.common.math import abs_value, assert_nn_le
+from starkware.cairo.common.math_cmp import is_in_range, is_le, is_le_felt
+from starkware.cairo.common.uint256 import Uint256
+
+from openzeppelin.utils.constants import FALSE, TRUE
+
+from contracts.Math64x61 import (
+    Math64x61_add,
+    Math64x61_div,
+    Math64x61_exp,
+    Math64x61_exp_fast,
+    Math64x61_ln,
+    Math64x61_ln_fast,
+    Math64x61_min,
+    Math64x61_mul,
+    Math64x61_sub,
+    Math64x61_toFelt,
+    Math64x61_toUint256,
+    Math64x61_BOUND,
+    Math64x61_FRACT_PART,
+    Math64x61_ONE
+)
+
+# Precision tiers a GDA chooses at deployment for its exp and ln. GDA_FAST evaluates them with
+# the reduced-degree Math64x61_exp_fast and Math64x61_ln_fast, which are cheaper but only good to
+# about 1e-4 relative error.
+const GDA_PRECISE = 0
+const GDA_FAST = 1
+
+# Largest price a quote returns, Math64x61_div reverts on anything larger
+const GDA_MAX_PRICE = Math64x61_BOUND - 1
+
+# Largest divisor signed_div_rem accepts, PRIME // 2^128
+const GDA_MAX_DIVISOR = 2 ** 123 + 17 * 2 ** 64
+
+func GDA_assert_precision{range_check_ptr}(precision: felt):
+    with_attr error_message("unknown precision tier"):
+        assert_nn_le(precision, GDA_FAST)
+    end
+    return ()
+end
+
+func GDA_exp{range_check_ptr}(x: felt, precision: felt) -> (res: felt):
+    if precision == GDA_FAST:
+        return Math64x61_exp_fast(x)
+    end
+    return Math64x61_exp(x)
+end
+
+func GDA_ln{range_check_ptr}(x: felt, precision: felt) -> (res: felt):
+    if precision == GDA_FAST:
+        return Math64x61_ln_fast(x)
+    end
+    return Math64x61_ln(x)
+end
+
+# Both GDAs price a purchase as numerator(quantity) / denominator(time). Fills prices with the
+# flattened numerators_len x denominators_len matrix, one row per numerator, so each term is
+# computed once for the whole grid.
+func GDA_price_grid{range_check_ptr}(
+        numerators_len: felt, numerators: felt*, denominators_len: felt, denominators: felt*,
+        prices: Uint256*):
+    if numerators_len == 0:
+        return ()
+    end
+
+    GDA__price_row(numerators[0], denominators_len, denominators, prices)
+    return GDA_price_grid(
+        numerators_len=numerators_len - 1,
+        numerators=numerators + 1,
+        denominators_len=denominators_len,
+        denominators=denominators,
+        prices=prices + denominators_len * Uint256.SIZE)
+end
+
+func GDA__price_row{range_check_ptr}(
+        numerator: felt, denominators_len: felt, denominators: felt*, prices: Uint256*):
+    if denominators_len == 0:
+        return ()
+    end
+
+    let (price) = Math64x61_div(numerator, denominators[0])
+    let (price_uint) = Math64x61_toUint256(price)
+    assert prices[0] = price_uint
+    return GDA__price_row(numerator, denominators_len - 1, denominators + 1, prices + Uint256.SIZE)
+end
+
+# Inverts price = coefficient * (e^(rate * quantity) - 1) / denominator, the shape both cumulative
+# price formulas take, for the quantity a budget affords:
+#     quantity = ln(1 + budget * denominator / coefficient) / rate
+# Returns it truncated to an integer. The fixed point rounding can leave it a token or so off, so
+# callers settle it against their exact price.
+func GDA_quantity_estimate{range_check_ptr}(
+        budget: felt, coefficient: felt, denominator: felt, rate: felt, precision: felt) -> (
+        res: felt):
+    alloc_locals
+    # no price exceeds GDA_MAX_PRICE / denominator, its numerator would leave the 64.61 range.
+    # The division fits for denominators from one up to GDA_MAX_DIVISOR.
+    let (bound_fits) = is_in_range(denominator, Math64x61_ONE, GDA_MAX_DIVISOR + 1)
+    if bound_fits == TRUE:
+        let (bound) = Math64x61_div(GDA_MAX_PRICE, denominator)
+        tempvar price_bound = bound
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        tempvar price_bound = GDA_MAX_PRICE
+        tempvar range_check_ptr = range_check_ptr
+    end
+    let (spendable) = Math64x61_min(budget, price_bound)
+    let (ln_growth) = GDA__ln_growth(spendable, coefficient, denominator, precision)
+    let (quantity) = Math64x61_div(ln_growth, rate)
+    let (res) = Math64x61_toFelt(quantity)
+    return (res)
+end
+
+# ln(1 + budget * denominator / coefficient), from the logarithm of each term when an
+# intermediate leaves the 64.61 range
+func GDA__ln_growth{range_check_ptr}(
+        budget: felt, coefficient: felt, denominator: felt, precision: felt) -> (res: felt):
+    alloc_locals
+    let (ratio_fits) = GDA_div_fits(budget, coefficient)
+    if ratio_fits == FALSE:
+        return GDA__ln_growth_of_terms(budget, coefficient, denominator, precision)
+    end
+    let (local ratio) = Math64x61_div(budget, coefficient)
+    let (scaled_fits) = GDA_mul_fits(ratio, denominator)
+    if scaled_fits == FALSE:
+        return GDA__ln_growth_of_terms(budget, coefficient, denominator, precision)
+    end
+    let (local scaled) = Math64x61_mul(ratio, denominator)
+    let (growth_fits) = is_le(scaled, Math64x61_BOUND - Math64x61_ONE)
+    if growth_fits == FALSE:
+        return GDA__ln_growth_of_terms(budget, coefficient, denominator, precision)
+    end
+    let (growth) = Math64x61_add(scaled, Math64x61_ONE)
+    return GDA_ln(growth, precision)
+end
+
+# ln(budget) + ln(denominator) - ln(coefficient), close to ln(1 + budget * denominator /
+# coefficient) whenever the ratio is too large to represent
+func GDA__ln_growth_of_terms{range_check_ptr}(
+        budget: felt, coefficient: felt, denominator: felt, precision: felt) -> (res: felt):
+    alloc_locals
+    let (local ln_budget) = GDA_ln(budget, precision)
+    let (local ln_denominator) = GDA_ln(denominator, precision)
+    let (ln_coefficient) = GDA_ln(coefficient, precision)
+    let (ln_scaled) = Math64x61_add(ln_budget, ln_denominator)
+    return Math64x61_sub(ln_scaled, ln_coefficient)
+end
+
+# Returns TRUE if Math64x61_mul(x, y) stays in the 64.61 range, where it does not revert. Both
+# factors must be at least -1, as the GDA factors are.
+func GDA_mul_fits{range_check_ptr}(x: felt, y: felt) -> (res: felt):
+    # factors summing to at most 2^93 always fit, which spares most calls the felt comparison
+    let (small) = is_le(x + y, 2 ** 93)
+    if small == TRUE:
+        return (TRUE)
+    end
+    # the product must be in [-2^186, 2^186), shifted here to [0, 2^187)
+    let bound = Math64x61_BOUND * Math64x61_FRACT_PART
+    let (res) = is_le_felt(x * y + bound, 2 * bound - 1)
+    return (res)
+end
+
+# Returns TRUE if Math64x61_div(x, y) stays in the 64.61 range, where it does not revert
+func GDA_div_fits{range_check_ptr}(x: felt, y: felt) -> (res: felt):
+    alloc_locals
+    # |x| up to 2^92 over y from 2^29 to 2^123 always fits
+    let (local x_small) = is_in_range(x, -2 ** 92, 2 ** 92 + 1)
+    let (y_moderate) = is_in_range(y, 2 ** 29, 2 ** 123 + 1)
+    if x_small * y_moderate == TRUE:
+        return (TRUE)
+    end
+    if y == 0:
+        return (FALSE)
+    end
+    let (local divisor) = abs_value(y)
+    let (divisor_fits) = is_le(divisor, GDA_MAX_DIVISOR)
+    if divisor_fits == FALSE:
+        return (FALSE)
+    end
+    # x * 2^61 / divisor must be in [-2^125, 2^125), shifted here to [0, 2^126)
+    let bound = Math64x61_BOUND * divisor
+    let (res) = is_le_felt(x * Math64x61_FRACT_PART + bound, 2 * bound - 1)
+    return (res)
+end
+
+# Returns TRUE if numerator / denominator is a price within the budget, and FALSE when it is
+# not or when the division would revert
+func GDA_price_within{range_check_ptr}(
+        numerator: felt, denominator: felt, budget: felt) -> (res: felt):
+    let (fits) = GDA_div_fits(numerator, denominator)
+    if fits == FALSE:
+        return (FALSE)
+    end
+    let (price) = Math64x61_div(numerator, denominator)
+    let (res) = is_le(price, budget)
+    return (res)
+end
@@ -1,9 +1,9 @@
 # https://github.com/influenceth/cairo-math-64x61
 %lang starknet
 
+from starkware.cairo.common.registers import get_label_location
 from starkware.cairo.common.uint256 import Uint256
 from starkware.cairo.common.math_cmp import is_le, is_not_zero
-from starkware.cairo.common.pow import pow
 from starkware.cairo.common.math import (
     assert_le,
     assert_lt,
@@ -189,21 +189,47 @@ func Math64x61_sqrt {range_check_ptr} (x: felt) -> (res: felt):
 end
 
 # Calculates the most significant bit where x is a fixed point value
-# TODO: use binary search to improve performance
 func Math64x61__msb {range_check_ptr} (x: felt) -> (res: felt):
+    let (res, _) = Math64x61__msb_pow2(x)
+    return (res)
+end
+
+# Calculates the most significant bit where x is a fixed point value (the number of
+# halvings that bring x down to at most Math64x61_FRACT_PART) along with 2^msb
+func Math64x61__msb_pow2 {range_check_ptr} (x: felt) -> (res: felt, pow2: felt):
     alloc_locals
 
     let (cmp) = is_le(x, Math64x61_FRACT_PART)
 
     if cmp == 1:
-        return (0)
+        return (0, 1)
     end
 
-    let (div, _) = unsigned_div_rem(x, 2)
-    let (rest) = Math64x61__msb(div)
-    local res = 1 + rest
-    Math64x61_assert64x61(res)
-    return (res)
+    # msb(x) = 1 + msb(x / 2), where x / 2 < 2^128 needs at most 67 more halvings,
+    # so a binary search over 64, 32, ..., 1 covers it
+    let (local half, _) = unsigned_div_rem(x, 2)
+    let (res, pow2) = Math64x61__msb_step(half, 0, 1, 64, 2 ** 63)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 32, 2 ** 31)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 16, 2 ** 15)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 8, 2 ** 7)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 4, 2 ** 3)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 2, 2 ** 1)
+    let (res, pow2) = Math64x61__msb_step(half, res, pow2, 1, 2 ** 0)
+    return (res + 1, pow2 * 2)
+end
+
+# Binary search step of Math64x61__msb_pow2: adds shift to res if x still exceeds
+# Math64x61_FRACT_PART after res + shift - 1 halvings, i.e. x >= (FRACT_PART + 1) * 2^(res + shift - 1)
+# pow2 is 2^res and half_shift_pow2 is 2^(shift - 1)
+func Math64x61__msb_step {range_check_ptr} (
+        x: felt, res: felt, pow2: felt, shift: felt, half_shift_pow2: felt) -> (res: felt, pow2: felt):
+    let (exceeds) = is_le((Math64x61_FRACT_PART + 1) * pow2 * half_shift_pow2, x)
+
+    if exceeds == 1:
+        return (res + shift, pow2 * half_shift_pow2 * 2)
+    end
+
+    return (res, pow2)
 end
 
 # Calculates the binary exponent of x: 2^x
@@ -218,26 +244,43 @@ func Math64x61_exp2 {range_check_ptr} (x: felt) -> (res: felt):
 
     let (exp_value) = abs_value(x)
     let (int_part, frac_part) = unsigned_div_rem(exp_value, Math64x61_FRACT_PART)
-    let (int_res) = Math64x61__pow_int(2 * Math64x61_ONE, int_part)
+    let (int_res) = Math64x61__pow2(int_part)
+    let (frac_res) = Math64x61__exp2_frac(frac_part)
 
-    # 1.069e-7 maximum error
-    const a1 = 2305842762765193127
-    const a2 = 1598306039479152907
-    const a3 = 553724477747739017
-    const a4 = 128818789015678071
-    const a5 = 20620759886412153
-    const a6 = 4372943086487302
+    # 2^int_part is exact, so scaling by it is a plain product
+    let res_u = frac_res * int_res
+
+    if exp_sign == -1:
+        Math64x61_assert64x61(res_u)
+        let (res_i) = Math64x61_div(Math64x61_ONE, res_u)
+        Math64x61_assert64x61(res_i)
+        return (res_i)
+    else:
+        Math64x61_assert64x61(res_u)
+        return (res_u)
+    end
+end
+
+# Calculates 2^x like Math64x61_exp2, with the error of Math64x61__exp2_frac_fast
+func Math64x61_exp2_fast {range_check_ptr} (x: felt) -> (res: felt):
+    alloc_locals
+
+    let (exp_sign) = sign(x)
+
+    if exp_sign == 0:
+        return (Math64x61_ONE)
+    end
+
+    let (exp_value) = abs_value(x)
+    let (int_part, frac_part) = unsigned_div_rem(exp_value, Math64x61_FRACT_PART)
+    let (int_res) = Math64x61__pow2(int_part)
+    let (frac_res) = Math64x61__exp2_frac_fast(frac_part)
 
-    let (r6) = Math64x61_mul(a6, frac_part)
-    let (r5) = Math64x61_mul(r6 + a5, frac_part)
-    let (r4) = Math64x61_mul(r5 + a4, frac_part)
-    let (r3) = Math64x61_mul(r4 + a3, frac_part)
-    let (r2) = Math64x61_mul(r3 + a2, frac_part)
-    tempvar frac_res = r2 + a1
+    # 2^int_part is exact, so scaling by it is a plain product
+    let res_u = frac_res * int_res
 
-    let (res_u) = Math64x61_mul(int_res, frac_res)
-    
     if exp_sign == -1:
+        Math64x61_assert64x61(res_u)
         let (res_i) = Math64x61_div(Math64x61_ONE, res_u)
         Math64x61_assert64x61(res_i)
         return (res_i)
@@ -247,6 +290,114 @@ func Math64x61_exp2 {range_check_ptr} (x: felt) -> (res: felt):
     end
 end
 
+# Calculates 2^x for 0 <= x < 1
+# 1.069e-7 maximum error
+func Math64x61__exp2_frac {range_check_ptr} (x: felt) -> (res: felt):
+    const a1 = 2305842762765193127
+    const a2 = 1598306039479152907
+    const a3 = 553724477747739017
+    const a4 = 128818789015678071
+    const a5 = 20620759886412153
+    const a6 = 4372943086487302
+
+    # Every term is non-negative and below 2^62, so the products are floored directly
+    # without the bounds checks of Math64x61_mul
+    let (r6, _) = unsigned_div_rem(a6 * x, Math64x61_FRACT_PART)
+    let (r5, _) = unsigned_div_rem((r6 + a5) * x, Math64x61_FRACT_PART)
+    let (r4, _) = unsigned_div_rem((r5 + a4) * x, Math64x61_FRACT_PART)
+    let (r3, _) = unsigned_div_rem((r4 + a3) * x, Math64x61_FRACT_PART)
+    let (r2, _) = unsigned_div_rem((r3 + a2) * x, Math64x61_FRACT_PART)
+    return (r2 + a1)
+end
+
+# Calculates 2^x for 0 <= x < 1 with a degree 3 polynomial, 3 products instead of 5
+# 8.56e-5 maximum relative error
+func Math64x61__exp2_frac_fast {range_check_ptr} (x: felt) -> (res: felt):
+    const a1 = Math64x61_ONE
+    const a2 = 1602830185465230848
+    const a3 = 524913604169254912
+    const a4 = 177704504465444928
+
+    let (r4, _) = unsigned_div_rem(a4 * x, Math64x61_FRACT_PART)
+    let (r3, _) = unsigned_div_rem((r4 + a3) * x, Math64x61_FRACT_PART)
+    let (r2, _) = unsigned_div_rem((r3 + a2) * x, Math64x61_FRACT_PART)
+    return (r2 + a1)
+end
+
+# Looks up 2^n for 0 <= n <= 64. 2^64 * ONE is the largest power of two a 64.61 value holds.
+func Math64x61__pow2 {range_check_ptr} (n: felt) -> (res: felt):
+    assert_le(n, 64)
+    let (table) = get_label_location(pow2_table)
+    return ([table + n])
+
+    pow2_table:
+    dw 1
+    dw 2
+    dw 4
+    dw 8
+    dw 16
+    dw 32
+    dw 64
+    dw 128
+    dw 256
+    dw 512
+    dw 1024
+    dw 2048
+    dw 4096
+    dw 8192
+    dw 16384
+    dw 32768
+    dw 65536
+    dw 131072
+    dw 262144
+    dw 524288
+    dw 1048576
+    dw 2097152
+    dw 4194304
+    dw 8388608
+    dw 16777216
+    dw 33554432
+    dw 67108864
+    dw 134217728
+    dw 268435456
+    dw 536870912
+    dw 1073741824
+    dw 2147483648
+    dw 4294967296
+    dw 8589934592
+    dw 17179869184
+    dw 34359738368
+    dw 68719476736
+    dw 137438953472
+    dw 274877906944
+    dw 549755813888
+    dw 1099511627776
+    dw 2199023255552
+    dw 4398046511104
+    dw 8796093022208
+    dw 17592186044416
+    dw 35184372088832
+    dw 70368744177664
+    dw 140737488355328
+    dw 281474976710656
+    dw 562949953421312
+    dw 1125899906842624
+    dw 2251799813685248
+    dw 4503599627370496
+    dw 9007199254740992
+    dw 18014398509481984
+    dw 36028797018963968
+    dw 72057594037927936
+    dw 144115188075855872
+    dw 288230376151711744
+    dw 576460752303423488
+    dw 1152921504606846976
+    dw 2305843009213693952
+    dw 4611686018427387904
+    dw 9223372036854775808
+    dw 18446744073709551616
+end
+
 # Calculates the natural exponent of x: e^x
 func Math64x61_exp {range_check_ptr} (x: felt) -> (res: felt):
     const mod = 3326628274461080623
@@ -255,6 +406,14 @@ func Math64x61_exp {range_check_ptr} (x: felt) -> (res: felt):
     return (res)
 end
 
+# Calculates e^x like Math64x61_exp, with the error of Math64x61__exp2_frac_fast
+func Math64x61_exp_fast {range_check_ptr} (x: felt) -> (res: felt):
+    const mod = 3326628274461080623
+    let (bin_exp) = Math64x61_mul(x, mod)
+    let (res) = Math64x61_exp2_fast(bin_exp)
+    return (res)
+end
+
 # Calculates the binary logarithm of x: log2(x)
 # x must be greather than zero
 func Math64x61_log2 {range_check_ptr} (x: felt) -> (res: felt):
@@ -273,9 +432,9 @@ func Math64x61_log2 {range_check_ptr} (x: felt) -> (res: felt):
         return (-res_i)
     end
 
+    # normalize x into [1, 2) using the power of two found alongside the msb
     let (x_over_two, _) = unsigned_div_rem(x, 2)
-    let (b) = Math64x61__msb(x_over_two)
-    let (divisor) = pow(2, b)
+    let (b, divisor) = Math64x61__msb_pow2(x_over_two)
     let (norm, _) = unsigned_div_rem(x, divisor)
 
     # 4.233e-8 maximum error
@@ -305,6 +464,48 @@ func Math64x61_log2 {range_check_ptr} (x: felt) -> (res: felt):
     return (res)
 end
 
+# Calculates log2(x) like Math64x61_log2 with a degree 5 polynomial, 5 products instead of 8
+# 1.431e-5 maximum absolute error
+func Math64x61_log2_fast {range_check_ptr} (x: felt) -> (res: felt):
+    alloc_locals
+
+    if x == Math64x61_ONE:
+        return (0)
+    end
+
+    let (is_frac) = is_le(x, Math64x61_FRACT_PART - 1)
+
+    if is_frac == 1:
+        let (div) = Math64x61_div(Math64x61_ONE, x)
+        let (res_i) = Math64x61_log2_fast(div)
+        return (-res_i)
+    end
+
+    # normalize x into [1, 2) using the power of two found alongside the msb
+    let (x_over_two, _) = unsigned_div_rem(x, 2)
+    let (b, divisor) = Math64x61__msb_pow2(x_over_two)
+    let (norm, _) = unsigned_div_rem(x, divisor)
+
+    # log2(1 + t) for t = norm - 1 in [0, 1), which has no constant term
+    const a1 = 3324946331086716928
+    const a2 = -1636371000395437568
+    const a3 = 962910146217672704
+    const a4 = -452566759828511616
+    const a5 = 106957270518356096
+
+    local t = norm - Math64x61_ONE
+    let (r5) = Math64x61_mul(a5, t)
+    let (r4) = Math64x61_mul(r5 + a4, t)
+    let (r3) = Math64x61_mul(r4 + a3, t)
+    let (r2) = Math64x61_mul(r3 + a2, t)
+    let (norm_res) = Math64x61_mul(r2 + a1, t)
+
+    let (int_part) = Math64x61_fromFelt(b)
+    local res = int_part + norm_res
+    Math64x61_assert64x61(res)
+    return (res)
+end
+
 # Calculates the natural logarithm of x: ln(x)
 # x must be greater than zero
 func Math64x61_ln {range_check_ptr} (x: felt) -> (res: felt):
@@ -314,6 +515,14 @@ func Math64x61_ln {range_check_ptr} (x: felt) -> (res: felt):
     return (product)
 end
 
+# Calculates ln(x) like Math64x61_ln, with the error of Math64x61_log2_fast
+func Math64x61_ln_fast {range_check_ptr} (x: felt) -> (res: felt):
+    const ln_2 = 1598288580650331957
+    let (log2_x) = Math64x61_log2_fast(x)
+    let (product) = Math64x61_mul(log2_x, ln_2)
+    return (product)
+end
+
 # Calculates the base 10 log of x: log10(x)
 # x must be greater than zero
 func Math64x61_log10 {range_check_ptr} (x: felt) -> (res: felt):
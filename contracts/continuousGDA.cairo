@@ -3,6 +3,7 @@
 
 %lang starknet
 
+from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.uint256 import (Uint256, uint256_le)
 from starkware.starknet.common.syscalls import (
@@ -39,7 +40,7 @@ from openzeppelin.access.ownable import (
     Ownable_only_owner
 )
 
-from openzeppelin.utils.constants import TRUE
+from openzeppelin.utils.constants import FALSE, TRUE
 
 from contracts.Math64x61 import ( 
     Math64x61_fromFelt, 
@@ -48,9 +49,19 @@ from contracts.Math64x61 import (
     Math64x61_mul,
     Math64x61_div,
     Math64x61_pow,
-    Math64x61_exp,
+    Math64x61_min,
     Math64x61_toUint256,
-    Math64x61_ONE
+    Math64x61_assert64x61,
+    Math64x61_ONE,
+    Math64x61_INT_PART
+)
+from contracts.GDA import (
+    GDA_assert_precision,
+    GDA_exp,
+    GDA_mul_fits,
+    GDA_price_grid,
+    GDA_price_within,
+    GDA_quantity_estimate
 )
 
 #
@@ -62,15 +73,14 @@ from contracts.Math64x61 import (
 func erc20Address() -> (res : felt):
 end
 
-# parameter that controls initial price, stored as a 59x18 fixed precision number
+# initialPrice / decayConstant, stored as a 64x61 fixed precision number
 @storage_var
-func initialPrice() -> (res : felt):
+func priceCoefficient() -> (res : felt):
 end
 
-# parameter that controls how much the starting price of each successive auction increases by,
-# stored as a 59x18 fixed precision number
+# seconds of emissions per token sold (1 / emissionRate), stored as a 64x61 fixed precision number
 @storage_var
-func emissionRate() -> (res : felt):
+func secondsPerToken() -> (res : felt):
 end
 
 # parameter that controls price decay, stored as a 59x18 fixed precision number
@@ -78,11 +88,32 @@ end
 func decayConstant() -> (res : felt):
 end
 
+# precision tier of the exp and ln in the price, GDA_PRECISE or GDA_FAST
+@storage_var
+func precisionTier() -> (res : felt):
+end
+
 # start time for all auctions, stored as a 59x18 fixed precision number
 @storage_var
 func lastAvailableAuctionStartTime() -> (res : felt):
 end
 
+#
+# Events
+#
+
+# auctionStartTime is a 64x61 fixed precision timestamp
+@event
+func AuctionCreated(
+        initialPrice: felt, emissionRate: felt, decayConstant: felt, auctionStartTime: felt):
+end
+
+# auctionStartTime is the start time of the next available auction after the purchase, i.e.
+# how far emissions have been sold
+@event
+func Purchase(buyer: felt, to: felt, quantity: felt, price: Uint256, auctionStartTime: felt):
+end
+
 @constructor
 func constructor{
         syscall_ptr: felt*, 
@@ -94,18 +125,26 @@ func constructor{
         owner: felt,
         _initialPrice: felt,
         _emissionRate: felt,
-        _decayConstant: felt
+        _decayConstant: felt,
+        _precision: felt
     ):
+    alloc_locals
     ERC20_initializer(name, symbol, 18)
     Ownable_initializer(owner)
-    # Write initial values
-    initialPrice.write(_initialPrice)
-    emissionRate.write(_emissionRate)
+    # Write initial values, along with the coefficients every quote derives from them
+    let (local price_coefficient) = Math64x61_div(_initialPrice, _decayConstant)
+    let (local seconds_per_token) = Math64x61_div(Math64x61_ONE, _emissionRate)
     decayConstant.write(_decayConstant)
+    priceCoefficient.write(price_coefficient)
+    secondsPerToken.write(seconds_per_token)
+    GDA_assert_precision(_precision)
+    precisionTier.write(_precision)
 
     let (block_timestamp) = get_block_timestamp()
     let (fixedTimestamp) = Math64x61_fromFelt(block_timestamp)
     lastAvailableAuctionStartTime.write(fixedTimestamp)
+
+    AuctionCreated.emit(_initialPrice, _emissionRate, _decayConstant, fixedTimestamp)
     return ()
 end
 
@@ -122,21 +161,13 @@ func purchaseTokens{
     ):
     alloc_locals
 
-    let (block_timestamp) = get_block_timestamp()
-    let (fixed_timestamp) = Math64x61_fromFelt(block_timestamp)
-    let (last_time) = lastAvailableAuctionStartTime.read()
-    let (emission_rate) = emissionRate.read()
-    # number of seconds of token emissions that are available to be purchased
-    let (seconds_of_emission_available) = Math64x61_sub(fixed_timestamp, last_time)
-    let (fixed_num_tokens) = Math64x61_fromFelt(numTokens)
-    # number of seconds of emissions are being purchased
-    let (seconds_of_emission_to_purchase) = Math64x61_div(numTokens, emission_rate)
-
+    let (local total_cost, local seconds_to_purchase, seconds_available,
+        local last_time) = _quote(numTokens)
     with_attr error_message("insufficient available tokens"):
-        assert_nn_le(seconds_of_emission_to_purchase, seconds_of_emission_available)
+        assert_nn_le(seconds_to_purchase, seconds_available)
     end
 
-    let (price) = purchase_price(numTokens)
+    let (local price) = Math64x61_toUint256(total_cost)
     let (is_valid_bid) = uint256_le(price, value)
     with_attr error_message("insufficient payment"):
         assert is_valid_bid = TRUE
@@ -147,9 +178,12 @@ func purchaseTokens{
     ERC20_mint(to, num_tokens)
 
     # Update last available auction
-    local new_time = last_time + seconds_of_emission_to_purchase
+    local new_time = last_time + seconds_to_purchase
     lastAvailableAuctionStartTime.write(new_time)
 
+    let (buyer) = get_caller_address()
+    Purchase.emit(buyer, to, numTokens, price, new_time)
+
 
     # Refund buyer for excess payment
     # let (buyer : felt) = get_caller_address()
@@ -172,6 +206,27 @@ func purchaseTokens{
     return ()
 end
 
+# purchase as many tokens as the budget affords and emissions allow, returning how many were
+# bought
+@external
+func purchaseForBudget{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        to: felt,
+        budget: Uint256 # Denominated in auction's configured ERC20
+    ) -> (quantity: felt):
+    alloc_locals
+
+    let (local quantity) = max_purchasable(budget)
+    with_attr error_message("budget too small"):
+        assert_not_zero(quantity)
+    end
+    purchaseTokens(quantity, to, budget)
+    return (quantity)
+end
+
 #
 # Getters
 #
@@ -182,33 +237,242 @@ func purchase_price{
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(numTokens: felt) -> (res: Uint256):
+    let (total_cost, _, _, _) = _quote(numTokens)
+    let (total_cost_uint) = Math64x61_toUint256(total_cost)
+
+    return (res=total_cost_uint)
+end
+
+# Quotes every quantity at every offset (in seconds) from the current block timestamp,
+# returning the flattened quantities_len x offsets_len price matrix with one row per quantity
+@view
+func purchase_price_batch{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        quantities_len: felt,
+        quantities: felt*,
+        offsets_len: felt,
+        offsets: felt*
+    ) -> (prices_len: felt, prices: Uint256*):
+    alloc_locals
+
+    let (local auction_start_time) = lastAvailableAuctionStartTime.read()
+    let (local block_timestamp) = get_block_timestamp()
+    let (local decay_constant) = decayConstant.read()
+    let (price_coefficient) = priceCoefficient.read()
+    let (seconds_per_token) = secondsPerToken.read()
+    let (local precision) = precisionTier.read()
+
+    let (local numerators : felt*) = alloc()
+    _price_numerators(
+        quantities_len, quantities, numerators, decay_constant, price_coefficient,
+        seconds_per_token, precision)
+    let (local denominators : felt*) = alloc()
+    _price_denominators(
+        offsets_len, offsets, denominators, block_timestamp, decay_constant, auction_start_time,
+        precision)
+
+    let (local prices : Uint256*) = alloc()
+    GDA_price_grid(quantities_len, numerators, offsets_len, denominators, prices)
+    return (quantities_len * offsets_len, prices)
+end
+
+# Largest quantity whose purchase_price fits in the budget, capped by the tokens emitted so far
+@view
+func max_purchasable{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(budget: Uint256) -> (quantity: felt):
     alloc_locals
 
-    let (quantity) = Math64x61_fromFelt(numTokens)
+    with_attr error_message("budget does not fit in 128 bits"):
+        assert budget.high = 0
+    end
     let (local auction_start_time) = lastAvailableAuctionStartTime.read()
     let (block_timestamp) = get_block_timestamp()
-    let (fixedTimestamp) = Math64x61_fromFelt(block_timestamp)
-    let (time_since_start) = Math64x61_sub(fixedTimestamp, auction_start_time)
+    let (local decay_constant) = decayConstant.read()
+    let (local price_coefficient) = priceCoefficient.read()
+    let (local seconds_per_token) = secondsPerToken.read()
+    let (local precision) = precisionTier.read()
+
+    let (fixed_timestamp) = Math64x61_fromFelt(block_timestamp)
+    let (local seconds_available) = Math64x61_sub(fixed_timestamp, auction_start_time)
+    let (local denominator) = _price_denominator(seconds_available, decay_constant, precision)
+    let (available_fixed) = Math64x61_div(seconds_available, seconds_per_token)
+    let (local available) = Math64x61_toFelt(available_fixed)
+
+    # priceCoefficient * (e^(decayConstant * secondsPerToken * n) - 1) / denominator
+    let (rate) = Math64x61_mul(decay_constant, seconds_per_token)
+    let (estimate) = GDA_quantity_estimate(
+        budget.low, price_coefficient, denominator, rate, precision)
+    let (capped) = Math64x61_min(estimate, available)
+    let (quantity) = _settle_quantity(
+        capped, available, budget.low, decay_constant, price_coefficient, seconds_per_token,
+        denominator, precision)
+    return (quantity)
+end
+
+# walks from an estimate to the largest quantity up to available whose price fits in the budget
+func _settle_quantity{range_check_ptr}(
+        quantity: felt, available: felt, budget: felt, decay_constant: felt,
+        price_coefficient: felt, seconds_per_token: felt, denominator: felt, precision: felt) -> (
+        res: felt):
+    let (affordable) = _is_affordable(
+        quantity, budget, decay_constant, price_coefficient, seconds_per_token, denominator,
+        precision)
+    if affordable == FALSE:
+        return _settle_quantity_down(
+            quantity - 1, budget, decay_constant, price_coefficient, seconds_per_token,
+            denominator, precision)
+    end
+    return _settle_quantity_up(
+        quantity, available, budget, decay_constant, price_coefficient, seconds_per_token,
+        denominator, precision)
+end
+
+# a quantity of zero is always affordable, so this stops
+func _settle_quantity_down{range_check_ptr}(
+        quantity: felt, budget: felt, decay_constant: felt, price_coefficient: felt,
+        seconds_per_token: felt, denominator: felt, precision: felt) -> (res: felt):
+    let (affordable) = _is_affordable(
+        quantity, budget, decay_constant, price_coefficient, seconds_per_token, denominator,
+        precision)
+    if affordable == TRUE:
+        return (quantity)
+    end
+    return _settle_quantity_down(
+        quantity - 1, budget, decay_constant, price_coefficient, seconds_per_token, denominator,
+        precision)
+end
+
+func _settle_quantity_up{range_check_ptr}(
+        quantity: felt, available: felt, budget: felt, decay_constant: felt,
+        price_coefficient: felt, seconds_per_token: felt, denominator: felt, precision: felt) -> (
+        res: felt):
+    if quantity == available:
+        return (quantity)
+    end
+    let (affordable) = _is_affordable(
+        quantity + 1, budget, decay_constant, price_coefficient, seconds_per_token, denominator,
+        precision)
+    if affordable == FALSE:
+        return (quantity)
+    end
+    return _settle_quantity_up(
+        quantity + 1, available, budget, decay_constant, price_coefficient, seconds_per_token,
+        denominator, precision)
+end
+
+# A quantity whose price would leave the 64.61 range is not affordable either. Quantities up to
+# the tokens available keep the exponent within the one of the denominator, so only the
+# numerator product and the division can overflow.
+func _is_affordable{range_check_ptr}(
+        quantity: felt, budget: felt, decay_constant: felt, price_coefficient: felt,
+        seconds_per_token: felt, denominator: felt, precision: felt) -> (res: felt):
+    alloc_locals
+    let (seconds_to_purchase) = _emission_seconds(quantity, seconds_per_token)
+    let (mul_num1) = Math64x61_mul(decay_constant, seconds_to_purchase)
+    let (exp_num1) = GDA_exp(mul_num1, precision)
+    let (local num2) = Math64x61_sub(exp_num1, Math64x61_ONE)
+    let (numerator_fits) = GDA_mul_fits(price_coefficient, num2)
+    if numerator_fits == FALSE:
+        return (FALSE)
+    end
+    let (numerator) = Math64x61_mul(price_coefficient, num2)
+    return GDA_price_within(numerator, denominator, budget)
+end
 
-    let (local initial_price) = initialPrice.read()
+# Reads the auction once and returns the 64x61 price of numTokens at the current block, the
+# seconds of emissions they represent, the seconds of emissions available and the start time of
+# the next available auction
+func _quote{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(numTokens: felt) -> (
+        price: felt, seconds_to_purchase: felt, seconds_available: felt,
+        auction_start_time: felt):
+    alloc_locals
+
+    let (local auction_start_time) = lastAvailableAuctionStartTime.read()
+    let (block_timestamp) = get_block_timestamp()
     let (local decay_constant) = decayConstant.read()
-    let (local emission_rate) = emissionRate.read()
+    let (price_coefficient) = priceCoefficient.read()
+    let (seconds_per_token) = secondsPerToken.read()
+    let (local precision) = precisionTier.read()
+
+    let (local seconds_to_purchase) = _emission_seconds(numTokens, seconds_per_token)
+    let (local num) = _price_numerator(
+        seconds_to_purchase, decay_constant, price_coefficient, precision)
+    let (fixed_timestamp) = Math64x61_fromFelt(block_timestamp)
+    let (local seconds_available) = Math64x61_sub(fixed_timestamp, auction_start_time)
+    let (den) = _price_denominator(seconds_available, decay_constant, precision)
+    let (price) = Math64x61_div(num, den)
+    return (price, seconds_to_purchase, seconds_available, auction_start_time)
+end
 
-    let (mul_num1) = Math64x61_mul(decay_constant, quantity)
-    let (div_num1) = Math64x61_div(mul_num1, emission_rate)
-    let (exp_num1) = Math64x61_exp(div_num1)
+# seconds of emissions numTokens tokens amount to, as a 64x61 fixed precision number
+func _emission_seconds{range_check_ptr}(numTokens: felt, seconds_per_token: felt) -> (res: felt):
+    # numTokens is an integer, so scaling by it needs no fixed point rounding
+    assert_nn_le(numTokens, Math64x61_INT_PART)
+    tempvar res = numTokens * seconds_per_token
+    Math64x61_assert64x61(res)
+    return (res)
+end
 
-    let (num1) = Math64x61_div(initial_price, decay_constant)
+# quantity-dependent part of the price: initialPrice / decayConstant * (e^(decayConstant *
+# seconds of emissions purchased) - 1)
+func _price_numerator{range_check_ptr}(
+        seconds_to_purchase: felt, decay_constant: felt, price_coefficient: felt,
+        precision: felt) -> (res: felt):
+    let (mul_num1) = Math64x61_mul(decay_constant, seconds_to_purchase)
+    let (exp_num1) = GDA_exp(mul_num1, precision)
     let (num2) = Math64x61_sub(exp_num1, Math64x61_ONE)
+    let (num) = Math64x61_mul(price_coefficient, num2)
+    return (num)
+end
 
+# time-dependent part of the price: e^(decayConstant * time since the last available auction)
+func _price_denominator{range_check_ptr}(
+        time_since_start: felt, decay_constant: felt, precision: felt) -> (res: felt):
     let (mul_num2) = Math64x61_mul(decay_constant, time_since_start)
-    let (den) = Math64x61_exp(mul_num2)
+    let (den) = GDA_exp(mul_num2, precision)
+    return (den)
+end
 
-    let (num) = Math64x61_mul(num1, num2)
-    let (total_cost) = Math64x61_div(num, den)
-    let (total_cost_uint) = Math64x61_toUint256(total_cost)
+func _price_numerators{range_check_ptr}(
+        quantities_len: felt, quantities: felt*, numerators: felt*, decay_constant: felt,
+        price_coefficient: felt, seconds_per_token: felt, precision: felt):
+    if quantities_len == 0:
+        return ()
+    end
 
-    return (res=total_cost_uint)
+    let (seconds_to_purchase) = _emission_seconds(quantities[0], seconds_per_token)
+    let (numerator) = _price_numerator(
+        seconds_to_purchase, decay_constant, price_coefficient, precision)
+    assert numerators[0] = numerator
+    return _price_numerators(
+        quantities_len - 1, quantities + 1, numerators + 1, decay_constant, price_coefficient,
+        seconds_per_token, precision)
+end
+
+func _price_denominators{range_check_ptr}(
+        offsets_len: felt, offsets: felt*, denominators: felt*, block_timestamp: felt,
+        decay_constant: felt, auction_start_time: felt, precision: felt):
+    if offsets_len == 0:
+        return ()
+    end
+
+    let (fixed_timestamp) = Math64x61_fromFelt(block_timestamp + offsets[0])
+    let (time_since_start) = Math64x61_sub(fixed_timestamp, auction_start_time)
+    let (denominator) = _price_denominator(time_since_start, decay_constant, precision)
+    assert denominators[0] = denominator
+    return _price_denominators(
+        offsets_len - 1, offsets + 1, denominators + 1, block_timestamp, decay_constant,
+        auction_start_time, precision)
 end
 
 @view
@@ -2,6 +2,7 @@
 
 from openzeppelin.token.erc721.interfaces.IERC721 import IERC721
 
+from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.cairo_builtins import HashBuiltin, SignatureBuiltin
 from starkware.starknet.common.syscalls import (
     get_block_number,
@@ -10,8 +11,10 @@ from starkware.starknet.common.syscalls import (
     get_contract_address
 )
 from starkware.cairo.common.math import (
+    assert_nn_le,
     assert_not_zero,
-    split_felt
+    split_felt,
+    unsigned_div_rem
 )
 from openzeppelin.utils.constants import FALSE, TRUE
 from openzeppelin.introspection.ERC165 import ERC165_supports_interface
@@ -19,19 +22,22 @@ from openzeppelin.token.erc721.library import (
     ERC721_name,
     ERC721_symbol,
     ERC721_balanceOf,
-    ERC721_ownerOf,
-    ERC721_getApproved,
     ERC721_isApprovedForAll,
-    ERC721_tokenURI,
-    ERC721_only_token_owner,
     ERC721_initializer,
-    ERC721_approve, 
-    ERC721_setApprovalForAll, 
-    ERC721_transferFrom,
-    ERC721_safeTransferFrom,
-    ERC721_mint,
-    ERC721_burn,
-    ERC721_setTokenURI
+    ERC721_setApprovalForAll
+)
+from contracts.ERC721A import (
+    ERC721A_ownerOf,
+    ERC721A_getApproved,
+    ERC721A_tokenURI,
+    ERC721A_only_token_owner,
+    ERC721A_approve,
+    ERC721A_transferFrom,
+    ERC721A_safeTransferFrom,
+    ERC721A_mint_batch,
+    ERC721A_mint,
+    ERC721A_burn,
+    ERC721A_setTokenURI
 )
 
 from starkware.cairo.common.uint256 import (
@@ -54,19 +60,35 @@ from contracts.Math64x61 import (
     Math64x61_sub,
     Math64x61_mul,
     Math64x61_div,
-    Math64x61_pow,
-    Math64x61_exp,
+    Math64x61__pow_int,
     Math64x61_toUint256,
     Math64x61_ONE
 )
+from contracts.GDA import (
+    GDA_assert_precision,
+    GDA_exp,
+    GDA_ln,
+    GDA_mul_fits,
+    GDA_price_grid,
+    GDA_price_within,
+    GDA_quantity_estimate
+)
 
 #
 # Storage
 #
 
-# parameter that controls the id of current ERC721 being minted
+# Two values share a storage slot as (low + PACK_LOW_OFFSET) + high * PACK_SHIFT, see pack().
+# The offset lets low hold any signed 64x61 value, while high must be non-negative and small
+# enough for the packed felt not to wrap around the field
+const PACK_SHIFT = 2 ** 128
+const PACK_LOW_OFFSET = 2 ** 127
+const PACK_HIGH_BOUND = 2 ** 122
+
+# running price of the next token, initialPrice * scaleFactor^(tokens sold), stored as a
+# 64x61 fixed precision number. The id of the next token is kept by ERC721A.
 @storage_var
-func currentId() -> (res : felt):
+func priceState() -> (res : felt):
 end
 
 # parameter that controls which erc20 should be used to purchase tokens
@@ -74,27 +96,38 @@ end
 func erc20Address() -> (res : felt):
 end
 
-# parameter that controls initial price, stored as a 59x18 fixed precision number
+# parameter that controls how much the starting price of each successive auction increases by,
+# stored as scaleFactor - 1 in 64x61 fixed precision since that is the term the price needs
 @storage_var
-func initialPrice() -> (res : felt):
+func scaleFactorMinusOne() -> (res : felt):
 end
 
-# parameter that controls how much the starting price of each successive auction increases by,
-# stored as a 59x18 fixed precision number
+# parameter that controls price decay, stored as a 64x61 fixed precision number packed
+# with the start time for all auctions
 @storage_var
-func scaleFactor() -> (res : felt):
+func decayParams() -> (res : felt):
 end
 
-# parameter that controls price decay, stored as a 59x18 fixed precision number
+# precision tier of the exp and ln in the price, GDA_PRECISE or GDA_FAST
 @storage_var
-func decayConstant() -> (res : felt):
+func precisionTier() -> (res : felt):
 end
 
-# start time for all auctions, stored as a 59x18 fixed precision number
-@storage_var
-func auctionStartTime() -> (res : felt):
+
+#
+# Events
+#
+
+# auctionStartTime is a 64x61 fixed precision timestamp
+@event
+func AuctionCreated(
+        initialPrice: felt, scaleFactor: felt, decayConstant: felt, auctionStartTime: felt):
 end
 
+# sold is the number of tokens minted after the purchase, i.e. the id of the next token
+@event
+func Purchase(buyer: felt, to: felt, quantity: felt, price: Uint256, sold: felt):
+end
 
 #
 # Constructor
@@ -111,19 +144,27 @@ func constructor{
         owner: felt,
         _initialPrice: felt,
         _scaleFactor: felt,
-        _decayConstant: felt
+        _decayConstant: felt,
+        _precision: felt
     ):
+    alloc_locals
     # Construct Parents
     ERC721_initializer(name, symbol)
     Ownable_initializer(owner)
-    # Write initial values
-    initialPrice.write(_initialPrice)
-    scaleFactor.write(_scaleFactor)
-    decayConstant.write(_decayConstant)
+    # Write initial values, precomputing everything that only depends on them
+    priceState.write(_initialPrice)
+
+    let (scale_factor_minus_one) = Math64x61_sub(_scaleFactor, Math64x61_ONE)
+    scaleFactorMinusOne.write(scale_factor_minus_one)
 
     let (block_timestamp) = get_block_timestamp()
     let (fixedTimestamp) = Math64x61_fromFelt(block_timestamp)
-    auctionStartTime.write(fixedTimestamp)
+    let (decay_params) = pack(_decayConstant, fixedTimestamp)
+    decayParams.write(decay_params)
+    GDA_assert_precision(_precision)
+    precisionTier.write(_precision)
+
+    AuctionCreated.emit(_initialPrice, _scaleFactor, _decayConstant, fixedTimestamp)
     return ()
 end
 
@@ -140,14 +181,23 @@ func purchaseTokens{
     ):
     alloc_locals
 
-    let (price) = purchase_price(numTokens)
+    let (local current_price) = priceState.read()
+    let (local scale_factor_minus_one) = scaleFactorMinusOne.read()
+    local scale_factor = scale_factor_minus_one + Math64x61_ONE
+
+    let (local price) = _purchase_price(
+        numTokens, current_price, scale_factor, scale_factor_minus_one)
     let (is_valid_bid) = uint256_le(price, value)
     with_attr error_message("insufficient payment"):
         assert is_valid_bid = TRUE
     end
 
     # Mint all tokens
-    _mint_batch(to, numTokens)
+    let (next_price, sold) = _mint_batch(to, numTokens, current_price, scale_factor)
+    priceState.write(next_price)
+
+    let (buyer) = get_caller_address()
+    Purchase.emit(buyer, to, numTokens, price, sold)
 
 
     # Refund buyer for excess payment
@@ -171,24 +221,46 @@ func purchaseTokens{
     return ()
 end
 
-func _mint_batch{pedersen_ptr : HashBuiltin*, syscall_ptr : felt*, range_check_ptr}(
-        to : felt, amount : felt) -> ():
+# purchase as many tokens as the budget affords, returning how many were bought
+@external
+func purchaseForBudget{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        to: felt,
+        budget: Uint256 # Denominated in auction's configured ERC20
+    ) -> (quantity: felt):
     alloc_locals
-    assert_not_zero(to)
 
-    if amount == 0:
-        return ()
+    let (local quantity) = max_purchasable(budget)
+    with_attr error_message("budget too small"):
+        assert_not_zero(quantity)
     end
+    purchaseTokens(quantity, to, budget)
+    return (quantity)
+end
 
-    let (local current_id) = currentId.read()
-    let (current_id_uint : Uint256) = felt_to_uint256(current_id)
-    ERC721_mint(to, current_id_uint)
+# mints amount consecutive tokens and returns the running price of the token after them along
+# with the number of tokens minted so far
+func _mint_batch{pedersen_ptr : HashBuiltin*, syscall_ptr : felt*, range_check_ptr}(
+        to : felt, amount : felt, price : felt, scale_factor : felt) -> (
+        price : felt, sold : felt):
+    alloc_locals
+    let (local start_id) = ERC721A_mint_batch(to, amount)
+    let (next_price) = _scale_price(price, scale_factor, amount)
+    return (next_price, start_id + amount)
+end
 
-    currentId.write(current_id + 1)
+# scales the running price once per minted token
+func _scale_price{range_check_ptr}(price : felt, scale_factor : felt, amount : felt) -> (
+        price : felt):
+    if amount == 0:
+        return (price)
+    end
 
-    return _mint_batch(
-        to=to,
-        amount=(amount - 1))
+    let (next_price) = Math64x61_mul(price, scale_factor)
+    return _scale_price(next_price, scale_factor, amount - 1)
 end
 
 #
@@ -203,39 +275,244 @@ func purchase_price{
     }(numTokens: felt) -> (res: Uint256):
     alloc_locals
 
-    let (local current_id) = currentId.read()
-    let (local auction_start_time) = auctionStartTime.read()
-    let (local initial_price) = initialPrice.read()
-    let (local decay_constant) = decayConstant.read()
+    let (local current_price) = priceState.read()
+    let (scale_factor_minus_one) = scaleFactorMinusOne.read()
 
-    let (quantity) = Math64x61_fromFelt(numTokens)
-    let (num_sold) = Math64x61_fromFelt(current_id)
+    return _purchase_price(
+        numTokens, current_price, scale_factor_minus_one + Math64x61_ONE, scale_factor_minus_one)
+end
 
+# Quotes every quantity at every offset (in seconds) from the current block timestamp,
+# returning the flattened quantities_len x offsets_len price matrix with one row per quantity
+@view
+func purchase_price_batch{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        quantities_len: felt,
+        quantities: felt*,
+        offsets_len: felt,
+        offsets: felt*
+    ) -> (prices_len: felt, prices: Uint256*):
+    alloc_locals
+
+    let (current_price) = priceState.read()
+    let (local scale_factor_minus_one) = scaleFactorMinusOne.read()
+    let (decay_params) = decayParams.read()
+    let (local decay_constant, local auction_start_time) = unpack(decay_params)
+    let (local block_timestamp) = get_block_timestamp()
+    let (local precision) = precisionTier.read()
+
+    let (local numerators : felt*) = alloc()
+    _price_numerators(
+        quantities_len, quantities, numerators, current_price,
+        scale_factor_minus_one + Math64x61_ONE)
+    let (local denominators : felt*) = alloc()
+    _price_denominators(
+        offsets_len, offsets, denominators, block_timestamp, decay_constant, auction_start_time,
+        scale_factor_minus_one, precision)
+
+    let (local prices : Uint256*) = alloc()
+    GDA_price_grid(quantities_len, numerators, offsets_len, denominators, prices)
+    return (quantities_len * offsets_len, prices)
+end
+
+# Largest quantity whose purchase_price fits in the budget
+@view
+func max_purchasable{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(budget: Uint256) -> (quantity: felt):
+    alloc_locals
+
+    with_attr error_message("budget does not fit in 128 bits"):
+        assert budget.high = 0
+    end
+    let (local current_price) = priceState.read()
+    let (local scale_factor_minus_one) = scaleFactorMinusOne.read()
+    local scale_factor = scale_factor_minus_one + Math64x61_ONE
+    let (decay_params) = decayParams.read()
+    let (local decay_constant, local auction_start_time) = unpack(decay_params)
+    let (local precision) = precisionTier.read()
     let (block_timestamp) = get_block_timestamp()
-    let (fixedTimestamp) = Math64x61_fromFelt(block_timestamp)
-    let (time_since_start) = Math64x61_sub(fixedTimestamp, auction_start_time)
+    let (local denominator) = _price_denominator(
+        block_timestamp, decay_constant, auction_start_time, scale_factor_minus_one, precision)
+
+    # current_price * (scaleFactor^n - 1) / denominator, so the rate is ln(scaleFactor)
+    let (rate) = GDA_ln(scale_factor, precision)
+    let (estimate) = GDA_quantity_estimate(
+        budget.low, current_price, denominator, rate, precision)
+    let (quantity) = _settle_quantity(
+        estimate, budget.low, current_price, scale_factor, denominator)
+    return (quantity)
+end
 
-    let (scale_factor) = scaleFactor.read()
+# walks from an estimate to the largest quantity whose price fits in the budget
+func _settle_quantity{range_check_ptr}(
+        quantity: felt, budget: felt, current_price: felt, scale_factor: felt,
+        denominator: felt) -> (res: felt):
+    let (affordable) = _is_affordable(
+        quantity, budget, current_price, scale_factor, denominator)
+    if affordable == FALSE:
+        return _settle_quantity_down(
+            quantity - 1, budget, current_price, scale_factor, denominator)
+    end
+    return _settle_quantity_up(quantity, budget, current_price, scale_factor, denominator)
+end
 
-    let (local pow_num) = Math64x61_pow(scale_factor, num_sold)
-    let (local pow_num2) = Math64x61_pow(scale_factor, quantity)
-    let (local mul_num1) = Math64x61_mul(decay_constant, time_since_start)
+# a quantity of zero is always affordable, so this stops
+func _settle_quantity_down{range_check_ptr}(
+        quantity: felt, budget: felt, current_price: felt, scale_factor: felt,
+        denominator: felt) -> (res: felt):
+    let (affordable) = _is_affordable(
+        quantity, budget, current_price, scale_factor, denominator)
+    if affordable == TRUE:
+        return (quantity)
+    end
+    return _settle_quantity_down(quantity - 1, budget, current_price, scale_factor, denominator)
+end
 
-    let (num1) = Math64x61_mul(initial_price, pow_num)
-    let (num2) = Math64x61_sub(pow_num2, Math64x61_ONE)
+func _settle_quantity_up{range_check_ptr}(
+        quantity: felt, budget: felt, current_price: felt, scale_factor: felt,
+        denominator: felt) -> (res: felt):
+    let (affordable) = _is_affordable(
+        quantity + 1, budget, current_price, scale_factor, denominator)
+    if affordable == FALSE:
+        return (quantity)
+    end
+    return _settle_quantity_up(quantity + 1, budget, current_price, scale_factor, denominator)
+end
 
-    let (den1) = Math64x61_exp(mul_num1) 
-    let (den2) = Math64x61_sub(scale_factor, Math64x61_ONE)
+# a quantity whose price would leave the 64.61 range is not affordable either
+func _is_affordable{range_check_ptr}(
+        quantity: felt, budget: felt, current_price: felt, scale_factor: felt,
+        denominator: felt) -> (res: felt):
+    alloc_locals
+    let (local pow_num2, pow_fits) = _bounded_pow_int(scale_factor, quantity)
+    if pow_fits == FALSE:
+        return (FALSE)
+    end
+    let (local num2) = Math64x61_sub(pow_num2, Math64x61_ONE)
+    let (numerator_fits) = GDA_mul_fits(current_price, num2)
+    if numerator_fits == FALSE:
+        return (FALSE)
+    end
+    let (numerator) = Math64x61_mul(current_price, num2)
+    return GDA_price_within(numerator, denominator, budget)
+end
 
-    let (local mul_num2) = Math64x61_mul(num1, num2)
-    let (local mul_num3) = Math64x61_mul(den1, den2)
+# Math64x61__pow_int for a non-negative exponent, step for step, returning fits FALSE instead
+# of reverting when a product leaves the 64.61 range
+func _bounded_pow_int{range_check_ptr}(x: felt, exponent: felt) -> (res: felt, fits: felt):
+    alloc_locals
+    if exponent == 0:
+        return (Math64x61_ONE, TRUE)
+    end
+
+    let (half_exponent, local rem) = unsigned_div_rem(exponent, 2)
+    let (local half_pow, half_fits) = _bounded_pow_int(x, half_exponent)
+    if half_fits == FALSE:
+        return (0, FALSE)
+    end
+    let (square_fits) = GDA_mul_fits(half_pow, half_pow)
+    if square_fits == FALSE:
+        return (0, FALSE)
+    end
+    let (local res_p) = Math64x61_mul(half_pow, half_pow)
+    if rem == 0:
+        return (res_p, TRUE)
+    end
+    let (odd_fits) = GDA_mul_fits(res_p, x)
+    if odd_fits == FALSE:
+        return (0, FALSE)
+    end
+    let (res) = Math64x61_mul(res_p, x)
+    return (res, TRUE)
+end
 
-    let (local total_cost) = Math64x61_div(mul_num2, mul_num3)
+# price of the next numTokens tokens given the running price of the next one, which
+# keeps the cost of a quote independent of how many tokens were already sold
+func _purchase_price{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        numTokens: felt,
+        current_price: felt,
+        scale_factor: felt,
+        scale_factor_minus_one: felt
+    ) -> (res: Uint256):
+    alloc_locals
+
+    let (decay_params) = decayParams.read()
+    let (local decay_constant, local auction_start_time) = unpack(decay_params)
+    let (local precision) = precisionTier.read()
+    let (block_timestamp) = get_block_timestamp()
+
+    let (local numerator) = _price_numerator(numTokens, current_price, scale_factor)
+    let (denominator) = _price_denominator(
+        block_timestamp, decay_constant, auction_start_time, scale_factor_minus_one, precision)
+
+    let (total_cost) = Math64x61_div(numerator, denominator)
     let (total_cost_uint) = Math64x61_toUint256(total_cost)
 
     return (res=total_cost_uint)
 end
 
+# quantity-dependent part of the price: current_price * (scaleFactor^numTokens - 1)
+func _price_numerator{range_check_ptr}(
+        numTokens: felt, current_price: felt, scale_factor: felt) -> (res: felt):
+    # numTokens is an integer, so skip straight to the integer pow
+    let (pow_num2) = Math64x61__pow_int(scale_factor, numTokens)
+    let (num2) = Math64x61_sub(pow_num2, Math64x61_ONE)
+    let (mul_num2) = Math64x61_mul(current_price, num2)
+    return (mul_num2)
+end
+
+# time-dependent part of the price: e^(decayConstant * time since start) * (scaleFactor - 1)
+func _price_denominator{range_check_ptr}(
+        timestamp: felt, decay_constant: felt, auction_start_time: felt,
+        scale_factor_minus_one: felt, precision: felt) -> (res: felt):
+    let (fixedTimestamp) = Math64x61_fromFelt(timestamp)
+    let (time_since_start) = Math64x61_sub(fixedTimestamp, auction_start_time)
+    let (mul_num1) = Math64x61_mul(decay_constant, time_since_start)
+    let (den1) = GDA_exp(mul_num1, precision)
+    let (mul_num3) = Math64x61_mul(den1, scale_factor_minus_one)
+    return (mul_num3)
+end
+
+func _price_numerators{range_check_ptr}(
+        quantities_len: felt, quantities: felt*, numerators: felt*, current_price: felt,
+        scale_factor: felt):
+    if quantities_len == 0:
+        return ()
+    end
+
+    let (numerator) = _price_numerator(quantities[0], current_price, scale_factor)
+    assert numerators[0] = numerator
+    return _price_numerators(
+        quantities_len - 1, quantities + 1, numerators + 1, current_price, scale_factor)
+end
+
+func _price_denominators{range_check_ptr}(
+        offsets_len: felt, offsets: felt*, denominators: felt*, block_timestamp: felt,
+        decay_constant: felt, auction_start_time: felt, scale_factor_minus_one: felt,
+        precision: felt):
+    if offsets_len == 0:
+        return ()
+    end
+
+    let (denominator) = _price_denominator(
+        block_timestamp + offsets[0], decay_constant, auction_start_time, scale_factor_minus_one,
+        precision)
+    assert denominators[0] = denominator
+    return _price_denominators(
+        offsets_len - 1, offsets + 1, denominators + 1, block_timestamp, decay_constant,
+        auction_start_time, scale_factor_minus_one, precision)
+end
+
 #
 # ERC721_Mintable_Burnable
 #
@@ -290,7 +567,7 @@ func ownerOf{
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(tokenId: Uint256) -> (owner: felt):
-    let (owner: felt) = ERC721_ownerOf(tokenId)
+    let (owner: felt) = ERC721A_ownerOf(tokenId)
     return (owner)
 end
 
@@ -300,7 +577,7 @@ func getApproved{
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(tokenId: Uint256) -> (approved: felt):
-    let (approved: felt) = ERC721_getApproved(tokenId)
+    let (approved: felt) = ERC721A_getApproved(tokenId)
     return (approved)
 end
 
@@ -320,7 +597,7 @@ func tokenURI{
         pedersen_ptr: HashBuiltin*, 
         range_check_ptr
     }(tokenId: Uint256) -> (tokenURI: felt):
-    let (tokenURI: felt) = ERC721_tokenURI(tokenId)
+    let (tokenURI: felt) = ERC721A_tokenURI(tokenId)
     return (tokenURI)
 end
 
@@ -335,7 +612,7 @@ func approve{
         syscall_ptr: felt*, 
         range_check_ptr
     }(to: felt, tokenId: Uint256):
-    ERC721_approve(to, tokenId)
+    ERC721A_approve(to, tokenId)
     return ()
 end
 
@@ -359,7 +636,7 @@ func transferFrom{
         to: felt, 
         tokenId: Uint256
     ):
-    ERC721_transferFrom(_from, to, tokenId)
+    ERC721A_transferFrom(_from, to, tokenId)
     return ()
 end
 
@@ -375,7 +652,7 @@ func safeTransferFrom{
         data_len: felt, 
         data: felt*
     ):
-    ERC721_safeTransferFrom(_from, to, tokenId, data_len, data)
+    ERC721A_safeTransferFrom(_from, to, tokenId, data_len, data)
     return ()
 end
 
@@ -386,7 +663,7 @@ func setTokenURI{
         range_check_ptr
     }(tokenId: Uint256, tokenURI: felt):
     Ownable_only_owner()
-    ERC721_setTokenURI(tokenId, tokenURI)
+    ERC721A_setTokenURI(tokenId, tokenURI)
     return ()
 end
 
@@ -397,7 +674,7 @@ func mint{
         range_check_ptr
     }(to: felt, tokenId: Uint256):
     Ownable_only_owner()
-    ERC721_mint(to, tokenId)
+    ERC721A_mint(to, tokenId)
     return ()
 end
 
@@ -407,8 +684,8 @@ func burn{
         syscall_ptr: felt*, 
         range_check_ptr
     }(tokenId: Uint256):
-    ERC721_only_token_owner(tokenId)
-    ERC721_burn(tokenId)
+    ERC721A_only_token_owner(tokenId)
+    ERC721A_burn(tokenId)
     return ()
 end
 
@@ -420,4 +697,16 @@ end
 func felt_to_uint256{range_check_ptr}(x) -> (x_ : Uint256):
     let split = split_felt(x)
     return (Uint256(low=split.low, high=split.high))
+end
+
+# packs two values into one storage slot, -2^127 <= low < 2^127 and 0 <= high <= 2^122
+func pack{range_check_ptr}(low : felt, high : felt) -> (packed : felt):
+    assert_nn_le(low + PACK_LOW_OFFSET, PACK_SHIFT - 1)
+    assert_nn_le(high, PACK_HIGH_BOUND)
+    return (low + PACK_LOW_OFFSET + high * PACK_SHIFT)
+end
+
+func unpack{range_check_ptr}(packed : felt) -> (low : felt, high : felt):
+    let split = split_felt(packed)
+    return (split.low - PACK_LOW_OFFSET, split.high)
 end
\ No newline at end of file
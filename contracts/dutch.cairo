@@ -3,12 +3,16 @@
 from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.math import (
     assert_le,
+    assert_nn_le,
     assert_not_equal,
+    assert_not_zero,
     split_felt,
+    unsigned_div_rem,
 )
-from starkware.cairo.common.math_cmp import is_not_zero
+from starkware.cairo.common.math_cmp import is_le, is_not_zero
 from starkware.cairo.common.uint256 import (
     Uint256,
+    uint256_eq,
     uint256_le,
     uint256_mul,
     uint256_sub,
@@ -16,6 +20,7 @@ from starkware.cairo.common.uint256 import (
 from starkware.starknet.common.syscalls import (
     get_block_number,
     get_caller_address,
+    get_contract_address,
 )
 
 from openzeppelin.token.erc20.interfaces.IERC20 import IERC20
@@ -24,10 +29,12 @@ from openzeppelin.utils.constants import FALSE, TRUE
 
 
 #
-# Storage (kept as a single global for simplicity)
+# Storage
 #
 
 
+# Auction as returned by getAuction. It is stored split in two, see AuctionTerms and
+# auctionSchedules.
 struct Auction:
     member nftAddress : felt
     member tokenId : Uint256
@@ -42,8 +49,138 @@ struct Auction:
 end
 
 
+# The part of an auction that never changes once initialized. Prices are kept as felts,
+# initialize requires them to fit in 128 bits.
+struct AuctionTerms:
+    member nftAddress : felt
+    member tokenId : Uint256
+    member seller : felt
+    member erc20Address : felt
+    member startingPrice : felt
+    member discountRate : felt
+end
+
+
+# Bits of a packed schedule: (startBlock + 1) * 2^65 + durationBlocks * 2 + sold. The offset
+# keeps the -1 block number of a fresh test chain packable.
+const SCHEDULE_BLOCK_BOUND = 2 ** 64
+
+# Exclusive bound of the units of a batch auction
+const BATCH_UNITS_BOUND = 2 ** 64
+
+# Blocks after expiry during which a batch auction can still be settled. Past them its bids
+# can be withdrawn instead, so escrow is never locked by units the seller cannot deliver.
+const SETTLEMENT_GRACE_BLOCKS = 100
+
+
+# A batch auction sells `units` consecutive token ids starting at its tokenId. Bids are
+# committed in block order, so at non-increasing prices, and stop once they ask for every
+# unit.
+struct BatchState:
+    member units : felt
+    member bids : felt      # Bids committed
+    member demand : felt    # Units asked for by all bids
+end
+
+
+# The part of a batch state that bids update
+struct BatchDemand:
+    member bids : felt
+    member demand : felt
+end
+
+
+# A committed bid accepts the price of the block it was committed in
+struct Bid:
+    member bidder : felt
+    member quantity : felt
+    member block : felt
+end
+
+
+# Auction terms by id, ids start at 1 so 0 can mean "no auction"
+@storage_var
+func auctionTerms(auctionId : felt) -> (res : AuctionTerms):
+end
+
+
+# startBlock, durationBlocks and sold packed in one felt, so marking an auction sold
+# rewrites a single slot
 @storage_var
-func auction() -> (res : Auction):
+func auctionSchedules(auctionId : felt) -> (schedule : felt):
+end
+
+
+# Number of auctions created, which is also the id of the latest one
+@storage_var
+func auctionCount() -> (res : felt):
+end
+
+
+# Latest auction created for each NFT
+@storage_var
+func auctionIds(nftAddress : felt, tokenId : Uint256) -> (auctionId : felt):
+end
+
+
+# Units of each batch auction, 0 for auctions selling a single token. Kept apart from
+# batchDemands so buy checks the mode in one read.
+@storage_var
+func batchUnits(auctionId : felt) -> (units : felt):
+end
+
+
+@storage_var
+func batchDemands(auctionId : felt) -> (res : BatchDemand):
+end
+
+
+# Bids of a batch auction by commit order
+@storage_var
+func batchBids(auctionId : felt, index : felt) -> (res : Bid):
+end
+
+
+#
+# Events
+#
+
+
+@event
+func AuctionCreated(
+        auctionId : felt,
+        nftAddress : felt,
+        tokenId : Uint256,
+        seller : felt,
+        erc20Address : felt,
+        startingPrice : Uint256,
+        discountRate : Uint256,
+        startBlock : felt,
+        durationBlocks : felt,
+    ):
+end
+
+
+# price is the value the buyer paid
+@event
+func Purchase(auctionId : felt, buyer : felt, quantity : felt, price : Uint256, sold : felt):
+end
+
+
+@event
+func SaleCompleted(auctionId : felt):
+end
+
+
+# price is the unit price accepted, escrowed for each unit until settlement
+@event
+func BidCommitted(auctionId : felt, index : felt, bidder : felt, quantity : felt, price : Uint256):
+end
+
+
+# value is the escrow refunded to the bidder
+@event
+func BidWithdrawn(auctionId : felt, index : felt, bidder : felt, value : Uint256):
 end
 
 
@@ -57,24 +194,60 @@ func getAuction{
         syscall_ptr : felt*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr,
-    }() -> (
+    }(
+        auctionId : felt
+    ) -> (
         res : Auction
     ):
-    let (res) = auction.read()
+    let (res) = _readAuction(auctionId)
     return (res)
 end
 
 
 @view
-func isInitialized{
+func getAuctionCount{
         syscall_ptr : felt*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr,
     }() -> (
         res : felt
     ):
-    let (thisAuction) = auction.read()
-    let (res) = is_not_zero(thisAuction.startBlock)
+    let (res) = auctionCount.read()
+    return (res)
+end
+
+
+# Returns the latest auction created for the NFT, or 0 if it was never auctioned
+@view
+func getAuctionId{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr,
+    }(
+        nftAddress : felt,
+        tokenId : Uint256,
+    ) -> (
+        auctionId : felt
+    ):
+    let (auctionId) = auctionIds.read(nftAddress, tokenId)
+    return (auctionId)
+end
+
+
+@view
+func isInitialized{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr,
+    }(
+        auctionId : felt
+    ) -> (
+        res : felt
+    ):
+    alloc_locals
+    let (schedule) = auctionSchedules.read(auctionId)
+    let (startBlock, _, _) = _unpackSchedule(schedule)
+    let (res) = is_not_zero(startBlock)
     return (res)
 end
 
@@ -84,21 +257,46 @@ func getPrice{
         syscall_ptr : felt*,
         pedersen_ptr : HashBuiltin*,
         range_check_ptr,
-    }() -> (
+    }(
+        auctionId : felt
+    ) -> (
         res : Uint256
     ):
     alloc_locals
-    let (local thisAuction) = auction.read()
-
-    # Discount = DiscountRate * (CurrentBlock - StartBlock)
+    let (local thisAuction) = _readAuction(auctionId)
     let (currentBlock) = get_block_number()
-    let blocksElapsed = currentBlock - thisAuction.startBlock
-    let (blocksElapsedUint) = felt_to_uint256(blocksElapsed)
-    let (discount, carry) = uint256_mul(thisAuction.discountRate, blocksElapsedUint)
-    assert carry = Uint256(0, 0)
+    let (res) = _price(thisAuction, currentBlock)
+    return (res)
+end
 
-    # Price = StartPrice - Discount
-    let (res) = uint256_sub(thisAuction.startingPrice, discount)
+
+@view
+func getBatch{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr,
+    }(
+        auctionId : felt
+    ) -> (
+        res : BatchState
+    ):
+    let (res) = _readBatch(auctionId)
+    return (res)
+end
+
+
+@view
+func getBid{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr,
+    }(
+        auctionId : felt,
+        index : felt,
+    ) -> (
+        res : Bid
+    ):
+    let (res) = batchBids.read(auctionId, index)
     return (res)
 end
 
@@ -120,34 +318,61 @@ func initialize{
         startingPrice : Uint256,
         discountRate : Uint256,
         durationBlocks : felt,
+    ) -> (
+        auctionId : felt
     ):
-    # Require not initialized
-    let (_isInitialized) = isInitialized()
+    alloc_locals
+
+    # Require the NFT is not already on sale
+    let (previousId) = auctionIds.read(nftAddress, tokenId)
+    let (local startBlock) = get_block_number()
+    let (isLive) = _isLive(previousId, startBlock)
     with_attr error_message("auction already initialized"):
-        assert _isInitialized = FALSE
+        assert isLive = FALSE
     end
 
     # Require seller owns the token
-    let (seller) = get_caller_address()
+    let (local seller) = get_caller_address()
     let (tokenOwner) = IERC721.ownerOf(nftAddress, tokenId)
     with_attr error_message("auction already initialized"):
         assert seller = tokenOwner
     end
 
-    let (startBlock) = get_block_number()
-    let newAuction = Auction(
+    # Require prices fit in a felt
+    with_attr error_message("price does not fit in 128 bits"):
+        assert startingPrice.high = 0
+        assert discountRate.high = 0
+    end
+
+    let (schedule) = _packSchedule(startBlock, durationBlocks, FALSE)
+
+    let (previousCount) = auctionCount.read()
+    local auctionId = previousCount + 1
+    let terms = AuctionTerms(
         nftAddress=nftAddress,
         tokenId=tokenId,
         seller=seller,
         erc20Address=erc20Address,
-        startingPrice=startingPrice,
-        discountRate=discountRate,
-        startBlock=startBlock,
-        durationBlocks=durationBlocks,
-        sold=FALSE,
+        startingPrice=startingPrice.low,
+        discountRate=discountRate.low,
     )
-    auction.write(newAuction)
-    return ()
+    auctionTerms.write(auctionId, terms)
+    auctionSchedules.write(auctionId, schedule)
+    auctionCount.write(auctionId)
+    auctionIds.write(nftAddress, tokenId, auctionId)
+
+    AuctionCreated.emit(
+        auctionId,
+        nftAddress,
+        tokenId,
+        seller,
+        erc20Address,
+        startingPrice,
+        discountRate,
+        startBlock,
+        durationBlocks,
+    )
+    return (auctionId)
 end
 
 
@@ -157,19 +382,25 @@ func buy{
         pedersen_ptr : HashBuiltin*,
         range_check_ptr
     }(
+        auctionId : felt,
         value : Uint256,  # Denominated in auction's configured ERC20
     ):
     alloc_locals
-    let (local thisAuction) = auction.read()
+    let (local thisAuction) = _readAuction(auctionId)
 
     # Require initialized
-    let (_isInitialized) = isInitialized()
     with_attr error_message("auction not initialized"):
-        assert _isInitialized = TRUE
+        assert_not_zero(thisAuction.startBlock)
+    end
+
+    # Require a single token auction, batch auctions take bids
+    let (units) = batchUnits.read(auctionId)
+    with_attr error_message("batch auction, commit a bid"):
+        assert units = 0
     end
 
     # Require not expired
-    let (currentBlock) = get_block_number()
+    let (local currentBlock) = get_block_number()
     with_attr error_message("auction expired"):
         assert_le(
             currentBlock,
@@ -178,7 +409,7 @@ func buy{
     end
 
     # Require not seller
-    let (buyer) = get_caller_address()
+    let (local buyer) = get_caller_address()
     with_attr error_message("auction not initialized"):
         assert_not_equal(thisAuction.seller, buyer)
     end
@@ -189,7 +420,7 @@ func buy{
     end
 
     # Require sent value >= price
-    let (price) = getPrice()
+    let (price) = _price(thisAuction, currentBlock)
     let (is_valid_bid) = uint256_le(price, value)
     with_attr error_message("bid value < price"):
         assert is_valid_bid = TRUE
@@ -216,22 +447,477 @@ func buy{
     )
 
     # Mark as sold
-    let uninitializedAuction = Auction(
-        nftAddress=thisAuction.nftAddress,
-        tokenId=thisAuction.tokenId,
-        seller=thisAuction.seller,
-        erc20Address=thisAuction.erc20Address,
-        startingPrice=thisAuction.startingPrice,
-        discountRate=thisAuction.discountRate,
-        startBlock=thisAuction.startBlock,
-        durationBlocks=thisAuction.durationBlocks,
-        sold=TRUE,
+    let (schedule) = _packSchedule(thisAuction.startBlock, thisAuction.durationBlocks, TRUE)
+    auctionSchedules.write(auctionId, schedule)
+
+    # A dutch auction sells its single token to the first buyer
+    Purchase.emit(auctionId, buyer, 1, value, TRUE)
+    SaleCompleted.emit(auctionId)
+    return ()
+end
+
+
+# Creates an auction of `units` consecutive token ids starting at tokenId, all owned by the
+# caller and approved for this contract. Buyers commit bids until the bids ask for every
+# unit or the auction expires, then settle sells every unit at one price.
+@external
+func initializeBatch{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        nftAddress : felt,
+        tokenId : Uint256,
+        erc20Address : felt,
+        startingPrice : Uint256,
+        discountRate : Uint256,
+        durationBlocks : felt,
+        units : felt,
+    ) -> (
+        auctionId : felt
+    ):
+    alloc_locals
+    with_attr error_message("units out of range"):
+        assert_not_zero(units)
+        assert_nn_le(units, BATCH_UNITS_BOUND - 1)
+        assert_le(tokenId.low + units, 2 ** 128)
+    end
+
+    let (local auctionId) = initialize(
+        nftAddress, tokenId, erc20Address, startingPrice, discountRate, durationBlocks)
+
+    # initialize checked and registered the first unit
+    let (seller) = get_caller_address()
+    let (currentBlock) = get_block_number()
+    _registerUnits(
+        nftAddress, seller, auctionId, currentBlock, Uint256(tokenId.low + 1, tokenId.high),
+        units - 1)
+    batchUnits.write(auctionId, units)
+    return (auctionId)
+end
+
+
+# Commits a bid for `quantity` units at the current price and escrows its value. The bid
+# that asks for the last units closes the auction, and is only filled for what remains.
+@external
+func commitBid{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt,
+        quantity : felt,
+    ):
+    alloc_locals
+    let (local thisAuction) = _readAuction(auctionId)
+    let (local batch : BatchState) = _readBatch(auctionId)
+
+    with_attr error_message("auction not initialized"):
+        assert_not_zero(thisAuction.startBlock)
+    end
+    with_attr error_message("not a batch auction"):
+        assert_not_zero(batch.units)
+    end
+
+    let (local currentBlock) = get_block_number()
+    with_attr error_message("auction expired"):
+        assert thisAuction.sold = FALSE
+        assert_le(currentBlock, thisAuction.startBlock + thisAuction.durationBlocks)
+    end
+    with_attr error_message("auction sold out"):
+        assert_le(batch.demand + 1, batch.units)
+    end
+
+    let (local bidder) = get_caller_address()
+    with_attr error_message("auction not initialized"):
+        assert_not_equal(thisAuction.seller, bidder)
+    end
+    with_attr error_message("quantity out of range"):
+        assert_not_zero(quantity)
+        assert_nn_le(quantity, batch.units)
+    end
+
+    # Escrow quantity * price
+    let (price) = _price(thisAuction, currentBlock)
+    let (local value) = _value(price, quantity)
+    let (escrow) = get_contract_address()
+    IERC20.transferFrom(thisAuction.erc20Address, bidder, escrow, value)
+
+    let bid = Bid(bidder=bidder, quantity=quantity, block=currentBlock)
+    batchBids.write(auctionId, batch.bids, bid)
+    let demand = BatchDemand(bids=batch.bids + 1, demand=batch.demand + quantity)
+    batchDemands.write(auctionId, demand)
+
+    BidCommitted.emit(auctionId, batch.bids, bidder, quantity, price)
+    return ()
+end
+
+
+# Settles a batch auction whose bids ask for every unit, or that expired. Every winning
+# bid pays the price of the last bid committed, the lowest any winner accepted. Its units
+# are transferred, the rest of its escrow refunded, and the seller paid once for all of
+# them. Anyone can settle, until SETTLEMENT_GRACE_BLOCKS after expiry.
+@external
+func settle{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt
+    ):
+    alloc_locals
+    let (local thisAuction) = _readAuction(auctionId)
+    let (local batch : BatchState) = _readBatch(auctionId)
+
+    with_attr error_message("not a batch auction"):
+        assert_not_zero(batch.units)
+    end
+    with_attr error_message("auction already settled"):
+        assert thisAuction.sold = FALSE
+    end
+
+    let (local currentBlock) = get_block_number()
+    let (expired) = is_le(thisAuction.startBlock + thisAuction.durationBlocks + 1, currentBlock)
+    let (soldOut) = is_le(batch.units, batch.demand)
+    with_attr error_message("auction still open"):
+        assert_not_zero(expired + soldOut)
+    end
+    with_attr error_message("settlement window closed"):
+        assert_le(
+            currentBlock,
+            thisAuction.startBlock + thisAuction.durationBlocks + SETTLEMENT_GRACE_BLOCKS)
+    end
+
+    # Mark as settled
+    let (schedule) = _packSchedule(thisAuction.startBlock, thisAuction.durationBlocks, TRUE)
+    auctionSchedules.write(auctionId, schedule)
+
+    if batch.bids == 0:
+        SaleCompleted.emit(auctionId)
+        return ()
+    end
+
+    let (lastBid : Bid) = batchBids.read(auctionId, batch.bids - 1)
+    let (local clearingPrice) = _price(thisAuction, lastBid.block)
+    let (local sold) = _settleBids(auctionId, thisAuction, batch, clearingPrice, 0, 0)
+
+    let (proceeds) = _value(clearingPrice, sold)
+    IERC20.transfer(thisAuction.erc20Address, thisAuction.seller, proceeds)
+
+    SaleCompleted.emit(auctionId)
+    return ()
+end
+
+
+# Refunds the whole escrow of a bid once a batch auction was left unsettled for
+# SETTLEMENT_GRACE_BLOCKS after expiry, e.g. because the seller moved a unit or revoked the
+# approval. Anyone can withdraw, the escrow always goes back to the bidder.
+@external
+func withdrawBid{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt,
+        index : felt,
+    ):
+    alloc_locals
+    let (local thisAuction) = _readAuction(auctionId)
+    let (local batch : BatchState) = _readBatch(auctionId)
+
+    with_attr error_message("not a batch auction"):
+        assert_not_zero(batch.units)
+    end
+    with_attr error_message("auction already settled"):
+        assert thisAuction.sold = FALSE
+    end
+
+    let (currentBlock) = get_block_number()
+    with_attr error_message("settlement window open"):
+        assert_le(
+            thisAuction.startBlock + thisAuction.durationBlocks + SETTLEMENT_GRACE_BLOCKS + 1,
+            currentBlock)
+    end
+
+    with_attr error_message("bid out of range"):
+        assert_nn_le(index, batch.bids - 1)
+    end
+    let (local bid : Bid) = batchBids.read(auctionId, index)
+    with_attr error_message("bid already withdrawn"):
+        assert_not_zero(bid.quantity)
+    end
+
+    let (bidPrice) = _price(thisAuction, bid.block)
+    let (local escrow) = _value(bidPrice, bid.quantity)
+    let withdrawn = Bid(bidder=bid.bidder, quantity=0, block=bid.block)
+    batchBids.write(auctionId, index, withdrawn)
+    IERC20.transfer(thisAuction.erc20Address, bid.bidder, escrow)
+
+    BidWithdrawn.emit(auctionId, index, bid.bidder, escrow)
+    return ()
+end
+
+
+#
+# Internals
+#
+
+
+# An auction is live from its creation until it is sold or expires. A batch auction stays live
+# until it is settled or its settlement window closes, as settle still transfers its units.
+# Auction 0 never exists.
+func _isLive{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt,
+        currentBlock : felt,
+    ) -> (
+        res : felt
+    ):
+    alloc_locals
+    if auctionId == 0:
+        return (FALSE)
+    end
+
+    let (schedule) = auctionSchedules.read(auctionId)
+    let (local startBlock, local durationBlocks, sold) = _unpackSchedule(schedule)
+    if sold == TRUE:
+        return (FALSE)
+    end
+
+    let (units) = batchUnits.read(auctionId)
+    if units == 0:
+        let (res) = is_le(currentBlock, startBlock + durationBlocks)
+        return (res)
+    end
+    let (res) = is_le(currentBlock, startBlock + durationBlocks + SETTLEMENT_GRACE_BLOCKS)
+    return (res)
+end
+
+
+func _readAuction{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt
+    ) -> (
+        res : Auction
+    ):
+    alloc_locals
+    let (local terms : AuctionTerms) = auctionTerms.read(auctionId)
+    let (schedule) = auctionSchedules.read(auctionId)
+    let (startBlock, durationBlocks, sold) = _unpackSchedule(schedule)
+    let res = Auction(
+        nftAddress=terms.nftAddress,
+        tokenId=terms.tokenId,
+        seller=terms.seller,
+        erc20Address=terms.erc20Address,
+        startingPrice=Uint256(terms.startingPrice, 0),
+        discountRate=Uint256(terms.discountRate, 0),
+        startBlock=startBlock,
+        durationBlocks=durationBlocks,
+        sold=sold,
     )
-    auction.write(value=uninitializedAuction)
+    return (res)
+end
+
+
+func _price{range_check_ptr}(
+        thisAuction : Auction,
+        currentBlock : felt,
+    ) -> (
+        res : Uint256
+    ):
+    # Discount = DiscountRate * (CurrentBlock - StartBlock)
+    let blocksElapsed = currentBlock - thisAuction.startBlock
+    let (blocksElapsedUint) = felt_to_uint256(blocksElapsed)
+    let (discount, carry) = uint256_mul(thisAuction.discountRate, blocksElapsedUint)
+    assert carry = Uint256(0, 0)
+
+    # Price = StartPrice - Discount
+    let (res) = uint256_sub(thisAuction.startingPrice, discount)
+    return (res)
+end
+
+
+func _readBatch{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt
+    ) -> (
+        res : BatchState
+    ):
+    alloc_locals
+    let (local units) = batchUnits.read(auctionId)
+    let (demand : BatchDemand) = batchDemands.read(auctionId)
+    return (BatchState(units=units, bids=demand.bids, demand=demand.demand))
+end
+
+
+# Returns price * quantity, quantity being below BATCH_UNITS_BOUND
+func _value{range_check_ptr}(
+        price : Uint256,
+        quantity : felt,
+    ) -> (
+        res : Uint256
+    ):
+    let (res, carry) = uint256_mul(price, Uint256(quantity, 0))
+    assert carry = Uint256(0, 0)
+    return (res)
+end
+
+
+# Fills the bids from `index` on with the units left after `sold`, returns the units sold
+func _settleBids{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        auctionId : felt,
+        thisAuction : Auction,
+        batch : BatchState,
+        clearingPrice : Uint256,
+        index : felt,
+        sold : felt,
+    ) -> (
+        sold : felt
+    ):
+    alloc_locals
+    if index == batch.bids:
+        return (sold)
+    end
+
+    let (local bid : Bid) = batchBids.read(auctionId, index)
+    # Only the last bid can ask for more than what remains
+    let remaining = batch.units - sold
+    let (fits) = is_le(bid.quantity, remaining)
+    local filled = remaining + fits * (bid.quantity - remaining)
+
+    _transferUnits(
+        thisAuction.nftAddress,
+        thisAuction.seller,
+        bid.bidder,
+        Uint256(thisAuction.tokenId.low + sold, thisAuction.tokenId.high),
+        filled,
+    )
+
+    # Refund the escrow beyond the clearing price
+    let (bidPrice) = _price(thisAuction, bid.block)
+    let (escrow) = _value(bidPrice, bid.quantity)
+    let (local paid) = _value(clearingPrice, filled)
+    let (refund) = uint256_sub(escrow, paid)
+    let (refunded) = uint256_eq(refund, Uint256(0, 0))
+    if refunded == FALSE:
+        IERC20.transfer(thisAuction.erc20Address, bid.bidder, refund)
+        tempvar syscall_ptr = syscall_ptr
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        tempvar syscall_ptr = syscall_ptr
+        tempvar range_check_ptr = range_check_ptr
+    end
+
+    Purchase.emit(auctionId, bid.bidder, filled, paid, sold + filled)
+    let (res) = _settleBids(auctionId, thisAuction, batch, clearingPrice, index + 1, sold + filled)
+    return (res)
+end
+
+
+func _transferUnits{
+        syscall_ptr : felt*,
+        range_check_ptr
+    }(
+        nftAddress : felt,
+        seller : felt,
+        buyer : felt,
+        tokenId : Uint256,
+        count : felt,
+    ):
+    if count == 0:
+        return ()
+    end
+
+    IERC721.transferFrom(nftAddress, seller, buyer, tokenId)
+    _transferUnits(
+        nftAddress, seller, buyer, Uint256(tokenId.low + 1, tokenId.high), count - 1)
     return ()
 end
 
 
+# Requires each unit is owned by the seller and on sale in no live auction, then records it
+# as on sale in auctionId
+func _registerUnits{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(
+        nftAddress : felt,
+        seller : felt,
+        auctionId : felt,
+        currentBlock : felt,
+        tokenId : Uint256,
+        count : felt,
+    ):
+    alloc_locals
+    if count == 0:
+        return ()
+    end
+
+    let (previousId) = auctionIds.read(nftAddress, tokenId)
+    let (isLive) = _isLive(previousId, currentBlock)
+    with_attr error_message("auction already initialized"):
+        assert isLive = FALSE
+    end
+    let (tokenOwner) = IERC721.ownerOf(nftAddress, tokenId)
+    with_attr error_message("seller does not own every unit"):
+        assert tokenOwner = seller
+    end
+    auctionIds.write(nftAddress, tokenId, auctionId)
+
+    _registerUnits(
+        nftAddress, seller, auctionId, currentBlock, Uint256(tokenId.low + 1, tokenId.high),
+        count - 1)
+    return ()
+end
+
+
+func _packSchedule{range_check_ptr}(
+        startBlock : felt,
+        durationBlocks : felt,
+        sold : felt,
+    ) -> (
+        schedule : felt
+    ):
+    with_attr error_message("duration out of range"):
+        assert_nn_le(durationBlocks, SCHEDULE_BLOCK_BOUND - 1)
+    end
+    assert_nn_le(startBlock + 1, SCHEDULE_BLOCK_BOUND - 1)
+    return ((startBlock + 1) * SCHEDULE_BLOCK_BOUND * 2 + durationBlocks * 2 + sold)
+end
+
+
+func _unpackSchedule{range_check_ptr}(
+        schedule : felt
+    ) -> (
+        startBlock : felt,
+        durationBlocks : felt,
+        sold : felt,
+    ):
+    # auctions that were never initialized read as all zeros, like the unpacked struct did
+    if schedule == 0:
+        return (0, 0, 0)
+    end
+
+    let (blocks, sold) = unsigned_div_rem(schedule, 2)
+    let (startBlockPlusOne, durationBlocks) = unsigned_div_rem(blocks, SCHEDULE_BLOCK_BOUND)
+    return (startBlockPlusOne - 1, durationBlocks, sold)
+end
+
+
 #
 # Utils
 #
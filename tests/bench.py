@@ -0,0 +1,395 @@
+"""Execution-resource benchmarks for the auction entry points.
+
+Every benchmark invokes one entry point directly (no account, so signature
+validation is not counted) on a copy of a provisioned state and records the
+Cairo steps, builtin usage and storage traffic of the whole transaction,
+internal calls included.
+
+    python -m tests.bench                  # compare against the baseline
+    python -m tests.bench --update         # rewrite the baseline
+    python -m tests.bench --threshold 2    # fail on a >2% regression
+    python -m tests.bench --tiers          # also print steps per precision tier
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+
+from starkware.starknet.business_logic.state import BlockInfo
+
+from tests.pricing import FAST, ONE, PRECISE, PRIME
+from tests.utils import MAX_UINT256, TRUE, empty_starknet, get_contract_def, str_to_felt, to_uint
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 5.0
+
+# Metrics compared against the baseline; everything else is informational
+TRACKED_METRICS = ("n_steps", "builtins", "storage_reads", "storage_writes")
+
+OWNER = 0x1001
+SELLER = 0x1002
+BUYER = 0x1003
+
+START_TIME = 1000
+TOKEN = to_uint(5042)
+
+# initialPrice, scaleFactor, decayConstant, precision
+DISCRETE_PARAMS = (1000 * ONE, 11 * ONE // 10, ONE // 2, PRECISE)
+# initialPrice, emissionRate, decayConstant, precision
+CONTINUOUS_PARAMS = (1000 * ONE, ONE, ONE // 10, PRECISE)
+# precision tiers compared on the same quote, purchase and budget inversion
+TIERS = (("precise", PRECISE), ("fast", FAST))
+TIER_QUANTITY = 5
+
+QUANTITIES = (1, 5, 20)
+# max_purchasable budget, in the 64.61 units prices are quoted in
+BUDGET = to_uint(20000 * ONE)
+SOLD = (0, 20)
+# the discrete quote should not depend on how many tokens were sold
+DISCRETE_SOLD = SOLD + (200,)
+ELAPSED = (0, 60)
+# bids committed to a batch auction before it is settled, one unit each
+BATCH_BIDS = (1, 8)
+
+
+def set_block(starknet_state, block_number=None, timestamp=None):
+    block_info = starknet_state.state.block_info
+    starknet_state.state.block_info = BlockInfo(
+        block_info.block_number if block_number is None else block_number,
+        block_info.block_timestamp if timestamp is None else timestamp,
+    )
+
+
+def storage_values(starknet_state):
+    """Returns {(contract address, storage key): value} of every storage leaf written so far"""
+    return {
+        (address, key): leaf.value
+        for address, contract_state in starknet_state.state.contract_states.items()
+        for key, leaf in contract_state.storage_updates.items()
+    }
+
+
+async def measure(starknet_state, contract_address, selector, calldata, caller_address=0):
+    """Invokes the entry point on a copy of the state and returns its resource usage"""
+    starknet_state = starknet_state.copy()
+    storage_before = storage_values(starknet_state)
+    writes = starknet_state.state.contract_address_to_n_storage_writings
+    writes_before = sum(writes.values())
+
+    execution_info = await starknet_state.invoke_raw(
+        contract_address=contract_address,
+        selector=selector,
+        calldata=calldata,
+        caller_address=caller_address,
+    )
+
+    storage_after = storage_values(starknet_state)
+    builtins = Counter()
+    n_steps = n_memory_holes = storage_reads = 0
+    for call in execution_info.contract_calls:
+        n_steps += call.cairo_usage.n_steps
+        n_memory_holes += call.cairo_usage.n_memory_holes
+        builtins.update(call.cairo_usage.builtin_instance_counter)
+        storage_reads += len(call.storage_read_values)
+
+    return {
+        "n_steps": n_steps,
+        "n_memory_holes": n_memory_holes,
+        "builtins": {name: count for name, count in sorted(builtins.items()) if count},
+        "n_calls": len(execution_info.contract_calls),
+        "storage_reads": storage_reads,
+        "storage_writes": sum(writes.values()) - writes_before,
+        "storage_diff": sum(
+            1 for key, value in storage_after.items() if storage_before.get(key) != value
+        ),
+    }
+
+
+async def _invoke(starknet_state, contract_address, selector, calldata, caller_address=0):
+    return await starknet_state.invoke_raw(
+        contract_address=contract_address,
+        selector=selector,
+        calldata=calldata,
+        caller_address=caller_address,
+    )
+
+
+def _grid():
+    """purchase_price_batch calldata covering every quantity and elapsed time benchmarked"""
+    return [len(QUANTITIES), *QUANTITIES, len(ELAPSED), *ELAPSED]
+
+
+async def _deploy(starknet, path, constructor_calldata=None):
+    contract = await starknet.deploy(
+        contract_def=get_contract_def(path), constructor_calldata=constructor_calldata)
+    return contract.contract_address
+
+
+async def bench_discrete_gda(starknet):
+    results = {}
+    address = await _deploy(starknet, "contracts/discreteGDA.cairo", [
+        str_to_felt("NFT"), str_to_felt("NFT"), OWNER, *DISCRETE_PARAMS])
+
+    for sold in DISCRETE_SOLD:
+        state = starknet.state.copy()
+        if sold:
+            await _invoke(state, address, "purchaseTokens", [sold, BUYER, *MAX_UINT256])
+        for elapsed in ELAPSED:
+            set_block(state, timestamp=START_TIME + elapsed)
+            results["discreteGDA.max_purchasable[sold=%d,elapsed=%d]" % (sold, elapsed)] = (
+                await measure(state, address, "max_purchasable", list(BUDGET)))
+            for quantity in QUANTITIES:
+                label = "quantity=%d,sold=%d,elapsed=%d" % (quantity, sold, elapsed)
+                results["discreteGDA.purchase_price[%s]" % label] = await measure(
+                    state, address, "purchase_price", [quantity])
+                results["discreteGDA.purchaseTokens[%s]" % label] = await measure(
+                    state, address, "purchaseTokens", [quantity, BUYER, *MAX_UINT256])
+        set_block(state, timestamp=START_TIME)
+        results["discreteGDA.purchase_price_batch[sold=%d]" % sold] = await measure(
+            state, address, "purchase_price_batch", _grid())
+    return results
+
+
+async def bench_continuous_gda(starknet):
+    results = {}
+    address = await _deploy(starknet, "contracts/continuousGDA.cairo", [
+        str_to_felt("TKN"), str_to_felt("TKN"), OWNER, *CONTINUOUS_PARAMS])
+
+    for sold in SOLD:
+        state = starknet.state.copy()
+        if sold:
+            set_block(state, timestamp=START_TIME + sold)
+            await _invoke(state, address, "purchaseTokens", [sold, BUYER, *MAX_UINT256])
+        for elapsed in ELAPSED:
+            # sold tokens took `sold` seconds of emissions
+            set_block(state, timestamp=START_TIME + sold + elapsed + max(QUANTITIES))
+            results["continuousGDA.max_purchasable[sold=%d,elapsed=%d]" % (sold, elapsed)] = (
+                await measure(state, address, "max_purchasable", list(BUDGET)))
+            for quantity in QUANTITIES:
+                label = "quantity=%d,sold=%d,elapsed=%d" % (quantity, sold, elapsed)
+                results["continuousGDA.purchase_price[%s]" % label] = await measure(
+                    state, address, "purchase_price", [quantity])
+                results["continuousGDA.purchaseTokens[%s]" % label] = await measure(
+                    state, address, "purchaseTokens", [quantity, BUYER, *MAX_UINT256])
+        set_block(state, timestamp=START_TIME + sold + max(QUANTITIES))
+        results["continuousGDA.purchase_price_batch[sold=%d]" % sold] = await measure(
+            state, address, "purchase_price_batch", _grid())
+    return results
+
+
+async def bench_precision_tiers(starknet):
+    results = {}
+    gdas = (
+        ("discreteGDA", "NFT", DISCRETE_PARAMS, 0),
+        # the continuous GDA needs TIER_QUANTITY tokens emitted to sell them
+        ("continuousGDA", "TKN", CONTINUOUS_PARAMS, TIER_QUANTITY),
+    )
+    for contract, symbol, params, emission_wait in gdas:
+        for tier, precision in TIERS:
+            address = await _deploy(starknet, "contracts/%s.cairo" % contract, [
+                str_to_felt(symbol), str_to_felt(symbol), OWNER, *params[:-1], precision])
+            state = starknet.state.copy()
+            set_block(state, timestamp=START_TIME + max(ELAPSED) + emission_wait)
+            label = "tier=%s,quantity=%d" % (tier, TIER_QUANTITY)
+            results["%s.purchase_price[%s]" % (contract, label)] = await measure(
+                state, address, "purchase_price", [TIER_QUANTITY])
+            results["%s.purchaseTokens[%s]" % (contract, label)] = await measure(
+                state, address, "purchaseTokens", [TIER_QUANTITY, BUYER, *MAX_UINT256])
+            results["%s.max_purchasable[tier=%s]" % (contract, tier)] = await measure(
+                state, address, "max_purchasable", list(BUDGET))
+    return results
+
+
+def format_tiers(results):
+    """Renders the precision tier benchmarks as a markdown table of steps per tier"""
+    names = [tier for tier, _ in TIERS]
+    rows = {}
+    for name, usage in results.items():
+        for tier in names:
+            prefix = "tier=%s" % tier
+            if prefix in name:
+                rows.setdefault(name.replace(prefix, "tier=*"), {})[tier] = usage["n_steps"]
+    lines = [
+        "| benchmark | %s | saved |" % " | ".join(names),
+        "|---|" + "---|" * (len(names) + 1),
+    ]
+    for row, steps in sorted(rows.items()):
+        saved = 1 - steps[names[-1]] / steps[names[0]]
+        lines.append("| %s | %s | %.0f%% |" % (
+            row, " | ".join(str(steps[tier]) for tier in names), 100 * saved))
+    return "\n".join(lines)
+
+
+async def bench_dutch(starknet):
+    results = {}
+    starting_price = to_uint(1000)
+    erc721 = await _deploy(starknet, "openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo", [
+        str_to_felt("Non Fungible Token"), str_to_felt("NFT"), OWNER])
+    erc20 = await _deploy(starknet, "openzeppelin/token/erc20/ERC20_Mintable.cairo", [
+        str_to_felt("Mintable Token"), str_to_felt("MTKN"), 18, *starting_price, BUYER, OWNER])
+    address = await _deploy(starknet, "contracts/dutch.cairo")
+
+    state = starknet.state
+    await _invoke(state, erc721, "mint", [SELLER, *TOKEN], caller_address=OWNER)
+    await _invoke(state, erc721, "setApprovalForAll", [address, TRUE], caller_address=SELLER)
+    await _invoke(state, erc20, "approve", [address, *starting_price], caller_address=BUYER)
+
+    initialize = [erc721, *TOKEN, erc20, *starting_price, *to_uint(1), 1000]
+    results["dutch.initialize"] = await measure(
+        state, address, "initialize", initialize, caller_address=SELLER)
+    execution_info = await _invoke(state, address, "initialize", initialize, caller_address=SELLER)
+    auction_id, = execution_info.retdata
+
+    start_block = state.state.block_info.block_number
+    for elapsed in ELAPSED:
+        set_block(state, block_number=start_block + elapsed)
+        label = "elapsed=%d" % elapsed
+        results["dutch.getPrice[%s]" % label] = await measure(
+            state, address, "getPrice", [auction_id])
+        results["dutch.buy[%s]" % label] = await measure(
+            state, address, "buy", [auction_id, *starting_price], caller_address=BUYER)
+    return results
+
+
+async def bench_dutch_batch(starknet):
+    results = {}
+    erc721 = await _deploy(starknet, "openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo", [
+        str_to_felt("Non Fungible Token"), str_to_felt("NFT"), OWNER])
+    erc20 = await _deploy(starknet, "openzeppelin/token/erc20/ERC20_Mintable.cairo", [
+        str_to_felt("Mintable Token"), str_to_felt("MTKN"), 18, *to_uint(0), OWNER, OWNER])
+    address = await _deploy(starknet, "contracts/dutch.cairo")
+
+    state = starknet.state
+    units = max(BATCH_BIDS)
+    bidders = [BUYER + i for i in range(units)]
+    for i in range(units):
+        await _invoke(state, erc721, "mint", [SELLER, *to_uint(i)], caller_address=OWNER)
+    await _invoke(state, erc721, "setApprovalForAll", [address, TRUE], caller_address=SELLER)
+    for bidder in bidders:
+        await _invoke(state, erc20, "mint", [bidder, *to_uint(1000)], caller_address=OWNER)
+        await _invoke(state, erc20, "approve", [address, *to_uint(1000)], caller_address=bidder)
+
+    # one unit per bid, so settlement cost divided by bids is the cost per unit
+    for bids in BATCH_BIDS:
+        auction = state.copy()
+        execution_info = await _invoke(auction, address, "initializeBatch", [
+            erc721, *to_uint(0), erc20, *to_uint(1000), *to_uint(1), 1000, bids],
+            caller_address=SELLER)
+        auction_id, = execution_info.retdata
+        start_block = auction.state.block_info.block_number
+        for i, bidder in enumerate(bidders[:bids]):
+            set_block(auction, block_number=start_block + i)
+            # the bid that completes the batch, labelled like the settlement that follows
+            if i == bids - 1:
+                results["dutch.commitBid[bids=%d]" % bids] = await measure(
+                    auction, address, "commitBid", [auction_id, 1], caller_address=bidder)
+            await _invoke(auction, address, "commitBid", [auction_id, 1], caller_address=bidder)
+        results["dutch.settle[bids=%d]" % bids] = await measure(
+            auction, address, "settle", [auction_id])
+    return results
+
+
+async def bench_math(starknet):
+    results = {}
+    address = await _deploy(starknet, "tests/mocks/Math64x61_mock.cairo")
+    state = starknet.state
+
+    for label, x in (("1/3", ONE // 3), ("1.5", 3 * ONE // 2), ("1000", 1000 * ONE), ("2^40", 2 ** 40 * ONE)):
+        for name in ("log2", "log2_fast", "ln", "ln_fast"):
+            results["Math64x61_%s[x=%s]" % (name, label)] = await measure(
+                state, address, name, [x])
+    for label, x in (("1.5", 3 * ONE // 2), ("-3", -3 * ONE % PRIME), ("40", 40 * ONE)):
+        for name in ("exp", "exp_fast"):
+            results["Math64x61_%s[x=%s]" % (name, label)] = await measure(
+                state, address, name, [x])
+    for label, x, y in (("1.5^0.5", 3 * ONE // 2, ONE // 2), ("5^1.25", 5 * ONE, 5 * ONE // 4), ("1.1^20", 11 * ONE // 10, 20 * ONE)):
+        results["Math64x61_pow[%s]" % label] = await measure(state, address, "pow", [x, y])
+    return results
+
+
+BENCHMARKS = (
+    bench_discrete_gda, bench_continuous_gda, bench_precision_tiers, bench_dutch, bench_dutch_batch,
+    bench_math)
+
+
+async def run_benchmarks(benchmarks=BENCHMARKS):
+    """Returns {benchmark name: resource usage} for every tracked entry point"""
+    starknet = await empty_starknet()
+    set_block(starknet.state, block_number=1, timestamp=START_TIME)
+
+    results = {}
+    for bench in benchmarks:
+        results.update(await bench(starknet))
+    return dict(sorted(results.items()))
+
+
+def _flatten(usage):
+    for metric in TRACKED_METRICS:
+        if isinstance(usage.get(metric), dict):
+            for name, value in usage[metric].items():
+                yield "%s.%s" % (metric, name), value
+        elif metric in usage:
+            yield metric, usage[metric]
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """Returns a description of every tracked metric that regressed by more than threshold %"""
+    regressions = []
+    for name, expected_usage in baseline.items():
+        if name not in results:
+            regressions.append("%s: no longer benchmarked" % name)
+            continue
+        observed = dict(_flatten(results[name]))
+        for metric, expected in _flatten(expected_usage):
+            value = observed.get(metric, 0)
+            if value > expected * (1 + threshold / 100):
+                regressions.append("%s: %s %d -> %d (+%.1f%%)" % (
+                    name, metric, expected, value, 100 * (value - expected) / max(expected, 1)))
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--update", action="store_true", help="overwrite the baseline")
+    parser.add_argument(
+        "--tiers", action="store_true", help="print the steps of each precision tier")
+    parser.add_argument(
+        "--threshold", type=float,
+        default=float(os.environ.get("BENCH_THRESHOLD", DEFAULT_THRESHOLD)),
+        help="allowed regression in percent (default: $BENCH_THRESHOLD or %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.get_event_loop().run_until_complete(run_benchmarks())
+    if args.output:
+        dump_results(results, args.output)
+    if args.tiers:
+        print(format_tiers(results))
+    if args.update:
+        dump_results(results, args.baseline)
+        return 0
+
+    regressions = compare(load_baseline(args.baseline), results, args.threshold)
+    for regression in regressions:
+        print(regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
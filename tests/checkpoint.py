@@ -0,0 +1,184 @@
+"""On-disk checkpoints of provisioned Starknet worlds.
+
+Provisioning a world, deploying the auctions and accounts, minting and
+approving, replays the same transactions on every run. checkpointed() wraps
+an async setup function: the first run provisions and pickles what the setup
+returns, Starknet states and deployed contracts included, and later runs load
+it back instead. The setup returns the contracts it deployed, or their
+addresses, and they come back bound to the restored state.
+
+A checkpoint is keyed by the cairo-lang version, every contract source
+(SOURCE_DIRS), the module of the setup with the tests modules it imports,
+the setup name and the repr of its arguments. Any change to them provisions
+a new checkpoint. The compiled contract definitions are stored by reference
+to the contract cache, so a checkpoint holds only the state and loads in
+milliseconds once the definitions are in memory.
+
+    @pytest.fixture(scope="session")
+    @checkpointed
+    async def base_world():
+        ...
+
+Checkpoints live under CHECKPOINT_DIR, by default CONTRACT_CACHE_DIR/checkpoints.
+Delete the directory to provision every world again.
+"""
+
+import copyreg
+import functools
+import hashlib
+import inspect
+import os
+import re
+
+import dill
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
+from starkware.starknet.services.api.contract_definition import ContractDefinition
+from starkware.starknet.testing.contract import StarknetContract
+
+from tests.utils import CONTRACT_CACHE_DIR, _contract_defs, _load_cached
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# directories of the Cairo sources a world can be deployed from
+SOURCE_DIRS = ("contracts", "openzeppelin", os.path.join("tests", "mocks"))
+
+CHECKPOINT_DIR = os.environ.get(
+    "CHECKPOINT_DIR", os.path.join(CONTRACT_CACHE_DIR, "checkpoints"))
+
+_TESTS_IMPORT = re.compile(r"^\s*(?:from|import)\s+(tests(?:\.\w+)*)", re.MULTILINE)
+# from tests import bench, pricing
+_TESTS_SUBMODULES = re.compile(r"^\s*from\s+tests\s+import\s+([\w, ]+)$", re.MULTILINE)
+
+
+def _module_path(module):
+    path = os.path.join(ROOT, *module.split("."))
+    return path + ".py" if os.path.exists(path + ".py") else os.path.join(path, "__init__.py")
+
+
+def script_sources(path):
+    """Returns the script and every tests module it transitively imports"""
+    seen = set()
+    pending = [path]
+    while pending:
+        current = os.path.normpath(pending.pop())
+        if current in seen or not os.path.exists(current):
+            continue
+        seen.add(current)
+        with open(current) as f:
+            source = f.read()
+        pending.extend(_module_path(module) for module in _TESTS_IMPORT.findall(source))
+        for names in _TESTS_SUBMODULES.findall(source):
+            pending.extend(_module_path("tests." + name.strip()) for name in names.split(","))
+    return sorted(seen)
+
+
+def sources_hash():
+    """Returns a content hash of every Cairo source under SOURCE_DIRS"""
+    digest = hashlib.sha256()
+    for source_dir in SOURCE_DIRS:
+        for directory, _, files in sorted(os.walk(os.path.join(ROOT, source_dir))):
+            for name in sorted(files):
+                if not name.endswith(".cairo"):
+                    continue
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, ROOT).encode())
+                with open(path, "rb") as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def checkpoint_key(setup, args):
+    """Returns the key of the world setup(*args) provisions, see the module docstring"""
+    digest = hashlib.sha256(CAIRO_LANG_VERSION.encode())
+    digest.update(sources_hash().encode())
+    for source in script_sources(inspect.getsourcefile(setup)):
+        digest.update(os.path.relpath(source, ROOT).encode())
+        with open(source, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(("%s.%s%r" % (setup.__module__, setup.__qualname__, args)).encode())
+    return digest.hexdigest()
+
+
+def _checkpoint_path(key):
+    return os.path.join(CHECKPOINT_DIR, key + ".pickle")
+
+
+def _contract_at(state, contract_address, deploy_execution_info):
+    carried_state = state.state
+    contract_hash = carried_state.contract_states[contract_address].state.contract_hash
+    return StarknetContract(
+        state=state,
+        abi=carried_state.contract_definitions[contract_hash].abi,
+        contract_address=contract_address,
+        deploy_execution_info=deploy_execution_info,
+    )
+
+
+def _reduce_contract(contract):
+    # the ABI is rebuilt from the definition instead of pickling the structs made from it
+    return _contract_at, (contract.state, contract.contract_address, contract.deploy_execution_info)
+
+
+class _CheckpointPickler(dill.Pickler):
+    """Pickles contract definitions of the contract cache as their cache path"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        self.dispatch_table[StarknetContract] = _reduce_contract
+        self._cache_paths = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, ContractDefinition):
+            return None
+        if id(obj) not in self._cache_paths:
+            # a deployed state holds its own copy of the definition it was given
+            self._cache_paths[id(obj)] = next((
+                cache_path for cache_path, contract_def in _contract_defs.items()
+                if contract_def is obj or contract_def == obj
+            ), None)
+        return self._cache_paths[id(obj)]
+
+
+class _CheckpointUnpickler(dill.Unpickler):
+    def persistent_load(self, cache_path):
+        contract_def = _contract_defs.get(cache_path) or _load_cached(cache_path)
+        if contract_def is None:
+            raise dill.UnpicklingError("%s left the contract cache" % cache_path)
+        _contract_defs[cache_path] = contract_def
+        return contract_def
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, "rb") as f:
+            return True, _CheckpointUnpickler(f).load()
+    except (OSError, EOFError, dill.UnpicklingError):
+        return False, None
+
+
+def _store_checkpoint(path, world):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    # write then rename so concurrent workers never read a partial file
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        _CheckpointPickler(f, protocol=dill.HIGHEST_PROTOCOL).dump(world)
+    os.replace(tmp_path, path)
+
+
+async def load_or_provision(setup, *args):
+    """Returns what setup(*args) returns, loaded from its checkpoint when there is one"""
+    path = _checkpoint_path(checkpoint_key(setup, args))
+    found, world = _load_checkpoint(path)
+    if not found:
+        world = await setup(*args)
+        _store_checkpoint(path, world)
+    return world
+
+
+def checkpointed(setup):
+    """Decorates an async setup function to provision its world once, see load_or_provision"""
+    @functools.wraps(setup)
+    async def wrapper(*args):
+        return await load_or_provision(setup, *args)
+    return wrapper
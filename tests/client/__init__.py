@@ -0,0 +1,47 @@
+"""Client helpers for scripts that talk to the auctions without the test harness.
+
+    from tests.client import Signer, hash_multicall, str_to_felt, to_uint
+
+Importing the package loads none of its submodules. Each helper imports its
+submodule on first use, and no submodule imports starkware.crypto (and with
+it sympy), the Cairo compiler or the testing Starknet, so a script that
+hashes and signs a transaction starts in a fraction of the time importing
+tests.utils takes. tests/test_client.py holds that cold start to a budget.
+
+  - felt: str_to_felt, to_uint, from_uint and the other Uint256 helpers
+  - crypto: pedersen_hash, compute_hash_on_elements, starknet_keccak
+  - transactions: get_selector, hash_multicall, NonceManager, TransactionBuilder
+  - signing: the signing backends, see tests/client/signing.py
+  - signer: Signer
+"""
+
+import importlib
+
+
+# exported name -> submodule defining it
+_EXPORTS = {
+    **{name: "felt" for name in (
+        "FALSE", "MAX_UINT256", "TRUE", "ZERO_ADDRESS", "add_uint", "div_rem_uint",
+        "felt_to_str", "from_uint", "mul_uint", "str_to_felt", "sub_uint", "to_uint", "uint")},
+    **{name: "crypto" for name in (
+        "compute_hash_on_elements", "pedersen_hash", "starknet_keccak")},
+    **{name: "transactions" for name in (
+        "TRANSACTION_VERSION", "NonceManager", "TransactionBuilder", "from_call_to_call_array",
+        "get_selector", "hash_multicall")},
+    **{name: "signing" for name in ("StarkwareBackend", "TableBackend")},
+    "Signer": "signer",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("%s.%s" % (__name__, _EXPORTS[name])), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
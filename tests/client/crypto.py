@@ -0,0 +1,101 @@
+"""Stark curve primitives without starkware.crypto.
+
+starkware.crypto.signature imports sympy, which takes most of a second.
+The few primitives a client needs are rebuilt here on fastecdsa, with the
+curve constants of starkware/crypto/signature/pedersen_params.json.
+tests/test_client.py checks them against starkware's.
+"""
+
+import functools
+import hashlib
+import math
+
+from ecdsa.rfc6979 import generate_k
+from eth_hash.auto import keccak
+from fastecdsa.curve import Curve
+from fastecdsa.point import Point
+
+
+FIELD_PRIME = 0x800000000000011000000000000000000000000000000000000000000000001
+ALPHA = 1
+BETA = 0x6F21413EFBE40DE150E596D72F7A8C5609AD26C15C915C1F4CDFCB99CEE9E89
+EC_ORDER = 0x800000000000010FFFFFFFFFFFFFFFFB781126DCAE7B2321E66A241ADC64D2F
+EC_GEN = (
+    0x1EF15C18599971B7BECED415A40F0C7DEACFD9B0D1819E03D723D8BC943CFCA,
+    0x5668060AA49730B7BE4801DF46EC62DE53ECD11ABE43A32873000C36E8DC1F,
+)
+N_ELEMENT_BITS_ECDSA = 251
+
+STARK_CURVE = Curve("Stark", FIELD_PRIME, ALPHA, BETA, EC_ORDER, *EC_GEN)
+
+# Pedersen hash points: CONSTANT_POINTS[0], [2], [2 + 248], [2 + 252] and [2 + 252 + 248]
+HASH_SHIFT_POINT = Point(
+    0x49EE3EBA8C1600700EE1B87EB599F16716B0B1022947733551FDE4050CA6804,
+    0x3CA0CFE4B3BC6DDF346D49D06EA0ED34E621062C0E056C1D0405D266E10268A,
+    curve=STARK_CURVE,
+)
+P_0 = Point(
+    0x234287DCBAFFE7F969C748655FCA9E58FA8120B6D56EB0C1080D17957EBE47B,
+    0x3B056F100F96FB21E889527D41F4E39940135DD7A6C94CC6ED0268EE89E5615,
+    curve=STARK_CURVE,
+)
+P_1 = Point(
+    0x4FA56F376C83DB33F9DAB2656558F3399099EC1DE5E3018B7A6932DBA8AA378,
+    0x3FA0984C931C9E38113E0C0E47E4401562761F92A7A23B45168F4E80FF5B54D,
+    curve=STARK_CURVE,
+)
+P_2 = Point(
+    0x4BA4CC166BE8DEC764910F75B45F74B40C690C74709E90F3AA372F0BD2D6997,
+    0x40301CF5C1751F4B971E46C4EDE85FCAC5C59A5CE5AE7C48151F27B24B219C,
+    curve=STARK_CURVE,
+)
+P_3 = Point(
+    0x54302DCB0E6CC1C6E44CCA8F61A63BB2CA65048D53FB325D36FF12C49A58202,
+    0x1B77B3E37D13504B348046268D8AE25CE98AD783C25561A879DCC77E99C2426,
+    curve=STARK_CURVE,
+)
+
+LOW_PART_BITS = 248
+LOW_PART_MASK = 2 ** LOW_PART_BITS - 1
+MASK_250 = 2 ** 250 - 1
+
+
+def _process_element(element, low_point, high_point):
+    assert 0 <= element < FIELD_PRIME, "Element integer value >= FIELD_PRIME"
+    return (element & LOW_PART_MASK) * low_point + (element >> LOW_PART_BITS) * high_point
+
+
+def pedersen_hash(x, y):
+    """starkware's pedersen_hash of two field elements"""
+    return (HASH_SHIFT_POINT + _process_element(x, P_0, P_1) + _process_element(y, P_2, P_3)).x
+
+
+def compute_hash_on_elements(data):
+    """h(h(h(h(0, data[0]), data[1]), ...), data[n-1]), n), as starkware's hash_state"""
+    return functools.reduce(pedersen_hash, [*data, len(data)], 0)
+
+
+def starknet_keccak(data):
+    """Keccak-256 of the bytes, truncated to 250 bits"""
+    return int.from_bytes(keccak(data), "big") & MASK_250
+
+
+def generate_k_rfc6979(msg_hash, priv_key, seed=None):
+    """starkware's RFC 6979 signature nonce"""
+    # Pad the message hash, for consistency with the elliptic.js library.
+    if 1 <= msg_hash.bit_length() % 8 <= 4 and msg_hash.bit_length() >= 248:
+        # Only if we are one-nibble short:
+        msg_hash *= 16
+
+    if seed is None:
+        extra_entropy = b""
+    else:
+        extra_entropy = seed.to_bytes(math.ceil(seed.bit_length() / 8), "big")
+
+    return generate_k(
+        EC_ORDER,
+        priv_key,
+        hashlib.sha256,
+        msg_hash.to_bytes(math.ceil(msg_hash.bit_length() / 8), "big"),
+        extra_entropy=extra_entropy,
+    )
@@ -0,0 +1,69 @@
+"""Signs and sends multicalls from an Account."""
+
+from tests.client.signing import DEFAULT_BACKEND
+from tests.client.transactions import from_call_to_call_array, hash_multicall
+
+
+class Signer():
+    """
+    Utility for sending signed transactions to an Account on Starknet.
+
+    Parameters
+    ----------
+
+    private_key : int
+
+    backend : signing backend, see tests/client/signing.py (default: TableBackend)
+
+    Examples
+    ---------
+    Constructing a Signer object
+
+    >>> signer = Signer(1234)
+
+    Sending a transaction
+
+    >>> await signer.send_transaction(account,
+                                      account.contract_address,
+                                      'set_public_key',
+                                      [other.public_key]
+                                     )
+
+    """
+
+    def __init__(self, private_key, backend=DEFAULT_BACKEND):
+        self.private_key = private_key
+        self.backend = backend
+        self.public_key = backend.public_key(private_key)
+
+    def sign(self, message_hash):
+        return self.backend.sign(message_hash, self.private_key)
+
+    def sign_many(self, message_hashes, max_workers=None):
+        """Returns the signature of each message hash, large batches are signed in parallel"""
+        return self.backend.sign_many(message_hashes, self.private_key, max_workers)
+
+    def hash_transaction(self, sender, calls, nonce, max_fee=0):
+        """Returns the call array, calldata and message hash of an __execute__ multicall"""
+        (call_array, calldata) = from_call_to_call_array(calls)
+        calls_with_selector = [
+            (call[0], entry[1], call[2]) for call, entry in zip(calls, call_array)]
+        message_hash = hash_multicall(sender, calls_with_selector, nonce, max_fee)
+        return call_array, calldata, message_hash
+
+    def sign_transaction(self, sender, calls, nonce, max_fee=0):
+        """Returns the call array, calldata and signature of an __execute__ multicall"""
+        call_array, calldata, message_hash = self.hash_transaction(sender, calls, nonce, max_fee)
+        return call_array, calldata, list(self.sign(message_hash))
+
+    async def send_transaction(self, account, to, selector_name, calldata, nonce=None, max_fee=0):
+        return await self.send_transactions(account, [(to, selector_name, calldata)], nonce, max_fee)
+
+    async def send_transactions(self, account, calls, nonce=None, max_fee=0):
+        if nonce is None:
+            execution_info = await account.get_nonce().call()
+            nonce, = execution_info.result
+
+        call_array, calldata, signature = self.sign_transaction(
+            account.contract_address, calls, nonce, max_fee)
+        return await account.__execute__(call_array, calldata, nonce).invoke(signature=signature)
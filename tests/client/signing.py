@@ -0,0 +1,194 @@
+"""Stark curve ECDSA signing backends for Signer.
+
+Every backend produces the signatures of starkware's sign() bit for bit: the
+nonce k is drawn the same RFC 6979 way and retried the same way, only the
+arithmetic differs.
+
+  - StarkwareBackend calls starkware's sign(), which multiplies points in
+    pure Python (about 40ms a signature).
+  - TableBackend, the default, multiplies the generator with a table of its
+    precomputed multiples, one row per byte of the scalar, so a signature
+    costs 32 point additions and two modular inversions (under 1ms). The
+    table is built once per process with fastecdsa, at the TABLE_AFTER-th
+    multiplication or for a batch that large. Until then fastecdsa
+    multiplies the generator directly (about 2ms), so a short-lived script
+    signing a few transactions does not pay for the table.
+
+sign_many() signs a batch across a process pool. Worker processes are forked
+after the table is built, so they share it instead of building their own.
+Only StarkwareBackend imports starkware.crypto, on first use.
+
+    backend = TableBackend()
+    r, s = backend.sign(message_hash, private_key)
+    signatures = backend.sign_many(message_hashes, private_key)
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from fastecdsa.point import Point
+
+from tests.client.crypto import (
+    EC_GEN,
+    EC_ORDER,
+    FIELD_PRIME,
+    N_ELEMENT_BITS_ECDSA,
+    STARK_CURVE,
+    generate_k_rfc6979,
+)
+
+GENERATOR = Point(*EC_GEN, curve=STARK_CURVE)
+
+# Bits of the scalar per table row
+WINDOW_BITS = 8
+# Building the table takes about 0.25s and then saves about 1.6ms a multiplication
+TABLE_AFTER = 128
+# Batches smaller than this are signed in the calling process, forking a pool costs more
+POOL_MIN_BATCH = 256
+
+
+@functools.lru_cache(maxsize=None)
+def generator_table():
+    """Returns rows[i][d], the affine coordinates of d * 2^(WINDOW_BITS * i) * EC_GEN
+
+    rows[i][0] is None, the point at infinity.
+    """
+    rows = []
+    base = GENERATOR
+    for _ in range(0, EC_ORDER.bit_length(), WINDOW_BITS):
+        row = [None]
+        point = base
+        for _ in range(1, 2 ** WINDOW_BITS):
+            row.append((point.x, point.y))
+            point += base
+        rows.append(row)
+        for _ in range(WINDOW_BITS):
+            base += base
+    return rows
+
+
+_direct_multiplications = 0
+
+
+def multiply_generator(k):
+    """Returns the x coordinate of k * EC_GEN, for 0 < k < EC_ORDER"""
+    global _direct_multiplications
+    if generator_table.cache_info().currsize == 0 and _direct_multiplications < TABLE_AFTER:
+        _direct_multiplications += 1
+        return (k * GENERATOR).x
+    return _multiply_with_table(k)
+
+
+def _multiply_with_table(k):
+    p = FIELD_PRIME
+    mask = 2 ** WINDOW_BITS - 1
+    rows = generator_table()
+
+    # Jacobian coordinates, adding the affine table points
+    x = y = z = None
+    digits = k
+    for row in rows:
+        digit = digits & mask
+        digits >>= WINDOW_BITS
+        if not digit:
+            continue
+        x2, y2 = row[digit]
+        if x is None:
+            x, y, z = x2, y2, 1
+            continue
+        zz = z * z % p
+        h = (x2 * zz - x) % p
+        r = (y2 * z * zz - y) % p
+        if h == 0:
+            # doubling or cancelling, only reachable by a partial sum equal to a table point
+            return (k * GENERATOR).x
+        hh = h * h % p
+        hhh = h * hh % p
+        v = x * hh
+        x3 = (r * r - hhh - 2 * v) % p
+        y = (r * (v - x3) - y * hhh) % p
+        z = z * h % p
+        x = x3
+
+    z_inverse = pow(z, p - 2, p)
+    return x * z_inverse * z_inverse % p
+
+
+def _inverse_mod_order(x):
+    return pow(x, EC_ORDER - 2, EC_ORDER)
+
+
+class StarkwareBackend():
+    """Signs with starkware's reference implementation"""
+
+    def public_key(self, private_key):
+        from starkware.crypto.signature.signature import private_to_stark_key
+        return private_to_stark_key(private_key)
+
+    def sign(self, message_hash, private_key):
+        from starkware.crypto.signature.signature import sign
+        return sign(msg_hash=message_hash, priv_key=private_key)
+
+    def sign_many(self, message_hashes, private_key, max_workers=None):
+        """Returns the signature of each message hash, signing large batches in parallel"""
+        message_hashes = list(message_hashes)
+        self._prepare(len(message_hashes))
+        workers = max_workers or os.cpu_count() or 1
+        if workers == 1 or len(message_hashes) < POOL_MIN_BATCH:
+            return [self.sign(message_hash, private_key) for message_hash in message_hashes]
+
+        chunk_size = -(-len(message_hashes) // workers)
+        chunks = [
+            message_hashes[i:i + chunk_size] for i in range(0, len(message_hashes), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                functools.partial(_sign_chunk, self, private_key), chunks)
+            return [signature for chunk in results for signature in chunk]
+
+    def _prepare(self, batch_size):
+        """Builds what signing the batch needs, before workers are forked to inherit it"""
+
+
+class TableBackend(StarkwareBackend):
+    """Signs with a precomputed table of multiples of the generator"""
+
+    def public_key(self, private_key):
+        assert 0 < private_key < EC_ORDER
+        return multiply_generator(private_key)
+
+    def sign(self, message_hash, private_key):
+        # same steps as starkware.crypto.signature.signature.sign
+        assert 0 <= message_hash < 2 ** N_ELEMENT_BITS_ECDSA, "Message not signable."
+
+        seed = None
+        while True:
+            k = generate_k_rfc6979(message_hash, private_key, seed)
+            seed = 1 if seed is None else seed + 1
+
+            r = multiply_generator(k)
+            if not 1 <= r < 2 ** N_ELEMENT_BITS_ECDSA:
+                continue
+
+            m = (message_hash + r * private_key) % EC_ORDER
+            if m == 0:
+                continue
+
+            # w = k / m and s = 1 / w = m / k share the inverse of k * m
+            inverse = _inverse_mod_order(k * m)
+            w = k * k * inverse % EC_ORDER
+            if not 1 <= w < 2 ** N_ELEMENT_BITS_ECDSA:
+                continue
+
+            return r, m * m * inverse % EC_ORDER
+
+    def _prepare(self, batch_size):
+        if batch_size >= min(TABLE_AFTER, POOL_MIN_BATCH):
+            generator_table()
+
+
+def _sign_chunk(backend, private_key, message_hashes):
+    return [backend.sign(message_hash, private_key) for message_hash in message_hashes]
+
+
+DEFAULT_BACKEND = TableBackend()
@@ -0,0 +1,130 @@
+"""Multicall transaction hashes, and sending transactions with local nonces."""
+
+import asyncio
+import functools
+
+from tests.client.crypto import compute_hash_on_elements, starknet_keccak
+from tests.client.felt import str_to_felt
+
+
+TRANSACTION_VERSION = 0
+
+DEFAULT_ENTRY_POINT_NAMES = ("__default__", "__l1_default__")
+
+
+@functools.lru_cache(maxsize=None)
+def get_selector(name):
+    """starkware's get_selector_from_name, computed once per name"""
+    if name in DEFAULT_ENTRY_POINT_NAMES:
+        return 0
+    return starknet_keccak(name.encode("ascii"))
+
+
+def from_call_to_call_array(calls):
+    call_array = []
+    calldata = []
+    for i, call in enumerate(calls):
+        assert len(call) == 3, "Invalid call parameters"
+        entry = (call[0], get_selector(call[1]), len(calldata), len(call[2]))
+        call_array.append(entry)
+        calldata.extend(call[2])
+    return (call_array, calldata)
+
+
+@functools.lru_cache(maxsize=4096)
+def _hash_call(to, selector, calldata):
+    return compute_hash_on_elements([to, selector, compute_hash_on_elements(calldata)])
+
+
+def hash_multicall(sender, calls, nonce, max_fee):
+    # bots repeat the same calls with new nonces, only the outer hash changes
+    hash_array = [_hash_call(call[0], call[1], tuple(call[2])) for call in calls]
+
+    message = [
+        str_to_felt('StarkNet Transaction'),
+        sender,
+        compute_hash_on_elements(hash_array),
+        nonce,
+        max_fee,
+        TRANSACTION_VERSION
+    ]
+    return compute_hash_on_elements(message)
+
+
+class NonceManager():
+    """Hands out account nonces locally, fetching each account's nonce only once.
+
+    Accounts are tracked by object, so the rebound accounts of every fork
+    get their own nonces. Call resync() after a failed transaction to fetch
+    the nonce again on next use.
+    """
+
+    def __init__(self):
+        self._nonces = {}
+        self._locks = {}
+
+    async def reserve(self, account, count=1):
+        """Returns the first of count consecutive nonces reserved for account"""
+        lock = self._locks.setdefault(account, asyncio.Lock())
+        async with lock:
+            if account not in self._nonces:
+                execution_info = await account.get_nonce().call()
+                self._nonces[account], = execution_info.result
+            nonce = self._nonces[account]
+            self._nonces[account] = nonce + count
+        return nonce
+
+    def resync(self, account):
+        self._nonces.pop(account, None)
+
+
+class TransactionBuilder():
+    """Signs and sends multicalls from one account without fetching its nonce every time.
+
+    Examples
+    ---------
+    Sending many purchases back to back
+
+    >>> builder = TransactionBuilder(signer, account)
+    >>> await builder.send_many([
+            [(gda.contract_address, 'purchaseTokens', [1, account.contract_address, *MAX_UINT256])]
+            for _ in range(100)
+        ])
+
+    """
+
+    def __init__(self, signer, account, nonces=None, max_fee=0):
+        self.signer = signer
+        self.account = account
+        self.nonces = NonceManager() if nonces is None else nonces
+        self.max_fee = max_fee
+
+    async def send(self, calls):
+        results = await self.send_many([calls])
+        return results[0]
+
+    async def send_many(self, multicalls):
+        """Sends each list of calls as one transaction, in order, and returns their results
+
+        Every transaction is signed, in one batch, before the first one is sent. If one fails
+        the account nonce is fetched again on next use, and the transactions
+        after it are not sent.
+        """
+        first_nonce = await self.nonces.reserve(self.account, len(multicalls))
+        transactions = [
+            (nonce, *self.signer.hash_transaction(
+                self.account.contract_address, calls, nonce, self.max_fee))
+            for nonce, calls in enumerate(multicalls, start=first_nonce)
+        ]
+        signatures = self.signer.sign_many(
+            [message_hash for _, _, _, message_hash in transactions])
+
+        results = []
+        try:
+            for (nonce, call_array, calldata, _), signature in zip(transactions, signatures):
+                results.append(await self.account.__execute__(call_array, calldata, nonce).invoke(
+                    signature=list(signature)))
+        except Exception:
+            self.nonces.resync(self.account)
+            raise
+        return results
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from tests.utils import fork, get_contract_defs
+
+
+# Every contract deployed by the test modules, compiled up front in parallel
+CONTRACTS = [
+    "contracts/dutch.cairo",
+    "contracts/discreteGDA.cairo",
+    "contracts/continuousGDA.cairo",
+    "openzeppelin/account/Account.cairo",
+    "openzeppelin/token/erc20/ERC20_Mintable.cairo",
+    "openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo",
+    "tests/mocks/Math64x61_mock.cairo",
+]
+
+
+def pytest_configure(config):
+    # xdist workers read what the controller already wrote to the cache
+    if not hasattr(config, "workerinput"):
+        get_contract_defs(CONTRACTS)
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def contract_factory(base_world):
+    """Fresh fork of the requesting module's base_world for every test
+
+    base_world is a session fixture defined by each test module, returning
+    the Starknet it provisioned and its (definition, deployed) contracts.
+    """
+    starknet, contracts = base_world
+    return fork(starknet, contracts)
@@ -0,0 +1,293 @@
+"""Storage-diff and fee estimates of the auction transactions.
+
+A StarkNet transaction pays for the state diff it posts to L1 and for the
+Cairo resources it uses on L2. estimate() runs a transaction on a fork of the
+state, lists the storage keys it changed and the contracts they belong to,
+and prices both components in L1 gas with the fee formulas StarkNet
+published for v0.8 (cairo-lang 0.7.1 does not charge fees yet):
+
+  - data availability: each modified contract posts 2 words (its address
+    and its number of updates), and each changed key 2 more (the key and
+    the value). A word is 32 calldata bytes at 16 gas each.
+  - execution: the most expensive of the Cairo resources, each weighted
+    by L2_GAS_WEIGHTS.
+
+The report runs the state-changing benchmarks of tests/bench.py against the
+contracts of each revision, "." being the working tree, and puts their
+costs side by side:
+
+    python -m tests.costs HEAD~3 .
+    python -m tests.costs . --keys --pattern 'dutch.*'
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import functools
+import hashlib
+import io
+import math
+import os
+import subprocess
+import sys
+import tarfile
+
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.public.abi import get_storage_var_address
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests import bench
+from tests.utils import (
+    CONTRACT_CACHE_DIR,
+    _load_cached,
+    _store_cached,
+    get_contract_def,
+)
+
+
+GAS_PER_DA_WORD = 16 * 32
+# L1 gas per unit of each Cairo resource
+L2_GAS_WEIGHTS = {
+    "n_steps": 0.05,
+    "pedersen_builtin": 0.4,
+    "range_check_builtin": 0.4,
+    "ecdsa_builtin": 25.6,
+    "bitwise_builtin": 12.8,
+    "output_builtin": 0,
+}
+
+WORKTREE = "."
+# transactions reported by default, the entry points that change state
+DEFAULT_PATTERNS = (
+    "dutch.initialize", "dutch.buy[*", "dutch.commitBid[*", "dutch.settle[*", "*.purchaseTokens[*")
+# directories the contracts of a revision are compiled from
+REVISION_PATHS = ("contracts", "openzeppelin")
+
+
+def storage_var_names(contract_def):
+    """Returns {storage key: storage var} for the storage vars that take no arguments
+
+    The keys of storage vars with arguments are hashes of them, so they
+    cannot be named without knowing the arguments.
+    """
+    paths = {str(name) for name in contract_def.program.identifiers.as_dict()}
+    names = {}
+    for path in paths:
+        scope, _, member = path.rpartition(".")
+        if member == "addr" and scope + ".read" in paths and scope + ".write" in paths:
+            name = scope.rpartition(".")[2]
+            names[get_storage_var_address(name)] = name
+    return names
+
+
+def _contract_def(starknet_state, address):
+    state = starknet_state.state
+    return state.contract_definitions[state.contract_states[address].state.contract_hash]
+
+
+def l2_gas(resources):
+    """Returns the L1 gas charged for the Cairo resources, see L2_GAS_WEIGHTS"""
+    return math.ceil(max(
+        L2_GAS_WEIGHTS.get(name, 0) * usage for name, usage in resources.items()))
+
+
+async def estimate(starknet_state, contract_address, selector, calldata, caller_address=0):
+    """Invokes the entry point on a copy of the state and returns its storage diff and costs
+
+    Takes the same arguments as bench.measure.
+    """
+    starknet_state = starknet_state.copy()
+    storage_before = bench.storage_values(starknet_state)
+    execution_info = await starknet_state.invoke_raw(
+        contract_address=contract_address,
+        selector=selector,
+        calldata=calldata,
+        caller_address=caller_address,
+    )
+    storage_after = bench.storage_values(starknet_state)
+
+    diff = sorted(
+        (address, key) for (address, key), value in storage_after.items()
+        if storage_before.get((address, key)) != value
+    )
+    contracts = sorted({address for address, _ in diff})
+    names = {
+        address: storage_var_names(_contract_def(starknet_state, address))
+        for address in contracts
+    }
+
+    resources = {"n_steps": 0}
+    for call in execution_info.contract_calls:
+        resources["n_steps"] += call.cairo_usage.n_steps
+        for name, count in call.cairo_usage.builtin_instance_counter.items():
+            resources[name] = resources.get(name, 0) + count
+
+    da_words = 2 * len(contracts) + 2 * len(diff)
+    l1_gas = da_words * GAS_PER_DA_WORD
+    execution_gas = l2_gas(resources)
+    return {
+        "storage_keys": [
+            [hex(address), hex(key), names[address].get(key)] for address, key in diff],
+        "modified_contracts": len(contracts),
+        "storage_diff": len(diff),
+        "da_words": da_words,
+        "l1_gas": l1_gas,
+        "l2_gas": execution_gas,
+        "total_gas": l1_gas + execution_gas,
+        "resources": resources,
+    }
+
+
+def _git(*args):
+    return subprocess.run(
+        ["git", *args], check=True, stdout=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+
+
+def revision_loader(revision):
+    """Returns a get_contract_def that compiles the contracts as of the git revision"""
+    if revision == WORKTREE:
+        return get_contract_def
+
+    commit = _git("rev-parse", "--verify", revision + "^{commit}").decode().strip()
+    root = os.path.join(CONTRACT_CACHE_DIR, "revisions", commit)
+    if not os.path.isdir(root):
+        archive = _git("archive", "--format=tar", commit, *REVISION_PATHS)
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(root + ".tmp")
+        os.replace(root + ".tmp", root)
+
+    @functools.lru_cache(maxsize=None)
+    def load(path):
+        source = os.path.join(root, path)
+        if not os.path.exists(source):
+            # mocks and other harness contracts are not versioned with the auctions
+            return get_contract_def(path)
+        path_hash = hashlib.sha256(path.encode()).hexdigest()
+        cache_path = os.path.join(CONTRACT_CACHE_DIR, "%s-%s.pickle" % (commit, path_hash))
+        contract_def = _load_cached(cache_path)
+        if contract_def is None:
+            contract_def = compile_starknet_files(
+                files=[source], debug_info=True, cairo_path=[root])
+            _store_cached(cache_path, contract_def)
+        return contract_def
+    return load
+
+
+def _describe(error):
+    message = str(getattr(error, "message", None) or error).strip().splitlines()
+    return "%s: %s" % (type(error).__name__, message[0]) if message else type(error).__name__
+
+
+def _matches(name, patterns):
+    # brackets are part of the benchmark names, not character classes
+    return any(fnmatch.fnmatchcase(name, pattern.replace("[", "[[]")) for pattern in patterns)
+
+
+async def revision_costs(revision, patterns=DEFAULT_PATTERNS, benchmarks=bench.BENCHMARKS):
+    """Returns ({benchmark name: estimate}, {benchmark or suite: error}) for the revision
+
+    Entry points the revision does not have yet fail on their own. A suite
+    that fails as a whole, typically because its setup calls an entry point
+    whose signature changed since the revision, is reported instead of
+    aborting the others.
+    """
+    async def estimate_or_error(*args, **kwargs):
+        try:
+            return await estimate(*args, **kwargs)
+        except StarkException as error:
+            return error
+
+    measure, load = bench.measure, bench.get_contract_def
+    bench.measure, bench.get_contract_def = estimate_or_error, revision_loader(revision)
+    results, failures = {}, {}
+    try:
+        for suite in benchmarks:
+            try:
+                suite_results = await bench.run_benchmarks([suite])
+            except Exception as error:
+                failures[suite.__name__] = _describe(error)
+                continue
+            for name, costs in suite_results.items():
+                if not _matches(name, patterns):
+                    continue
+                if isinstance(costs, StarkException):
+                    failures[name] = _describe(costs)
+                else:
+                    results[name] = costs
+    finally:
+        bench.measure, bench.get_contract_def = measure, load
+    return results, failures
+
+
+def _cell(costs):
+    if costs is None:
+        return "-"
+    return "%d keys, %d contracts: %d + %d = %d" % (
+        costs["storage_diff"], costs["modified_contracts"], costs["l1_gas"], costs["l2_gas"],
+        costs["total_gas"])
+
+
+def format_report(reports, keys=False):
+    """Renders {revision: (results, failures)} as a markdown table, one column per revision
+
+    Cells read "changed keys, modified contracts: L1 gas + L2 gas = total".
+    """
+    revisions = list(reports)
+    names = sorted({name for results, _ in reports.values() for name in results})
+    lines = [
+        "| transaction | %s |" % " | ".join(revisions),
+        "|---|" + "---|" * len(revisions),
+    ]
+    for name in names:
+        lines.append("| %s | %s |" % (name, " | ".join(
+            _cell(reports[revision][0].get(name)) for revision in revisions)))
+
+    failed = [
+        "%s: %s failed (%s)" % (revision, name, error)
+        for revision, (_, failures) in reports.items()
+        for name, error in sorted(failures.items())
+    ]
+    if failed:
+        lines.append("")
+        lines.extend(failed)
+
+    if keys:
+        for name in names:
+            for revision in revisions:
+                costs = reports[revision][0].get(name)
+                if costs is None:
+                    continue
+                lines.append("")
+                lines.append("%s @ %s" % (name, revision))
+                lines.extend(
+                    "    %s %s %s" % (address, key, label or "")
+                    for address, key, label in costs["storage_keys"])
+    return "\n".join(lines)
+
+
+async def run_report(revisions, patterns=DEFAULT_PATTERNS):
+    return {revision: await revision_costs(revision, patterns) for revision in revisions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "revisions", nargs="*", default=[WORKTREE],
+        help="git revisions to compare, . is the working tree (default: .)")
+    parser.add_argument(
+        "--pattern", action="append",
+        help="benchmark names to report, * and ? match any characters (default: %s)" % (
+            " ".join(DEFAULT_PATTERNS)))
+    parser.add_argument("--keys", action="store_true", help="list the changed storage keys")
+    args = parser.parse_args(argv)
+
+    reports = asyncio.get_event_loop().run_until_complete(
+        run_report(args.revisions, args.pattern or DEFAULT_PATTERNS))
+    print(format_report(reports, keys=args.keys))
+    return 1 if any(failures for _, failures in reports.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Concurrent view calls across many auction contracts.
+
+Runs a list of view calls against any number of deployed contracts at once,
+at most `concurrency` of them in flight, and streams the results back as
+they complete, so a sweep over every auction takes about as long as its
+slowest call rather than the sum of all of them.
+
+    client = FanoutClient(starknet.state, {address: dutch_def.abi for address in auctions})
+    calls = [ViewCall(address, "getPrice", [1]) for address in auctions]
+    async for result in client.sweep(calls):
+        print(result.call.address, result.value)
+
+Every call of a sweep runs against the same snapshot of the state. Contracts
+sharing an ABI share its parsing: selectors, calldata encoders and result
+decoders are built once per contract class.
+
+Arguments follow the ABI inputs, except that arrays carry their own length
+and Uint256 values are plain ints. Results are {output: value} dicts decoded
+like the indexer decodes events. A call that reverts yields a result whose
+error is the StarkException.
+"""
+
+import asyncio
+import json
+from collections import namedtuple
+
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests.indexer import members_decoder, struct_sizes
+from tests.utils import get_selector, to_uint
+
+
+DEFAULT_CONCURRENCY = 64
+
+ViewCall = namedtuple("ViewCall", ["address", "function", "args"])
+# value is None when the call reverted, and error is None when it did not
+ViewResult = namedtuple("ViewResult", ["call", "value", "error"])
+
+
+def members_encoder(members):
+    """Returns a function turning argument values into calldata laid out as the ABI members
+
+    <name>_len members are implied by the array that follows them.
+    """
+    names = {member["name"] for member in members}
+    arguments = [
+        member for member in members
+        if not (member["name"].endswith("_len") and member["name"][:-4] in names)
+    ]
+
+    def encode_value(member_type, value):
+        if member_type == "felt":
+            return [value]
+        if member_type == "Uint256":
+            return list(to_uint(value))
+        # any other struct is passed as its felts
+        return list(value)
+
+    def encode(args):
+        if len(args) != len(arguments):
+            raise TypeError("expected %d arguments, got %d" % (len(arguments), len(args)))
+        calldata = []
+        for member, value in zip(arguments, args):
+            member_type = member["type"]
+            if member_type.endswith("*"):
+                calldata.append(len(value))
+                for item in value:
+                    calldata.extend(encode_value(member_type[:-1], item))
+            else:
+                calldata.extend(encode_value(member_type, value))
+        return calldata
+    return encode
+
+
+class _ContractClass:
+    """Selectors, encoders and decoders of the functions of one ABI, built on first use"""
+
+    def __init__(self, abi):
+        self._sizes = struct_sizes(abi)
+        self._abis = {entry["name"]: entry for entry in abi if entry["type"] == "function"}
+        self._functions = {}
+
+    def function(self, name):
+        """Returns (selector, encode, decode) of the function"""
+        if name not in self._functions:
+            entry = self._abis[name]
+            self._functions[name] = (
+                get_selector(name),
+                members_encoder(entry["inputs"]),
+                members_decoder(entry["outputs"], self._sizes),
+            )
+        return self._functions[name]
+
+
+class FanoutClient:
+    """Runs view calls against many contracts concurrently
+
+    abis maps each contract address to its ABI.
+    """
+
+    def __init__(self, state, abis, concurrency=DEFAULT_CONCURRENCY):
+        self.state = state
+        self.concurrency = concurrency
+        self._classes = {}
+        self._contracts = {address: self._contract_class(abi) for address, abi in abis.items()}
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _contract_class(self, abi):
+        key = json.dumps(abi, sort_keys=True)
+        if key not in self._classes:
+            self._classes[key] = _ContractClass(abi)
+        return self._classes[key]
+
+    async def sweep(self, calls):
+        """Yields a ViewResult per call, in completion order"""
+        snapshot = self.state.copy()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._call(snapshot, semaphore, call)) for call in calls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, snapshot, semaphore, call):
+        selector, encode, decode = self._contracts[call.address].function(call.function)
+        calldata = encode(call.args)
+        async with semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                execution_info = await snapshot.invoke_raw(
+                    contract_address=call.address,
+                    selector=selector,
+                    calldata=calldata,
+                    caller_address=0,
+                )
+            except StarkException as error:
+                return ViewResult(call, None, error)
+            finally:
+                self.in_flight -= 1
+        return ViewResult(call, decode(execution_info.retdata), None)
@@ -0,0 +1,198 @@
+"""Incremental SQLite indexer for the auction events.
+
+Streams the raw events of executed transactions into a local SQLite
+database, decoding each one with the ABI of the contract that emitted it, so
+analytics read purchases from the database instead of polling the views.
+
+    indexer = EventIndexer("events.sqlite", {auction.contract_address: auction_def.abi})
+    indexer.index(transactions)
+    purchases = indexer.events("Purchase")
+
+transactions yields (block_number, transaction_index, execution_info) in
+chain order. The position of the last indexed transaction is committed with
+its events, so indexing the same stream again after a restart skips what is
+already stored.
+"""
+
+import json
+import sqlite3
+from collections import namedtuple
+
+from starkware.starknet.public.abi import get_selector_from_name
+
+from tests.utils import from_uint
+
+
+DEFAULT_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    transaction_index INTEGER NOT NULL,
+    event_index INTEGER NOT NULL,
+    contract_address TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (block_number, transaction_index, event_index)
+);
+CREATE INDEX IF NOT EXISTS events_by_name ON events (name, contract_address);
+CREATE TABLE IF NOT EXISTS cursor (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block_number INTEGER NOT NULL,
+    transaction_index INTEGER NOT NULL
+);
+"""
+
+IndexedEvent = namedtuple(
+    "IndexedEvent",
+    ["block_number", "transaction_index", "event_index", "contract_address", "name", "data"],
+)
+
+
+def struct_sizes(abi):
+    """Returns {type: size in felts} for felt and every struct in the ABI"""
+    sizes = {"felt": 1}
+    sizes.update({entry["name"]: entry["size"] for entry in abi if entry["type"] == "struct"})
+    return sizes
+
+
+def members_decoder(members, sizes):
+    """Returns a function turning felts laid out as the ABI members into {member: value}
+
+    Uint256 members are joined into one int, other structs are kept as a list
+    of felts.
+    """
+    def decode(data):
+        values = {}
+        offset = 0
+        for member in members:
+            name, member_type = member["name"], member["type"]
+            if member_type.endswith("*"):
+                # arrays follow their <name>_len member
+                size = values[name + "_len"] * sizes[member_type[:-1]]
+            else:
+                size = sizes[member_type]
+            chunk = list(data[offset:offset + size])
+            if member_type == "felt":
+                values[name] = chunk[0]
+            elif member_type == "Uint256":
+                values[name] = from_uint(chunk)
+            else:
+                values[name] = chunk
+            offset += size
+        return values
+    return decode
+
+
+def event_decoders(abi):
+    """Returns {event selector: (name, decoder)} for every event in the ABI
+
+    A decoder turns the event data into {member: value}, see members_decoder.
+    """
+    sizes = struct_sizes(abi)
+    return {
+        get_selector_from_name(entry["name"]): (
+            entry["name"], members_decoder(entry["data"], sizes))
+        for entry in abi if entry["type"] == "event"
+    }
+
+
+def raw_events(execution_info):
+    """Returns the events of a transaction in emission order
+
+    Accepts both what StarknetContract.invoke returns and the internal
+    TransactionExecutionInfo of StarknetState.invoke_raw.
+    """
+    if hasattr(execution_info, "raw_events"):
+        return execution_info.raw_events
+    return execution_info.get_sorted_events()
+
+
+class EventIndexer:
+    """Indexes the events of the given contracts into a SQLite database
+
+    abis maps each indexed contract address to its ABI. Events of any other
+    contract, or not described by the ABI, are ignored.
+    """
+
+    def __init__(self, path, abis, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._decoders = {address: event_decoders(abi) for address, abi in abis.items()}
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    @property
+    def cursor(self):
+        """(block_number, transaction_index) of the last indexed transaction, or None"""
+        row = self._connection.execute(
+            "SELECT block_number, transaction_index FROM cursor WHERE id = 0").fetchone()
+        return tuple(row) if row else None
+
+    def index(self, transactions):
+        """Stores the events of every transaction after the cursor, returns how many were stored"""
+        cursor = self.cursor
+        position = None
+        rows = []
+        n_stored = 0
+        for block_number, transaction_index, execution_info in transactions:
+            if cursor is not None and (block_number, transaction_index) <= cursor:
+                continue
+            position = (block_number, transaction_index)
+            rows.extend(self._rows(block_number, transaction_index, execution_info))
+            # only flush whole transactions, the cursor must never split one
+            if len(rows) >= self.batch_size:
+                self._flush(rows, position)
+                n_stored += len(rows)
+                rows = []
+        if position is not None:
+            self._flush(rows, position)
+            n_stored += len(rows)
+        return n_stored
+
+    def events(self, name=None, contract_address=None):
+        """Returns the stored events in chain order, optionally filtered"""
+        query = "SELECT * FROM events"
+        filters = []
+        params = []
+        if name is not None:
+            filters.append("name = ?")
+            params.append(name)
+        if contract_address is not None:
+            filters.append("contract_address = ?")
+            params.append(hex(contract_address))
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        query += " ORDER BY block_number, transaction_index, event_index"
+        return [
+            IndexedEvent(
+                block_number, transaction_index, event_index, int(address, 16), name,
+                json.loads(data))
+            for block_number, transaction_index, event_index, address, name, data
+            in self._connection.execute(query, params)
+        ]
+
+    def _rows(self, block_number, transaction_index, execution_info):
+        for event_index, event in enumerate(raw_events(execution_info)):
+            decoders = self._decoders.get(event.from_address)
+            if decoders is None or not event.keys or event.keys[0] not in decoders:
+                continue
+            name, decode = decoders[event.keys[0]]
+            yield (
+                block_number, transaction_index, event_index, hex(event.from_address), name,
+                json.dumps(decode(event.data)),
+            )
+
+    def _flush(self, rows, position):
+        with self._connection:
+            self._connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cursor VALUES (0, ?, ?)", position)
@@ -0,0 +1,319 @@
+"""Synthetic load generator for the auctions.
+
+Provisions one auction and N buyer accounts on a local Starknet state, then
+plays an arrival process against it. The block timestamp and block number
+are warped to each arrival time. Buyers arriving in the same second submit
+concurrently, and a sequencer lock applies their transactions one at a time,
+so latency includes the time spent queueing behind the burst. Every buyer
+signs through its own TransactionBuilder. The provisioned world is
+checkpointed (tests/checkpoint.py), so later runs with the same market and
+number of accounts start from it.
+
+    python -m tests.load discrete --accounts 8 --rate 2 --duration 600
+    python -m tests.load continuous --replay arrivals.csv --output report.json --csv prices.csv
+    python -m tests.load dutch --auctions 20 --rate 0.1 --duration 300
+
+Replayed arrivals are read from a CSV file with an offset column (seconds
+since the start) and an optional quantity column.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests.bench import CONTINUOUS_PARAMS, DISCRETE_PARAMS, START_TIME, set_block
+from tests.checkpoint import checkpointed
+from tests.indexer import event_decoders, raw_events
+from tests.utils import (
+    MAX_UINT256, TRUE, Signer, TransactionBuilder, empty_starknet, from_uint, get_contract_def,
+    str_to_felt, to_uint,
+)
+
+
+START_BLOCK = 1
+OWNER = 0x1001
+
+signer = Signer(123456789987654321)
+
+CSV_COLUMNS = ("offset", "account", "quantity", "status", "price", "latency_ms")
+
+_ERROR_MESSAGE = re.compile(r"Error message: (.+)")
+
+
+def poisson_arrivals(rate, duration, quantity=1, seed=None):
+    """Returns (offset, quantity) arrivals of a Poisson process with rate arrivals per second"""
+    rng = random.Random(seed)
+    arrivals = []
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        arrivals.append((int(offset), quantity))
+        offset += rng.expovariate(rate)
+    return arrivals
+
+
+def read_arrivals(path, quantity=1):
+    """Returns the (offset, quantity) arrivals of a CSV file, sorted by offset"""
+    with open(path, newline="") as f:
+        return sorted(
+            (int(float(row["offset"])), int(row.get("quantity") or quantity))
+            for row in csv.DictReader(f)
+        )
+
+
+def revert_reason(err):
+    """Returns the innermost Cairo error message of a failed transaction"""
+    messages = _ERROR_MESSAGE.findall(err.message or "")
+    return messages[-1].strip() if messages else err.code.name
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+class GDAMarket:
+    def __init__(self, path, constructor_calldata):
+        self.path = path
+        self.constructor_calldata = constructor_calldata
+
+    def __repr__(self):
+        return "GDAMarket(%r, %r)" % (self.path, self.constructor_calldata)
+
+    async def provision(self, starknet, accounts):
+        """Deploys the market, returns the manifest attach takes"""
+        contract = await starknet.deploy(
+            contract_def=get_contract_def(self.path),
+            constructor_calldata=[
+                str_to_felt("LOAD"), str_to_felt("LOAD"), OWNER, *self.constructor_calldata],
+        )
+        return {"contract": contract}
+
+    def attach(self, manifest):
+        self.contract = manifest["contract"]
+        self.decoders = event_decoders(get_contract_def(self.path).abi)
+
+    async def calls(self, account, quantity):
+        return [(self.contract.contract_address, "purchaseTokens", [
+            quantity, account.contract_address, *MAX_UINT256])]
+
+    def purchased(self, calls):
+        pass
+
+
+class DutchMarket:
+    def __init__(self, n_auctions, duration, rng):
+        self.n_auctions = n_auctions
+        self.duration = duration
+        self.rng = rng
+
+    def __repr__(self):
+        # the rng only picks auctions during the run
+        return "DutchMarket(n_auctions=%d, duration=%d)" % (self.n_auctions, self.duration)
+
+    async def provision(self, starknet, accounts):
+        """Deploys the market and starts its auctions, returns the manifest attach takes"""
+        contract = await starknet.deploy(contract_def=get_contract_def("contracts/dutch.cairo"))
+        erc721 = await starknet.deploy(
+            contract_def=get_contract_def(
+                "openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo"),
+            constructor_calldata=[str_to_felt("LOAD"), str_to_felt("LOAD"), OWNER],
+        )
+        starting_price = to_uint(1000 * self.duration)
+        erc20 = await starknet.deploy(
+            contract_def=get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo"),
+            constructor_calldata=[
+                str_to_felt("LOAD"), str_to_felt("LOAD"), 18, *to_uint(0), OWNER, OWNER],
+        )
+
+        state = starknet.state
+        seller = OWNER
+        await state.invoke_raw(
+            erc721.contract_address, "setApprovalForAll", [contract.contract_address, TRUE],
+            seller)
+        for account in accounts:
+            # every buyer can afford every auction
+            budget = to_uint(from_uint(starting_price) * self.n_auctions)
+            await state.invoke_raw(
+                erc20.contract_address, "mint", [account.contract_address, *budget], OWNER)
+            await state.invoke_raw(
+                erc20.contract_address, "approve", [contract.contract_address, *budget],
+                account.contract_address)
+
+        live = []
+        for token_id in range(self.n_auctions):
+            await state.invoke_raw(erc721.contract_address, "mint", [seller, *to_uint(token_id)],
+                                   OWNER)
+            execution_info = await state.invoke_raw(contract.contract_address, "initialize", [
+                erc721.contract_address, *to_uint(token_id), erc20.contract_address,
+                *starting_price, *to_uint(1000), self.duration,
+            ], seller)
+            live.extend(execution_info.retdata)
+        return {"contract": contract, "live": live}
+
+    def attach(self, manifest):
+        self.contract = manifest["contract"]
+        self.decoders = event_decoders(get_contract_def("contracts/dutch.cairo").abi)
+        self.live = list(manifest["live"])
+
+    async def calls(self, account, quantity):
+        # buyers race for a random live auction and pay its current price
+        auction_id = self.rng.choice(self.live) if self.live else 0
+        observed = await self.contract.getPrice(auction_id).call()
+        return [(self.contract.contract_address, "buy", [auction_id, *observed.result.res])]
+
+    def purchased(self, calls):
+        (_, _, (auction_id, *_)), = calls
+        self.live.remove(auction_id)
+
+
+@checkpointed
+async def provision_world(market, n_accounts):
+    """Returns a Starknet with n_accounts buyer accounts, the accounts and the market manifest"""
+    starknet = await empty_starknet()
+    set_block(starknet.state, block_number=START_BLOCK, timestamp=START_TIME)
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    accounts = [
+        await starknet.deploy(contract_def=account_def, constructor_calldata=[signer.public_key])
+        for _ in range(n_accounts)
+    ]
+    return starknet, accounts, await market.provision(starknet, accounts)
+
+
+async def run_load(market, arrivals, n_accounts):
+    """Plays the arrivals against the market, returns one record per transaction"""
+    starknet, accounts, manifest = await provision_world(market, n_accounts)
+    market.attach(manifest)
+    builders = [TransactionBuilder(signer, account) for account in accounts]
+    sequencer = asyncio.Lock()
+    # in the order the sequencer applied them
+    records = []
+
+    async def submit(offset, index, quantity):
+        started = time.perf_counter()
+        record = {"offset": offset, "account": index, "quantity": quantity, "price": None}
+        async with sequencer:
+            calls = await market.calls(accounts[index], quantity)
+            try:
+                execution_info = await builders[index].send(calls)
+            except StarkException as err:
+                record["status"] = revert_reason(err)
+            else:
+                record["status"] = "ok"
+                record["price"] = _purchase_price(market, execution_info)
+                market.purchased(calls)
+            records.append(record)
+        record["latency_ms"] = 1000 * (time.perf_counter() - started)
+
+    async def submit_all(offset, burst):
+        for index, quantity in burst:
+            await submit(offset, index, quantity)
+
+    by_offset = defaultdict(list)
+    for arrival, (offset, quantity) in enumerate(arrivals):
+        by_offset[offset].append((arrival % n_accounts, quantity))
+
+    for offset in sorted(by_offset):
+        set_block(starknet.state, block_number=START_BLOCK + offset, timestamp=START_TIME + offset)
+        # an account sends its own transactions in order, accounts race each other
+        per_account = defaultdict(list)
+        for index, quantity in by_offset[offset]:
+            per_account[index].append((index, quantity))
+        await asyncio.gather(*[submit_all(offset, burst) for burst in per_account.values()])
+    return records
+
+
+def _purchase_price(market, execution_info):
+    for event in raw_events(execution_info):
+        if event.from_address != market.contract.contract_address or not event.keys:
+            continue
+        name, decode = market.decoders.get(event.keys[0], (None, None))
+        if name == "Purchase":
+            return decode(event.data)["price"]
+    return None
+
+
+def summarize(records, wall_seconds, duration):
+    """Returns throughput, revert rate and latency percentiles of a run"""
+    succeeded = [record for record in records if record["status"] == "ok"]
+    latencies = sorted(record["latency_ms"] for record in records)
+    return {
+        "submitted": len(records),
+        "succeeded": len(succeeded),
+        "reverts": dict(Counter(
+            record["status"] for record in records if record["status"] != "ok")),
+        "revert_rate": 1 - len(succeeded) / len(records) if records else 0,
+        "wall_seconds": wall_seconds,
+        "transactions_per_second": len(records) / wall_seconds if wall_seconds else None,
+        "purchases_per_simulated_second": len(succeeded) / duration if duration else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+
+def dump_csv(records, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("auction", choices=("discrete", "continuous", "dutch"))
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="Poisson arrivals per second")
+    parser.add_argument("--duration", type=int, default=60, help="simulated seconds")
+    parser.add_argument("--quantity", type=int, default=1, help="tokens per purchase")
+    parser.add_argument("--replay", help="CSV of arrivals to replay instead of a Poisson process")
+    parser.add_argument("--auctions", type=int, default=10, help="dutch auctions to run")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write the summary and every transaction as JSON")
+    parser.add_argument("--csv", help="write every transaction, with its price, as CSV")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        arrivals = read_arrivals(args.replay, args.quantity)
+        duration = arrivals[-1][0] + 1 if arrivals else 0
+    else:
+        arrivals = poisson_arrivals(args.rate, args.duration, args.quantity, args.seed)
+        duration = args.duration
+
+    if args.auction == "discrete":
+        market = GDAMarket("contracts/discreteGDA.cairo", DISCRETE_PARAMS)
+    elif args.auction == "continuous":
+        market = GDAMarket("contracts/continuousGDA.cairo", CONTINUOUS_PARAMS)
+    else:
+        market = DutchMarket(args.auctions, duration, random.Random(args.seed))
+
+    started = time.perf_counter()
+    records = asyncio.get_event_loop().run_until_complete(
+        run_load(market, arrivals, args.accounts))
+    summary = summarize(records, time.perf_counter() - started, duration)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "transactions": records}, f, indent=2)
+            f.write("\n")
+    if args.csv:
+        dump_csv(records, args.csv)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
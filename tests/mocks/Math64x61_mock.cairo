@@ -0,0 +1,131 @@
+%lang starknet
+
+from starkware.cairo.common.cairo_builtins import HashBuiltin
+
+from contracts.Math64x61 import (
+    Math64x61_mul,
+    Math64x61_div,
+    Math64x61_pow,
+    Math64x61_exp2,
+    Math64x61_exp2_fast,
+    Math64x61_exp,
+    Math64x61_exp_fast,
+    Math64x61_log2,
+    Math64x61_log2_fast,
+    Math64x61_ln,
+    Math64x61_ln_fast
+)
+
+#
+# Exposes the Math64x61 library as views for differential tests
+#
+
+@view
+func mul{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt, y: felt) -> (res: felt):
+    let (res) = Math64x61_mul(x, y)
+    return (res)
+end
+
+@view
+func div{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt, y: felt) -> (res: felt):
+    let (res) = Math64x61_div(x, y)
+    return (res)
+end
+
+@view
+func pow{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt, y: felt) -> (res: felt):
+    let (res) = Math64x61_pow(x, y)
+    return (res)
+end
+
+@view
+func exp2{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_exp2(x)
+    return (res)
+end
+
+@view
+func exp2_fast{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_exp2_fast(x)
+    return (res)
+end
+
+@view
+func exp{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_exp(x)
+    return (res)
+end
+
+@view
+func exp_fast{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_exp_fast(x)
+    return (res)
+end
+
+@view
+func log2{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_log2(x)
+    return (res)
+end
+
+@view
+func log2_fast{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_log2_fast(x)
+    return (res)
+end
+
+@view
+func ln{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_ln(x)
+    return (res)
+end
+
+@view
+func ln_fast{
+        syscall_ptr : felt*,
+        pedersen_ptr : HashBuiltin*,
+        range_check_ptr
+    }(x: felt) -> (res: felt):
+    let (res) = Math64x61_ln_fast(x)
+    return (res)
+end
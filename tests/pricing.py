@@ -0,0 +1,421 @@
+"""Vectorized, bit-exact mirror of contracts/Math64x61.cairo and the GDA quotes.
+
+Every function takes scalars or array-likes, broadcasts them against each
+other (scalars become 1-d arrays) and returns a pair (res, ok): `res` is an object array of Python ints
+holding exactly the felt the contract computes, and `ok` is a boolean array
+that is False wherever the contract would revert (overflow asserts, division
+by zero, out-of-range hints). Python ints are used because 64.61 products
+need up to 250 bits.
+
+The quote functions return numpy masked arrays of the `low` limb returned by
+the `purchase_price` views, masked where the view would revert.
+"""
+
+import numpy as np
+from starkware.cairo.lang.cairo_constants import DEFAULT_PRIME
+
+
+PRIME = DEFAULT_PRIME
+RC_BOUND = 2 ** 128
+
+INT_PART = 2 ** 64
+FRACT_PART = 2 ** 61
+BOUND = 2 ** 125
+ONE = 1 * FRACT_PART
+
+# precision tiers of the GDA constructors, GDA_PRECISE and GDA_FAST
+PRECISE = 0
+FAST = 1
+
+# signed_div_rem and unsigned_div_rem only accept divisors up to this value
+_MAX_DIV = PRIME // RC_BOUND
+
+
+def _array(x):
+    # at least 1-d: numpy hands 0-d object arrays back as bare Python ints
+    return np.atleast_1d(np.asarray(x, dtype=object))
+
+
+def _felt(x):
+    """Reduces x into the field, using the signed representative like as_int()"""
+    x = _array(x) % PRIME
+    return np.where(x > PRIME // 2, x - PRIME, x)
+
+
+def _unsigned(x):
+    return _array(x) % PRIME
+
+
+def _where(cond, x, y):
+    return _array(np.where(cond, x, y))
+
+
+def _signed_div_rem(value, div, bound):
+    """Mirrors starkware.cairo.common.math.signed_div_rem"""
+    div = _array(div)
+    ok = (div > 0) & (div <= _MAX_DIV)
+    safe_div = _where(ok, div, 1)
+    q = _felt(value) // safe_div
+    ok = ok & ((-bound <= q) & (q < bound))
+    return q, ok
+
+
+def _unsigned_div_rem(value, div):
+    """Mirrors starkware.cairo.common.math.unsigned_div_rem for a constant div"""
+    q = _unsigned(value) // div
+    return q, q < RC_BOUND
+
+
+def _abs_sign(x):
+    """Mirrors abs_value() and sign(), which range check |x| < 2 ** 128"""
+    x = _felt(x)
+    return np.abs(x), np.sign(x), np.abs(x) < RC_BOUND
+
+
+def is_le(a, b):
+    """Mirrors starkware.cairo.common.math_cmp.is_le"""
+    return _unsigned(_array(b) - _array(a)) < RC_BOUND
+
+
+def assert64x61(x):
+    x = _felt(x)
+    return (-BOUND <= x) & (x <= BOUND)
+
+
+def from_felt(x):
+    x = _felt(x)
+    ok = (-INT_PART <= x) & (x <= INT_PART)
+    return _felt(x * FRACT_PART), ok
+
+
+def to_uint256(x):
+    """Returns the low limb of the Uint256, the high limb is always zero"""
+    return _unsigned(x), np.ones(np.shape(x), dtype=bool)
+
+
+def sub(x, y):
+    res = _felt(_array(x) - _array(y))
+    return res, assert64x61(res)
+
+
+def mul(x, y):
+    res, ok = _signed_div_rem(_array(x) * _array(y), FRACT_PART, BOUND)
+    return res, ok & assert64x61(res)
+
+
+def div(x, y):
+    divisor, div_sign, ok = _abs_sign(y)
+    res_u, div_ok = _signed_div_rem(_array(x) * FRACT_PART, divisor, BOUND)
+    ok = ok & (div_ok & assert64x61(res_u))
+    return _felt(res_u * div_sign), ok
+
+
+def pow_int(x, y):
+    """Mirrors Math64x61__pow_int: square-and-multiply from the top bit down"""
+    x, y = np.broadcast_arrays(_felt(x), _felt(y))
+    exp_val, exp_sign, ok = _abs_sign(y)
+
+    # mul(ONE, ONE) == ONE, so leading zero bits do not perturb the result
+    res = _where(True, ONE, x)
+    top_bit = max(int(e) for e in exp_val.flat).bit_length() if exp_val.size else 0
+    for bit in reversed(range(top_bit)):
+        res, step_ok = mul(res, res)
+        ok = ok & step_ok
+        odd = (exp_val >> bit) & 1 == 1
+        res_x, step_ok = mul(res, x)
+        res = _where(odd, res_x, res)
+        ok = ok & (~odd | step_ok)
+
+    inverse, inverse_ok = div(ONE, _where(exp_sign == -1, res, ONE))
+    res = _where(exp_sign == -1, inverse, res)
+    ok = ok & ((exp_sign != -1) | inverse_ok)
+    return _where(exp_sign == 0, ONE, res), ok
+
+
+def msb(x):
+    """Mirrors Math64x61__msb: halvings needed to bring x down to FRACT_PART"""
+    x = _unsigned(x)
+    _, ok = _unsigned_div_rem(x, 2)
+    res = np.zeros(x.shape, dtype=object)
+    active = ~is_le(x, FRACT_PART) & ok
+    while active.any():
+        x = _where(active, x // 2, x)
+        res = _where(active, res + 1, res)
+        active &= ~is_le(x, FRACT_PART)
+    return res, ok
+
+
+# 1.069e-7 maximum error
+EXP2_COEFFICIENTS = (
+    2305842762765193127,
+    1598306039479152907,
+    553724477747739017,
+    128818789015678071,
+    20620759886412153,
+    4372943086487302,
+)
+
+
+# 8.56e-5 maximum relative error
+EXP2_FAST_COEFFICIENTS = (
+    2305843009213693952,
+    1602830185465230848,
+    524913604169254912,
+    177704504465444928,
+)
+
+
+def _exp2(x, coefficients):
+    x = _felt(x)
+    exp_value, exp_sign, ok = _abs_sign(x)
+    int_part, frac_part = exp_value // FRACT_PART, exp_value % FRACT_PART
+    ok = ok & (int_part <= 64)
+    int_res = _where(ok, 2 ** np.minimum(int_part, 64), 1)
+
+    # the unchecked Horner steps of Math64x61__exp2_frac
+    a1, *higher = coefficients
+    acc = 0
+    for a in reversed(higher):
+        acc = (acc + a) * frac_part // FRACT_PART
+    frac_res = acc + a1
+
+    res_u = _felt(frac_res * int_res)
+    ok = ok & assert64x61(res_u)
+    res_i, inverse_ok = div(ONE, _where(exp_sign == -1, res_u, ONE))
+    res = _where(exp_sign == -1, res_i, res_u)
+    ok = ok & (_where(exp_sign == -1, inverse_ok, True).astype(bool) & assert64x61(res))
+    return _where(exp_sign == 0, ONE, res), ok | (exp_sign == 0)
+
+
+def exp2(x):
+    """Mirrors Math64x61_exp2: a power-of-two table lookup times a polynomial in the fraction"""
+    return _exp2(x, EXP2_COEFFICIENTS)
+
+
+def exp2_fast(x):
+    """Mirrors Math64x61_exp2_fast, the same lookup with the degree 3 polynomial"""
+    return _exp2(x, EXP2_FAST_COEFFICIENTS)
+
+
+def exp(x):
+    bin_exp, ok = mul(x, 3326628274461080623)
+    res, exp_ok = exp2(bin_exp)
+    return res, ok & exp_ok
+
+
+def exp_fast(x):
+    bin_exp, ok = mul(x, 3326628274461080623)
+    res, exp_ok = exp2_fast(bin_exp)
+    return res, ok & exp_ok
+
+
+# 4.233e-8 maximum error
+LOG2_COEFFICIENTS = (
+    -7898418853509069178,
+    18803698872658890801,
+    -23074885139408336243,
+    21412023763986120774,
+    -13866034373723777071,
+    6084599848616517800,
+    -1725595270316167421,
+    285568853383421422,
+    -20957604075893688,
+)
+
+# 1.431e-5 maximum absolute error, the coefficients of t, t^2, ... in log2(1 + t)
+LOG2_FAST_COEFFICIENTS = (
+    3324946331086716928,
+    -1636371000395437568,
+    962910146217672704,
+    -452566759828511616,
+    106957270518356096,
+)
+
+
+def _log2_norm(norm):
+    a1, *higher = LOG2_COEFFICIENTS
+    acc, ok = 0, True
+    for a in reversed(higher):
+        acc, step_ok = mul(acc + a, norm)
+        ok = ok & step_ok
+    return _felt(acc + a1), ok
+
+
+def _log2_norm_fast(norm):
+    t = norm - ONE
+    acc, ok = 0, True
+    for a in reversed(LOG2_FAST_COEFFICIENTS):
+        acc, step_ok = mul(acc + a, t)
+        ok = ok & step_ok
+    return acc, ok
+
+
+def _log2(x, log2_norm):
+    x = _felt(x)
+    # non-positive inputs recurse forever (or divide by zero) in Cairo
+    ok = x > 0
+    is_frac = is_le(x, FRACT_PART - 1) & ok
+    inverse, inverse_ok = div(ONE, _where(is_frac, x, ONE))
+    ok = ok & (~is_frac | inverse_ok)
+    norm_x = _where(is_frac, inverse, _where(ok, x, ONE))
+
+    x_over_two, step_ok = _unsigned_div_rem(norm_x, 2)
+    ok = ok & step_ok
+    b, msb_ok = msb(x_over_two)
+    ok = ok & msb_ok
+    norm = norm_x // _array(2) ** b
+
+    norm_res, step_ok = log2_norm(norm)
+    ok = ok & step_ok
+
+    int_part, step_ok = from_felt(b)
+    res = _felt(int_part + norm_res)
+    ok = ok & (step_ok & assert64x61(res))
+    # log2(1 / y) is evaluated as -log2(y), and log2(ONE) short-circuits
+    res = _where(norm_x == ONE, 0, res)
+    return _where(is_frac, _felt(-res), res), ok
+
+
+def log2(x):
+    return _log2(x, _log2_norm)
+
+
+def log2_fast(x):
+    return _log2(x, _log2_norm_fast)
+
+
+def ln(x):
+    log2_x, ok = log2(x)
+    res, mul_ok = mul(log2_x, 1598288580650331957)
+    return res, ok & mul_ok
+
+
+def ln_fast(x):
+    log2_x, ok = log2_fast(x)
+    res, mul_ok = mul(log2_x, 1598288580650331957)
+    return res, ok & mul_ok
+
+
+def pow(x, y):
+    """Mirrors Math64x61_pow, falling back to exp(y * ln(x)) for fractional y"""
+    y = _felt(y)
+    y_int, ok = _signed_div_rem(y, ONE, BOUND)
+    y_frac = y - y_int * ONE
+    int_res, int_ok = pow_int(x, y_int)
+    ln_x, ln_ok = ln(x)
+    y_ln_x, mul_ok = mul(y, ln_x)
+    frac_res, exp_ok = exp(y_ln_x)
+    is_int = y_frac == 0
+    ok = ok & (_where(is_int, int_ok, ln_ok & mul_ok & exp_ok).astype(bool))
+    return _where(is_int, int_res, frac_res), ok
+
+
+def _quote(total_cost, ok):
+    low, _ = to_uint256(total_cost)
+    return np.ma.masked_array(low, mask=~ok)
+
+
+def discrete_price_state(current_id, initial_price, scale_factor):
+    """Mirrors the running initialPrice * scaleFactor^currentId kept by discreteGDA
+
+    _mint_batch scales the price once per minted token, so the state only
+    depends on how many tokens were sold, not on how purchases were batched.
+    """
+    current_id = _array(current_id)
+    # the scalar chain of states up to the largest id, indexed by each id
+    prices = [initial_price]
+    prices_ok = [True]
+    for _ in range(max(current_id.flat, default=0)):
+        scaled, step_ok = mul(prices[-1], scale_factor)
+        prices.append(scaled[0])
+        prices_ok.append(prices_ok[-1] and bool(step_ok[0]))
+    indices = current_id.astype(np.int64)
+    return _array(np.array(prices, dtype=object)[indices]), np.array(prices_ok)[indices]
+
+
+def discrete_purchase_price(
+        num_tokens, block_timestamp, current_id,
+        initial_price, scale_factor, decay_constant, auction_start_time, precision=PRECISE):
+    """Quotes discreteGDA.purchase_price over broadcast arrays of inputs
+
+    Parameters are the constructor arguments, so auction_start_time is the
+    deployment timestamp already converted with from_felt.
+    """
+    exp_tier = exp_fast if precision == FAST else exp
+    num_tokens, block_timestamp, current_id = np.broadcast_arrays(
+        _array(num_tokens), _array(block_timestamp), _array(current_id))
+
+    current_price, ok = discrete_price_state(current_id, initial_price, scale_factor)
+    scale_factor_minus_one, step_ok = sub(scale_factor, ONE)
+    ok = ok & step_ok
+    fixed_timestamp, step_ok = from_felt(block_timestamp)
+    ok = ok & step_ok
+    time_since_start, step_ok = sub(fixed_timestamp, auction_start_time)
+    ok = ok & step_ok
+
+    pow_num2, step_ok = pow_int(scale_factor, num_tokens)
+    ok = ok & step_ok
+    mul_num1, step_ok = mul(decay_constant, time_since_start)
+    ok = ok & step_ok
+
+    num2, step_ok = sub(pow_num2, ONE)
+    ok = ok & step_ok
+    den1, step_ok = exp_tier(mul_num1)
+    ok = ok & step_ok
+
+    mul_num2, step_ok = mul(current_price, num2)
+    ok = ok & step_ok
+    mul_num3, step_ok = mul(den1, scale_factor_minus_one)
+    ok = ok & step_ok
+
+    total_cost, step_ok = div(mul_num2, mul_num3)
+    return _quote(total_cost, ok & step_ok)
+
+
+def emission_seconds(num_tokens, seconds_per_token):
+    """Mirrors continuousGDA._emission_seconds"""
+    num_tokens = _felt(num_tokens)
+    res = _felt(num_tokens * _array(seconds_per_token))
+    ok = (0 <= num_tokens) & (num_tokens <= INT_PART)
+    return res, ok & assert64x61(res)
+
+
+def continuous_purchase_price(
+        num_tokens, block_timestamp, last_available_auction_start_time,
+        initial_price, emission_rate, decay_constant, precision=PRECISE):
+    """Quotes continuousGDA.purchase_price over broadcast arrays of inputs
+
+    last_available_auction_start_time is the raw (64.61) storage value.
+    """
+    exp_tier = exp_fast if precision == FAST else exp
+    num_tokens, block_timestamp, auction_start_time = np.broadcast_arrays(
+        _array(num_tokens), _array(block_timestamp), _array(last_available_auction_start_time))
+
+    # coefficients the constructor stores
+    price_coefficient, ok = div(initial_price, decay_constant)
+    seconds_per_token, step_ok = div(ONE, emission_rate)
+    ok = ok & step_ok
+
+    seconds_to_purchase, step_ok = emission_seconds(num_tokens, seconds_per_token)
+    ok = ok & step_ok
+    fixed_timestamp, step_ok = from_felt(block_timestamp)
+    ok = ok & step_ok
+    time_since_start, step_ok = sub(fixed_timestamp, auction_start_time)
+    ok = ok & step_ok
+
+    mul_num1, step_ok = mul(decay_constant, seconds_to_purchase)
+    ok = ok & step_ok
+    exp_num1, step_ok = exp_tier(mul_num1)
+    ok = ok & step_ok
+    num2, step_ok = sub(exp_num1, ONE)
+    ok = ok & step_ok
+    num, step_ok = mul(price_coefficient, num2)
+    ok = ok & step_ok
+
+    mul_num2, step_ok = mul(decay_constant, time_since_start)
+    ok = ok & step_ok
+    den, step_ok = exp_tier(mul_num2)
+    ok = ok & step_ok
+
+    total_cost, step_ok = div(num, den)
+    return _quote(total_cost, ok & step_ok)
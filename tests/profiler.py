@@ -0,0 +1,187 @@
+"""Per-function Cairo step profiles of the benchmarked entry points.
+
+Captures the execution trace of every Cairo run and walks its frame
+pointers to attribute each step to the stack of functions it ran in, named
+with the debug info get_contract_def compiles with. Calls into other
+contracts are nested under the frame that made them.
+
+    python -m tests.profiler 'discreteGDA.purchase_price[quantity=5,*'
+    python -m tests.profiler 'Math64x61_exp*' --folded exp.folded
+
+The folded stacks can be rendered with flamegraph.pl or speedscope.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from starkware.cairo.common.cairo_function_runner import CairoFunctionRunner
+
+from tests import bench
+
+
+class _Run:
+    """The trace of one Cairo run and the stack of the run that called it, if any"""
+
+    def __init__(self, runner, prefix):
+        self.runner = runner
+        self.prefix = prefix
+        self._names = {}
+        self._parents = {}
+
+    def _name(self, pc):
+        offset = pc - self.runner.program_base
+        if offset not in self._names:
+            location = self.runner.program.debug_info.instruction_locations.get(offset)
+            self._names[offset] = (
+                str(location.accessible_scopes[-1]) if location else "<pc %d>" % offset)
+        return self._names[offset]
+
+    def _callers(self, fp):
+        """Functions of the frames below the one at fp, outermost first"""
+        if fp not in self._parents:
+            if fp <= self.runner.initial_fp:
+                self._parents[fp] = self.prefix
+            else:
+                memory = self.runner.vm_memory
+                caller_fp, return_pc = memory[fp - 2], memory[fp - 1]
+                self._parents[fp] = self._callers(caller_fp) + (self._name(return_pc),)
+        return self._parents[fp]
+
+    def stack(self, pc, fp):
+        return self._callers(fp) + (self._name(pc),)
+
+    def current_stack(self):
+        run_context = self.runner.vm.run_context
+        return self.stack(run_context.pc, run_context.fp)
+
+    def samples(self):
+        return Counter(self.stack(entry.pc, entry.fp) for entry in self.runner.vm.trace)
+
+
+class Profile:
+    """Steps per call stack of every Cairo run made while profiling"""
+
+    def __init__(self):
+        self._runs = []
+        self._samples = None
+
+    @property
+    def samples(self):
+        """Counter of steps keyed by call stack, outermost function first"""
+        if self._samples is None:
+            self._samples = Counter()
+            for run in self._runs:
+                self._samples.update(run.samples())
+        return self._samples
+
+    def functions(self):
+        """Returns {function: (inclusive steps, exclusive steps)}, most expensive first"""
+        inclusive = Counter()
+        exclusive = Counter()
+        for stack, steps in self.samples.items():
+            exclusive[stack[-1]] += steps
+            for name in set(stack):
+                inclusive[name] += steps
+        return {
+            name: (steps, exclusive[name])
+            for name, steps in sorted(inclusive.items(), key=lambda item: (-item[1], item[0]))
+        }
+
+    def folded(self, root=None):
+        """Returns the samples as folded stacks, one `a;b;c steps` line per stack"""
+        prefix = () if root is None else (root,)
+        return "".join(
+            "%s %d\n" % (";".join(prefix + stack), steps)
+            for stack, steps in sorted(self.samples.items())
+        )
+
+
+@contextmanager
+def profiling():
+    """Profiles every Cairo run started in the block
+
+    Transactions must not run concurrently inside the block.
+    """
+    profile = Profile()
+    run_from_entrypoint = CairoFunctionRunner.run_from_entrypoint
+    # internal calls run on other executor threads while their caller waits, so one stack
+    # tracks the nesting
+    active = []
+
+    def profiled_run_from_entrypoint(runner, *args, **kwargs):
+        run = _Run(runner, active[-1].current_stack() if active else ())
+        active.append(run)
+        try:
+            return run_from_entrypoint(runner, *args, **kwargs)
+        finally:
+            active.pop()
+            profile._runs.append(run)
+
+    CairoFunctionRunner.run_from_entrypoint = profiled_run_from_entrypoint
+    try:
+        yield profile
+    finally:
+        CairoFunctionRunner.run_from_entrypoint = run_from_entrypoint
+
+
+async def profile_benchmarks(pattern):
+    """Returns {benchmark name: Profile} for the benchmarks matching the * and ? pattern"""
+    measure = bench.measure
+
+    async def profiled_measure(*args, **kwargs):
+        with profiling() as profile:
+            usage = await measure(*args, **kwargs)
+        usage["profile"] = profile
+        return usage
+
+    bench.measure = profiled_measure
+    try:
+        results = await bench.run_benchmarks()
+    finally:
+        bench.measure = measure
+    return {
+        name: usage["profile"] for name, usage in results.items()
+        # brackets are part of the benchmark names, not character classes
+        if fnmatch.fnmatchcase(name, pattern.replace("[", "[[]"))
+    }
+
+
+def format_functions(profile, limit=None):
+    rows = list(profile.functions().items())[:limit]
+    width = max([len(name) for name, _ in rows] + [len("function")])
+    lines = ["%-*s %10s %10s" % (width, "function", "inclusive", "exclusive")]
+    lines.extend(
+        "%-*s %10d %10d" % (width, name, inclusive, exclusive)
+        for name, (inclusive, exclusive) in rows)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pattern", help="benchmark names to profile, * and ? match any characters")
+    parser.add_argument("--folded", help="write the folded stacks of every match to this file")
+    parser.add_argument("--limit", type=int, default=25, help="functions listed per benchmark")
+    args = parser.parse_args(argv)
+
+    profiles = asyncio.get_event_loop().run_until_complete(profile_benchmarks(args.pattern))
+    if not profiles:
+        print("no benchmark matches %r" % args.pattern, file=sys.stderr)
+        return 1
+
+    for name, profile in profiles.items():
+        print(name)
+        print(format_functions(profile, args.limit))
+        print()
+    if args.folded:
+        with open(args.folded, "w") as f:
+            for name, profile in profiles.items():
+                f.write(profile.folded(root=name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Caching quote client for the GDA purchase_price views.
+
+A GDA quote only depends on the quantity, the block timestamp and one piece
+of mutable state: the id of the next token for discreteGDA, or the
+emission cursor (lastAvailableAuctionStartTime) for continuousGDA. The
+client reads that state straight from the local Starknet state, which is
+much cheaper than running the view. It answers repeated quotes from a cache
+keyed on all three.
+
+    quotes = QuoteClient(gda, "discrete")
+    price = await quotes.purchase_price(5)
+
+Entries are dropped when the state moves past them: a purchase changes the
+cursor, and block time leaving the entry's timestamp bucket retires it. On
+top of that the cache keeps at most maxsize entries, least recently used
+first out. Concurrent identical requests share one view call.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from starkware.starknet.public.abi import get_storage_var_address
+
+
+# storage var holding the sold counter or emission cursor of each GDA
+CURSOR_VARS = {
+    "discrete": "ERC721A_next_token_id_",
+    "continuous": "lastAvailableAuctionStartTime",
+}
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_BUCKET_SECONDS = 60
+
+
+class QuoteClient:
+    """purchase_price quotes of one GDA contract, cached per (quantity, timestamp, cursor)"""
+
+    def __init__(self, contract, auction, maxsize=DEFAULT_MAXSIZE,
+                 bucket_seconds=DEFAULT_BUCKET_SECONDS):
+        self.contract = contract
+        self.maxsize = maxsize
+        self.bucket_seconds = bucket_seconds
+        self._cursor_key = get_storage_var_address(CURSOR_VARS[auction])
+        # (quantity, timestamp, cursor) -> future of the price, most recently used last
+        self._entries = OrderedDict()
+        self._cursor = None
+        self._bucket = None
+
+        self.hits = 0
+        self.misses = 0
+        # entries dropped because the cursor moved, because their timestamp bucket passed,
+        # and because the cache was full
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def cursor(self):
+        """Current sold counter or emission cursor of the contract"""
+        contract_state = self.contract.state.state.contract_states[self.contract.contract_address]
+        leaf = contract_state.storage_updates.get(self._cursor_key)
+        return 0 if leaf is None else leaf.value
+
+    def clear(self):
+        self._entries.clear()
+
+    async def purchase_price(self, num_tokens):
+        """Returns purchase_price(num_tokens) at the current block as a Uint256 tuple"""
+        timestamp = self.contract.state.state.block_info.block_timestamp
+        cursor = self.cursor()
+        self._sweep(timestamp // self.bucket_seconds, cursor)
+
+        key = (num_tokens, timestamp, cursor)
+        future = self._entries.get(key)
+        if future is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(self._fetch(num_tokens))
+        self._entries[key] = future
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # never cache a failed quote
+            if self._entries.get(key) is future:
+                del self._entries[key]
+            raise
+
+    async def _fetch(self, num_tokens):
+        observed = await self.contract.purchase_price(num_tokens).call()
+        return observed.result.res
+
+    def _sweep(self, bucket, cursor):
+        """Drops every entry the state has moved past"""
+        if cursor != self._cursor:
+            stale = [key for key in self._entries if key[2] != cursor]
+            self.invalidations += len(stale)
+            self._drop(stale)
+            self._cursor = cursor
+        if bucket != self._bucket:
+            stale = [key for key in self._entries if key[1] // self.bucket_seconds != bucket]
+            self.expirations += len(stale)
+            self._drop(stale)
+            self._bucket = bucket
+
+    def _drop(self, keys):
+        for key in keys:
+            del self._entries[key]
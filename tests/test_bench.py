@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from tests.bench import DEFAULT_THRESHOLD, compare, load_baseline, run_benchmarks
+
+
+@pytest.mark.asyncio
+async def test_no_resource_regression():
+    """Tracked entry points should not cost more than tests/bench_baseline.json allows"""
+    threshold = float(os.environ.get("BENCH_THRESHOLD", DEFAULT_THRESHOLD))
+    results = await run_benchmarks()
+
+    regressions = compare(load_baseline(), results, threshold)
+    assert not regressions, "\n".join(regressions)
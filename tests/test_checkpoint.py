@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from tests import checkpoint
+from tests.bench import storage_values
+from tests.utils import empty_starknet, from_uint, get_contract_def, str_to_felt, to_uint
+
+
+OWNER = 0x1001
+HOLDER = 0x1002
+
+provisioned = []
+
+
+async def provision_erc20(supply):
+    provisioned.append(supply)
+    starknet = await empty_starknet()
+    erc20 = await starknet.deploy(
+        contract_def=get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo"),
+        constructor_calldata=[
+            str_to_felt("Mintable Token"), str_to_felt("MTKN"), 18, *to_uint(0), OWNER, OWNER],
+    )
+    await starknet.state.invoke_raw(erc20.contract_address, "mint", [HOLDER, *to_uint(supply)], OWNER)
+    return starknet, {"erc20": erc20}
+
+
+@pytest.fixture
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    provisioned.clear()
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_reload(checkpoint_dir):
+    starknet, manifest = await checkpoint.load_or_provision(provision_erc20, 100)
+    assert provisioned == [100]
+    assert len(os.listdir(checkpoint_dir)) == 1
+
+    restored, restored_manifest = await checkpoint.load_or_provision(provision_erc20, 100)
+    assert provisioned == [100]
+    assert storage_values(restored.state) == storage_values(starknet.state)
+
+    erc20 = restored_manifest["erc20"]
+    assert erc20.contract_address == manifest["erc20"].contract_address
+    assert erc20.state is restored.state
+    observed = await erc20.balanceOf(HOLDER).call()
+    assert from_uint(observed.result.balance) == 100
+
+    # the definitions come from the contract cache instead of the checkpoint
+    contract_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
+    assert list(restored.state.state.contract_definitions.values()) == [contract_def]
+    assert next(iter(restored.state.state.contract_definitions.values())) is contract_def
+
+
+@pytest.mark.asyncio
+async def test_arguments_and_corruption(checkpoint_dir):
+    await checkpoint.load_or_provision(provision_erc20, 100)
+    await checkpoint.load_or_provision(provision_erc20, 200)
+    assert provisioned == [100, 200]
+
+    # a truncated checkpoint is provisioned again
+    path = os.path.join(
+        checkpoint_dir, checkpoint.checkpoint_key(provision_erc20, (100,)) + ".pickle")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:len(data) // 2])
+    starknet, manifest = await checkpoint.load_or_provision(provision_erc20, 100)
+    assert provisioned == [100, 200, 100]
+    observed = await manifest["erc20"].balanceOf(HOLDER).call()
+    assert from_uint(observed.result.balance) == 100
+
+
+def test_key_follows_sources(monkeypatch):
+    key = checkpoint.checkpoint_key(provision_erc20, (100,))
+    assert checkpoint.checkpoint_key(provision_erc20, (100,)) == key
+    monkeypatch.setattr(checkpoint, "sources_hash", lambda: "edited")
+    assert checkpoint.checkpoint_key(provision_erc20, (100,)) != key
+
+    sources = checkpoint.script_sources(__file__)
+    assert {os.path.relpath(path, checkpoint.ROOT) for path in sources} >= {
+        os.path.join("tests", "test_checkpoint.py"), os.path.join("tests", "checkpoint.py"),
+        os.path.join("tests", "utils.py"), os.path.join("tests", "bench.py")}
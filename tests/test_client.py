@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+from starkware.cairo.common.hash_state import compute_hash_on_elements
+from starkware.crypto.signature import signature
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+from starkware.starknet.public.abi import get_selector_from_name
+
+import tests.client
+from tests.client import crypto
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# wall time a fresh interpreter may spend importing the client, hashing a multicall and
+# signing it
+STARTUP_BUDGET_MS = float(os.environ.get("CLIENT_STARTUP_BUDGET_MS", 300))
+# modules the client must not import, they take most of a second
+HEAVY_MODULES = ("sympy", "starkware", "tests.utils")
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from tests.client import Signer, hash_multicall, str_to_felt, to_uint
+message_hash = hash_multicall(1, [(2, str_to_felt("purchaseTokens"), [1, 3, *to_uint(2 ** 200)])], 0, 0)
+Signer(123456789987654321).sign(message_hash)
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed_ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_crypto_matches_starkware():
+    assert crypto.FIELD_PRIME == signature.FIELD_PRIME
+    assert crypto.ALPHA == signature.ALPHA
+    assert crypto.BETA == signature.BETA
+    assert crypto.EC_ORDER == signature.EC_ORDER
+    assert list(crypto.EC_GEN) == signature.EC_GEN
+    points = [crypto.HASH_SHIFT_POINT, crypto.P_0, crypto.P_1, crypto.P_2, crypto.P_3]
+    indices = [0, 2, 2 + 248, 2 + 252, 2 + 252 + 248]
+    assert [[point.x, point.y] for point in points] == [
+        signature.CONSTANT_POINTS[i] for i in indices]
+
+    for x, y in ((0, 0), (1, 2), (2 ** 251 + 17, 12345), (crypto.FIELD_PRIME - 1, 2 ** 248)):
+        assert crypto.pedersen_hash(x, y) == pedersen_hash(x, y)
+    for data in ([], [1], [3, 2 ** 250, 7, 0]):
+        assert crypto.compute_hash_on_elements(data) == compute_hash_on_elements(data)
+    for name in ("purchaseTokens", "__execute__", "a" * 100):
+        assert crypto.starknet_keccak(name.encode()) == get_selector_from_name(name)
+    assert tests.client.get_selector("__default__") == get_selector_from_name("__default__")
+
+
+def test_lazy_exports():
+    assert set(tests.client.__all__) <= set(dir(tests.client))
+    for name in tests.client.__all__:
+        assert getattr(tests.client, name) is not None
+
+
+def test_cold_start():
+    runs = [
+        json.loads(subprocess.run(
+            [sys.executable, "-c", COLD_START], cwd=ROOT, check=True, stdout=subprocess.PIPE,
+        ).stdout)
+        for _ in range(3)
+    ]
+    heavy = [
+        module for module in runs[0]["modules"] if module.startswith(HEAVY_MODULES)]
+    assert heavy == []
+    fastest = min(run["elapsed_ms"] for run in runs)
+    assert fastest <= STARTUP_BUDGET_MS, "cold start took %.0fms, budget %.0fms" % (
+        fastest, STARTUP_BUDGET_MS)
@@ -1,13 +1,11 @@
-import asyncio
-import time
-
 import pytest
 import starkware.starknet.testing.objects
-from starkware.starknet.testing.starknet import Starknet
 from starkware.starkware_utils.error_handling import StarkException
 from starkware.starknet.business_logic.state import BlockInfo
 
-from tests.utils import Signer, str_to_felt, to_uint, uint
+from tests.checkpoint import checkpointed
+from tests.pricing import ONE, PRECISE
+from tests.utils import Signer, empty_starknet, get_contract_def, str_to_felt, to_uint, uint
 
 
 FALSE, TRUE = 0, 1
@@ -19,30 +17,33 @@ TOKENS = [to_uint(5042), to_uint(793)]
 # test token
 TOKEN = TOKENS[0]
 
-INITIAL_PRICE = 1000
-DECAY_CONSTANT = 5
-EMISSION_RATE = 10
-
+# 64.61 fixed point: one token emitted every 8 seconds
+INITIAL_PRICE = 1000 * ONE
+DECAY_CONSTANT = ONE // 10
+EMISSION_RATE = ONE // 8
 
-@pytest.fixture(scope="module")
-def event_loop():
-    return asyncio.new_event_loop()
+# a realistic timestamp, fixed so every fork and checkpoint of the world agrees on it
+START_TIME = 1650000000
 
 
-@pytest.fixture(scope="module")
-async def contract_factory():
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
     # Deploy the contracts
-    starknet = await Starknet.empty()
+    starknet = await empty_starknet()
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    gda_def = get_contract_def("contracts/continuousGDA.cairo")
+    erc20_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
 
     # initialize a realistic timestamp
-    set_block_timestamp(starknet.state, round(time.time()))
+    set_block_timestamp(starknet.state, START_TIME)
 
     account1 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     contract = await starknet.deploy(
-        "contracts/continuousGDA.cairo",
+        contract_def=gda_def,
         constructor_calldata=[
             str_to_felt("Token"),  # name
             str_to_felt("TKN"),  # ticker
@@ -50,15 +51,16 @@ async def contract_factory():
             INITIAL_PRICE,
             EMISSION_RATE,
             DECAY_CONSTANT,
+            PRECISE,
         ],
     )
     account2 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     # ERC20 type accepted as payment
     erc20 = await starknet.deploy(
-        "openzeppelin/token/erc20/ERC20_Mintable.cairo",
+        contract_def=erc20_def,
         constructor_calldata=[
             str_to_felt("Mintable Token"),
             str_to_felt("MTKN"),
@@ -77,14 +79,19 @@ async def contract_factory():
         calldata=[contract.contract_address, *to_uint(2002)],
     )
 
-    return starknet, contract, account1, account2, erc20
+    return starknet, [
+        (gda_def, contract),
+        (account_def, account1),
+        (account_def, account2),
+        (erc20_def, erc20),
+    ]
 
 
 @pytest.mark.asyncio
 async def test_insufficient_payment(contract_factory):
     starknet, contract, account1, account2, erc20 = contract_factory
-    # Warp 5 seconds ahead = 5 tokens available for sale
-    set_block_timestamp(starknet.state, round(time.time()) + 50)
+    # Warp 40 seconds ahead = 5 tokens available for sale
+    set_block_timestamp(starknet.state, START_TIME + 40)
 
     observed = await contract.purchase_price(5).call()
 
@@ -103,8 +110,8 @@ async def test_insufficient_payment(contract_factory):
 @pytest.mark.asyncio
 async def test_insufficient_emissions(contract_factory):
     starknet, contract, account1, account2, erc20 = contract_factory
-    # Warp 10 seconds ahead = 10 tokens available for sale
-    set_block_timestamp(starknet.state, round(time.time()) + 100)
+    # Warp 80 seconds ahead = 10 tokens available for sale
+    set_block_timestamp(starknet.state, START_TIME + 80)
 
     observed = await contract.purchase_price(11).call()
 
@@ -125,8 +132,8 @@ async def test_insufficient_emissions(contract_factory):
 @pytest.mark.asyncio
 async def test_mint_correctly(contract_factory):
     starknet, contract, account1, account2, erc20 = contract_factory
-    # Warp 5 seconds ahead = 5 tokens available for sale
-    set_block_timestamp(starknet.state, round(time.time()) + 50)
+    # Warp 40 seconds ahead = 5 tokens available for sale
+    set_block_timestamp(starknet.state, START_TIME + 40)
 
 
     # Checks balance is null
@@ -152,6 +159,37 @@ async def test_mint_correctly(contract_factory):
     assert balance_new.result == ((5, 0),)
 
 
+@pytest.mark.asyncio
+async def test_emissions_exhaust(contract_factory):
+    starknet, contract, account1, account2, erc20 = contract_factory
+    set_block_timestamp(starknet.state, START_TIME + 40)
+
+    await signer.send_transaction(
+        account=account2,
+        to=contract.contract_address,
+        selector_name="purchaseTokens",
+        calldata=[5, account2.contract_address, *to_uint(2 ** 128 - 1)],
+    )
+    # every token emitted so far has been sold
+    with pytest.raises(StarkException):
+        await signer.send_transaction(
+            account=account2,
+            to=contract.contract_address,
+            selector_name="purchaseTokens",
+            calldata=[1, account2.contract_address, *to_uint(2 ** 128 - 1)],
+        )
+
+    set_block_timestamp(starknet.state, START_TIME + 48)
+    await signer.send_transaction(
+        account=account2,
+        to=contract.contract_address,
+        selector_name="purchaseTokens",
+        calldata=[1, account2.contract_address, *to_uint(2 ** 128 - 1)],
+    )
+    balance = await contract.balanceOf(account2.contract_address).call()
+    assert balance.result == ((6, 0),)
+
+
 # @pytest.mark.asyncio
 # async def test_refund(contract_factory):
 #     starknet, contract, account1, account2, erc20 = contract_factory
@@ -0,0 +1,84 @@
+import pytest
+
+from tests import costs
+from tests.bench import DISCRETE_PARAMS, START_TIME, set_block, storage_values
+from tests.checkpoint import checkpointed
+from tests.utils import MAX_UINT256, empty_starknet, get_contract_def, str_to_felt
+
+
+OWNER = 0x1001
+BUYER = 0x1003
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    set_block(starknet.state, block_number=1, timestamp=START_TIME)
+    discrete_def = get_contract_def("contracts/discreteGDA.cairo")
+    discrete = await starknet.deploy(
+        contract_def=discrete_def,
+        constructor_calldata=[str_to_felt("NFT"), str_to_felt("NFT"), OWNER, *DISCRETE_PARAMS],
+    )
+    return starknet, [(discrete_def, discrete)]
+
+
+@pytest.mark.asyncio
+async def test_estimate_purchase(contract_factory):
+    starknet, discrete = contract_factory
+    address = discrete.contract_address
+    storage = storage_values(starknet.state)
+
+    result = await costs.estimate(
+        starknet.state, address, "purchaseTokens", [5, BUYER, *MAX_UINT256], BUYER)
+    assert result["modified_contracts"] == 1
+    assert result["storage_diff"] == len(result["storage_keys"]) > 0
+    assert result["da_words"] == 2 * result["modified_contracts"] + 2 * result["storage_diff"]
+    assert result["l1_gas"] == costs.GAS_PER_DA_WORD * result["da_words"]
+    assert result["l2_gas"] == costs.l2_gas(result["resources"])
+    assert result["total_gas"] == result["l1_gas"] + result["l2_gas"]
+
+    labels = {label for _, _, label in result["storage_keys"]}
+    assert "priceState" in labels
+    assert {key_address for key_address, _, _ in result["storage_keys"]} == {hex(address)}
+
+    # the estimate ran on a copy of the state
+    assert storage_values(starknet.state) == storage
+
+
+@pytest.mark.asyncio
+async def test_view_has_no_diff(contract_factory):
+    starknet, discrete = contract_factory
+    result = await costs.estimate(
+        starknet.state, discrete.contract_address, "purchase_price", [5])
+    assert result["storage_diff"] == result["modified_contracts"] == 0
+    assert result["l1_gas"] == 0
+    assert result["total_gas"] == result["l2_gas"] > 0
+
+
+def test_format_report():
+    cell = {
+        "storage_keys": [["0x1", "0x2", "priceState"], ["0x1", "0x3", None]],
+        "modified_contracts": 1,
+        "storage_diff": 2,
+        "l1_gas": 3072,
+        "l2_gas": 100,
+        "total_gas": 3172,
+    }
+    reports = {
+        "HEAD~1": ({}, {"bench_dutch": "TypeError: missing argument"}),
+        ".": ({"dutch.buy[bought_at_block=0]": cell}, {}),
+    }
+    report = costs.format_report(reports, keys=True).splitlines()
+    assert report[0] == "| transaction | HEAD~1 | . |"
+    assert report[1] == "|---|---|---|"
+    assert report[2] == "| dutch.buy[bought_at_block=0] | - | 2 keys, 1 contracts: 3072 + 100 = 3172 |"
+    assert "HEAD~1: bench_dutch failed (TypeError: missing argument)" in report
+    assert "    0x1 0x2 priceState" in report
+    assert "    0x1 0x3 " in report
+
+
+def test_matches():
+    assert costs._matches("dutch.buy[bought_at_block=0]", costs.DEFAULT_PATTERNS)
+    assert costs._matches("discreteGDA.purchaseTokens[quantity=1,sold=0]", costs.DEFAULT_PATTERNS)
+    assert not costs._matches("dutch.getPrice[block=0]", costs.DEFAULT_PATTERNS)
@@ -1,11 +1,10 @@
-import asyncio
-
 import pytest
 import starkware.starknet.testing.objects
-from starkware.starknet.testing.starknet import Starknet
 from starkware.starkware_utils.error_handling import StarkException
 
-from tests.utils import Signer, str_to_felt, to_uint, uint
+from tests.checkpoint import checkpointed
+from tests.pricing import PRECISE
+from tests.utils import MAX_UINT256, Signer, empty_starknet, get_contract_def, str_to_felt, to_uint, uint
 
 
 FALSE, TRUE = 0, 1
@@ -22,21 +21,21 @@ DECAY_CONSTANT = 1
 SCALE_FACTOR = 10
 
 
-@pytest.fixture(scope="module")
-def event_loop():
-    return asyncio.new_event_loop()
-
-
-@pytest.fixture(scope="module")
-async def contract_factory():
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
     # Deploy the contracts
-    starknet = await Starknet.empty()
+    starknet = await empty_starknet()
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    gda_def = get_contract_def("contracts/discreteGDA.cairo")
+    erc20_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
+
     account1 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     contract = await starknet.deploy(
-        "contracts/discreteGDA.cairo",
+        contract_def=gda_def,
         constructor_calldata=[
             str_to_felt("Non Fungible Token"),  # name
             str_to_felt("NFT"),  # ticker
@@ -44,15 +43,16 @@ async def contract_factory():
             INITIAL_PRICE,
             SCALE_FACTOR,
             DECAY_CONSTANT,
+            PRECISE,
         ],
     )
     account2 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     # ERC20 type accepted as payment
     erc20 = await starknet.deploy(
-        "openzeppelin/token/erc20/ERC20_Mintable.cairo",
+        contract_def=erc20_def,
         constructor_calldata=[
             str_to_felt("Mintable Token"),
             str_to_felt("MTKN"),
@@ -71,7 +71,12 @@ async def contract_factory():
         calldata=[contract.contract_address, *to_uint(INITIAL_PRICE)],
     )
 
-    return starknet, contract, account1, account2, erc20
+    return starknet, [
+        (gda_def, contract),
+        (account_def, account1),
+        (account_def, account2),
+        (erc20_def, erc20),
+    ]
 
 
 @pytest.mark.asyncio
@@ -127,6 +132,104 @@ async def test_mint_correctly(contract_factory):
     assert new_owner.result == (account2.contract_address,)
 
 
+async def purchase(contract, buyer, quantity):
+    await signer.send_transaction(
+        account=buyer,
+        to=contract.contract_address,
+        selector_name="purchaseTokens",
+        calldata=[quantity, buyer.contract_address, *MAX_UINT256],
+    )
+
+
+@pytest.mark.asyncio
+async def test_mint_batch(contract_factory):
+    """A purchase mints one run of consecutive tokens"""
+    starknet, contract, account1, account2, erc20 = contract_factory
+
+    await purchase(contract, account2, 3)
+    await purchase(contract, account1, 2)
+
+    for token_id, owner in enumerate([account2] * 3 + [account1] * 2):
+        observed = await contract.ownerOf(to_uint(token_id)).call()
+        assert observed.result == (owner.contract_address,)
+    with pytest.raises(StarkException):
+        await contract.ownerOf(to_uint(5)).call()
+
+    observed = await contract.balanceOf(account2.contract_address).call()
+    assert observed.result == (to_uint(3),)
+    observed = await contract.balanceOf(account1.contract_address).call()
+    assert observed.result == (to_uint(2),)
+
+
+@pytest.mark.asyncio
+async def test_transfer_splits_run(contract_factory):
+    starknet, contract, account1, account2, erc20 = contract_factory
+
+    await purchase(contract, account2, 4)
+    await signer.send_transaction(
+        account=account2,
+        to=contract.contract_address,
+        selector_name="transferFrom",
+        calldata=[account2.contract_address, account1.contract_address, *to_uint(1)],
+    )
+
+    owners = [account2, account1, account2, account2]
+    for token_id, owner in enumerate(owners):
+        observed = await contract.ownerOf(to_uint(token_id)).call()
+        assert observed.result == (owner.contract_address,)
+
+    observed = await contract.balanceOf(account2.contract_address).call()
+    assert observed.result == (to_uint(3),)
+    observed = await contract.balanceOf(account1.contract_address).call()
+    assert observed.result == (to_uint(1),)
+
+
+@pytest.mark.asyncio
+async def test_burn_splits_run(contract_factory):
+    starknet, contract, account1, account2, erc20 = contract_factory
+
+    await purchase(contract, account2, 3)
+    await signer.send_transaction(
+        account=account2,
+        to=contract.contract_address,
+        selector_name="burn",
+        calldata=[*to_uint(0)],
+    )
+
+    with pytest.raises(StarkException):
+        await contract.ownerOf(to_uint(0)).call()
+    for token_id in [1, 2]:
+        observed = await contract.ownerOf(to_uint(token_id)).call()
+        assert observed.result == (account2.contract_address,)
+
+    observed = await contract.balanceOf(account2.contract_address).call()
+    assert observed.result == (to_uint(2),)
+
+
+@pytest.mark.asyncio
+async def test_owner_mints_in_order(contract_factory):
+    starknet, contract, account1, account2, erc20 = contract_factory
+
+    await purchase(contract, account2, 2)
+
+    with pytest.raises(StarkException):
+        await signer.send_transaction(
+            account=account1,
+            to=contract.contract_address,
+            selector_name="mint",
+            calldata=[account1.contract_address, *to_uint(5)],
+        )
+
+    await signer.send_transaction(
+        account=account1,
+        to=contract.contract_address,
+        selector_name="mint",
+        calldata=[account1.contract_address, *to_uint(2)],
+    )
+    observed = await contract.ownerOf(to_uint(2)).call()
+    assert observed.result == (account1.contract_address,)
+
+
 # @pytest.mark.asyncio
 # async def test_refund(contract_factory):
 #     starknet, contract, account1, account2, erc20 = contract_factory
@@ -1,11 +1,9 @@
-import asyncio
-
 import pytest
 import starkware.starknet.testing.objects
-from starkware.starknet.testing.starknet import Starknet
 from starkware.starkware_utils.error_handling import StarkException
 
-from tests.utils import Signer, str_to_felt, to_uint, uint
+from tests.checkpoint import checkpointed
+from tests.utils import Signer, empty_starknet, get_contract_def, str_to_felt, to_uint, uint
 
 
 FALSE, TRUE = 0, 1
@@ -20,27 +18,28 @@ TOKEN = TOKENS[0]
 STARTING_PRICE = to_uint(500)
 
 
-@pytest.fixture(scope="module")
-def event_loop():
-    return asyncio.new_event_loop()
-
-
-@pytest.fixture(scope="module")
-async def contract_factory():
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
     # Deploy the contracts
-    starknet = await Starknet.empty()
-    contract = await starknet.deploy("contracts/dutch.cairo")
+    starknet = await empty_starknet()
+    dutch_def = get_contract_def("contracts/dutch.cairo")
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    erc721_def = get_contract_def("openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo")
+    erc20_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
+
+    contract = await starknet.deploy(contract_def=dutch_def)
     account1 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     account2 = await starknet.deploy(
-        "openzeppelin/account/Account.cairo",
+        contract_def=account_def,
         constructor_calldata=[signer.public_key],
     )
     # NFT type being sold
     erc721 = await starknet.deploy(
-        "openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo",
+        contract_def=erc721_def,
         constructor_calldata=[
             str_to_felt("Non Fungible Token"),  # name
             str_to_felt("NFT"),                 # ticker
@@ -49,7 +48,7 @@ async def contract_factory():
     )
     # ERC20 type accepted as payment
     erc20 = await starknet.deploy(
-        "openzeppelin/token/erc20/ERC20_Mintable.cairo",
+        contract_def=erc20_def,
         constructor_calldata=[
             str_to_felt("Mintable Token"),
             str_to_felt("MTKN"),
@@ -83,7 +82,32 @@ async def contract_factory():
         calldata=[contract.contract_address, *STARTING_PRICE]
     )
 
-    return starknet, contract, account1, account2, erc721, erc20
+    return starknet, [
+        (dutch_def, contract),
+        (account_def, account1),
+        (account_def, account2),
+        (erc721_def, erc721),
+        (erc20_def, erc20),
+    ]
+
+
+async def initialize_auction(contract, seller, erc721, erc20, token=TOKEN):
+    """Returns the id of the new auction"""
+    execution_info = await signer.send_transaction(
+        account=seller,
+        to=contract.contract_address,
+        selector_name="initialize",
+        calldata=[
+            erc721.contract_address,  # nftAddress
+            *token,  # tokenId
+            erc20.contract_address,  # erc20Address
+            *STARTING_PRICE,  # startingPrice
+            *uint(1),  # discountRate
+            30,  # durationBlocks
+        ]
+    )
+    auction_id, = execution_info.result.response
+    return auction_id
 
 
 @pytest.mark.asyncio
@@ -91,7 +115,7 @@ async def test_isInitialized(contract_factory):
     """Should be uninitialized by default"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
-    observed = await contract.isInitialized().call()
+    observed = await contract.isInitialized(1).call()
     assert observed.result == (FALSE, )
 
 
@@ -116,7 +140,7 @@ async def test_initialize_not_owner(contract_factory):
         )
 
     # Should not be initialized
-    observed = await contract.isInitialized().call()
+    observed = await contract.isInitialized(1).call()
     assert observed.result == (FALSE, )
 
 
@@ -125,23 +149,76 @@ async def test_initialize(contract_factory):
     """Should intialize auction if token owned"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
+    auction_id = await initialize_auction(contract, account1, erc721, erc20)
+    assert auction_id == 1
+
+    # Should now be initialized
+    observed = await contract.isInitialized(auction_id).call()
+    assert observed.result == (TRUE, )
+    observed = await contract.getAuctionId(erc721.contract_address, TOKEN).call()
+    assert observed.result == (auction_id, )
+
+
+@pytest.mark.asyncio
+async def test_initialize_twice(contract_factory):
+    """Should not intialize a second auction while the first is live"""
+    starknet, contract, account1, account2, erc721, erc20 = contract_factory
+
+    await initialize_auction(contract, account1, erc721, erc20)
+
+    with pytest.raises(StarkException):
+        await initialize_auction(contract, account1, erc721, erc20)
+
+
+@pytest.mark.asyncio
+async def test_initialize_price_too_large(contract_factory):
+    """Prices are stored as felts, so they must fit in 128 bits"""
+    starknet, contract, account1, account2, erc721, erc20 = contract_factory
+
+    with pytest.raises(StarkException):
+        await signer.send_transaction(
+            account=account1,
+            to=contract.contract_address,
+            selector_name="initialize",
+            calldata=[
+                erc721.contract_address,  # nftAddress
+                *TOKEN,  # tokenId
+                erc20.contract_address,  # erc20Address
+                *to_uint(2 ** 128),  # startingPrice
+                *uint(1),  # discountRate
+                30,  # durationBlocks
+            ]
+        )
+
+    observed = await contract.getAuctionCount().call()
+    assert observed.result == (0, )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_auctions(contract_factory):
+    """Should host independent auctions for different tokens"""
+    starknet, contract, account1, account2, erc721, erc20 = contract_factory
+
+    auction_ids = [
+        await initialize_auction(contract, account1, erc721, erc20, token) for token in TOKENS]
+    assert auction_ids == [1, 2]
+    observed = await contract.getAuctionCount().call()
+    assert observed.result == (2, )
+
     await signer.send_transaction(
-        account=account1,
+        account=account2,
         to=contract.contract_address,
-        selector_name="initialize",
-        calldata=[
-            erc721.contract_address,  # nftAddress
-            *TOKEN,  # tokenId
-            erc20.contract_address,  # erc20Address
-            *STARTING_PRICE,  # startingPrice
-            *uint(1),  # discountRate
-            30,  # durationBlocks
-        ]
+        selector_name="buy",
+        calldata=[auction_ids[1], *STARTING_PRICE]
     )
 
-    # Should now be initialized
-    observed = await contract.isInitialized().call()
-    assert observed.result == (TRUE, )
+    observed = await erc721.ownerOf(TOKENS[1]).call()
+    assert observed.result == (account2.contract_address,)
+    observed = await contract.getAuction(auction_ids[1]).call()
+    assert observed.result.res.sold == TRUE
+    observed = await contract.getAuction(auction_ids[0]).call()
+    assert observed.result.res.sold == FALSE
+    assert observed.result.res.tokenId == TOKENS[0]
 
 
 @pytest.mark.asyncio
@@ -149,12 +226,14 @@ async def test_buy_as_seller(contract_factory):
     """Should not buy if seller == buyer"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
+    auction_id = await initialize_auction(contract, account1, erc721, erc20)
+
     with pytest.raises(StarkException):
         await signer.send_transaction(
             account=account1,
             to=contract.contract_address,
             selector_name="buy",
-            calldata=[*STARTING_PRICE]
+            calldata=[auction_id, *STARTING_PRICE]
         )
 
 
@@ -163,12 +242,14 @@ async def test_buy_lowball(contract_factory):
     """Should not buy if bid < price"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
+    auction_id = await initialize_auction(contract, account1, erc721, erc20)
+
     with pytest.raises(StarkException):
         await signer.send_transaction(
             account=account2,
             to=contract.contract_address,
             selector_name="buy",
-            calldata=[*uint(499)]
+            calldata=[auction_id, *uint(499)]
         )
 
 
@@ -177,11 +258,13 @@ async def test_buy(contract_factory):
     """Should buy if all conditions met"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
+    auction_id = await initialize_auction(contract, account1, erc721, erc20)
+
     await signer.send_transaction(
         account=account2,
         to=contract.contract_address,
         selector_name="buy",
-        calldata=[*STARTING_PRICE]
+        calldata=[auction_id, *STARTING_PRICE]
     )
 
     # Checks token has new owner
@@ -201,10 +284,18 @@ async def test_buy_sold(contract_factory):
     """Should not buy if auction already sold"""
     starknet, contract, account1, account2, erc721, erc20 = contract_factory
 
+    auction_id = await initialize_auction(contract, account1, erc721, erc20)
+    await signer.send_transaction(
+        account=account2,
+        to=contract.contract_address,
+        selector_name="buy",
+        calldata=[auction_id, *STARTING_PRICE]
+    )
+
     with pytest.raises(StarkException):
         await signer.send_transaction(
             account=account2,
             to=contract.contract_address,
             selector_name="buy",
-            calldata=[*STARTING_PRICE]
+            calldata=[auction_id, *STARTING_PRICE]
         )
@@ -0,0 +1,310 @@
+import pytest
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests.bench import set_block
+from tests.checkpoint import checkpointed
+from tests.indexer import raw_events
+from tests.utils import (
+    TRUE,
+    empty_starknet,
+    from_uint,
+    get_contract_def,
+    get_selector,
+    str_to_felt,
+    to_uint,
+)
+
+
+OWNER = 0x1001
+SELLER = 0x1002
+BIDDERS = [0x1003, 0x1004, 0x1005, 0x1006]
+
+FIRST_TOKEN = 100
+UNITS = 4
+STARTING_PRICE = 500
+DISCOUNT_RATE = 10
+DURATION_BLOCKS = 30
+FUNDS = 10000
+# SETTLEMENT_GRACE_BLOCKS of contracts/dutch.cairo
+GRACE_BLOCKS = 100
+TOKENS = range(FIRST_TOKEN, FIRST_TOKEN + UNITS)
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    set_block(starknet.state, block_number=1)
+    dutch_def = get_contract_def("contracts/dutch.cairo")
+    erc721_def = get_contract_def("openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo")
+    erc20_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
+
+    dutch = await starknet.deploy(contract_def=dutch_def)
+    erc721 = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("Non Fungible Token"), str_to_felt("NFT"), OWNER],
+    )
+    erc20 = await starknet.deploy(
+        contract_def=erc20_def,
+        constructor_calldata=[
+            str_to_felt("Mintable Token"), str_to_felt("MTKN"), 18, *to_uint(0), OWNER, OWNER],
+    )
+
+    state = starknet.state
+    for token in TOKENS:
+        await state.invoke_raw(erc721.contract_address, "mint", [SELLER, *to_uint(token)], OWNER)
+    await state.invoke_raw(
+        erc721.contract_address, "setApprovalForAll", [dutch.contract_address, TRUE], SELLER)
+    for bidder in BIDDERS:
+        await state.invoke_raw(erc20.contract_address, "mint", [bidder, *to_uint(FUNDS)], OWNER)
+        await state.invoke_raw(
+            erc20.contract_address, "approve", [dutch.contract_address, *to_uint(FUNDS)], bidder)
+
+    return starknet, [(dutch_def, dutch), (erc721_def, erc721), (erc20_def, erc20)]
+
+
+async def initialize_batch(starknet, dutch, erc721, erc20):
+    """Returns the id of a batch auction of UNITS tokens starting at block 1"""
+    execution_info = await starknet.state.invoke_raw(dutch.contract_address, "initializeBatch", [
+        erc721.contract_address, *to_uint(FIRST_TOKEN), erc20.contract_address,
+        *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS, UNITS], SELLER)
+    auction_id, = execution_info.retdata
+    return auction_id
+
+
+async def commit(starknet, dutch, auction_id, bidder, quantity, block_number):
+    set_block(starknet.state, block_number=block_number)
+    return await starknet.state.invoke_raw(
+        dutch.contract_address, "commitBid", [auction_id, quantity], bidder)
+
+
+async def balance(starknet, erc20, account):
+    execution_info = await starknet.state.invoke_raw(
+        erc20.contract_address, "balanceOf", [account], 0)
+    return from_uint(execution_info.retdata)
+
+
+async def owner(starknet, erc721, token):
+    execution_info = await starknet.state.invoke_raw(
+        erc721.contract_address, "ownerOf", [*to_uint(token)], 0)
+    return execution_info.retdata[0]
+
+
+def price(block_number):
+    return STARTING_PRICE - DISCOUNT_RATE * (block_number - 1)
+
+
+@pytest.mark.asyncio
+async def test_settle_at_clearing_price(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+
+    # (bidder, quantity, block): the last bid asks for 3 of the 1 unit left
+    bids = [(BIDDERS[0], 1, 1), (BIDDERS[1], 2, 5), (BIDDERS[2], 3, 10)]
+    for bidder, quantity, block_number in bids:
+        await commit(starknet, dutch, auction_id, bidder, quantity, block_number)
+        assert await balance(starknet, erc20, bidder) == FUNDS - quantity * price(block_number)
+
+    observed = await dutch.getBatch(auction_id).call()
+    assert observed.result.res == (UNITS, 3, 6)
+    with pytest.raises(StarkException, match="auction sold out"):
+        await commit(starknet, dutch, auction_id, BIDDERS[3], 1, 11)
+
+    # settling before expiry is allowed once every unit is bid for
+    clearing_price = price(10)
+    execution_info = await starknet.state.invoke_raw(
+        dutch.contract_address, "settle", [auction_id], BIDDERS[3])
+
+    filled = [1, 2, 1]
+    for (bidder, _, _), quantity in zip(bids, filled):
+        assert await balance(starknet, erc20, bidder) == FUNDS - quantity * clearing_price
+    assert await balance(starknet, erc20, SELLER) == UNITS * clearing_price
+    assert await balance(starknet, erc20, dutch.contract_address) == 0
+
+    owners = [await owner(starknet, erc721, token) for token in TOKENS]
+    assert owners == [BIDDERS[0], BIDDERS[1], BIDDERS[1], BIDDERS[2]]
+
+    purchases = [
+        event.data for event in raw_events(execution_info)
+        if event.keys == [get_selector("Purchase")]
+    ]
+    assert purchases == [
+        [auction_id, BIDDERS[0], 1, *to_uint(clearing_price), 1],
+        [auction_id, BIDDERS[1], 2, *to_uint(2 * clearing_price), 3],
+        [auction_id, BIDDERS[2], 1, *to_uint(clearing_price), 4],
+    ]
+
+    with pytest.raises(StarkException, match="auction already settled"):
+        await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+
+
+@pytest.mark.asyncio
+async def test_settle_undersubscribed(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+
+    await commit(starknet, dutch, auction_id, BIDDERS[0], 1, 3)
+    await commit(starknet, dutch, auction_id, BIDDERS[1], 1, 20)
+    with pytest.raises(StarkException, match="auction still open"):
+        await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + 1)
+    with pytest.raises(StarkException, match="auction expired"):
+        await commit(starknet, dutch, auction_id, BIDDERS[2], 1, 1 + DURATION_BLOCKS + 1)
+    await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+
+    # both bids pay the price of the last one, and the other units stay with the seller
+    for bidder in BIDDERS[:2]:
+        assert await balance(starknet, erc20, bidder) == FUNDS - price(20)
+    assert await balance(starknet, erc20, SELLER) == 2 * price(20)
+    owners = [await owner(starknet, erc721, token) for token in TOKENS]
+    assert owners == [BIDDERS[0], BIDDERS[1], SELLER, SELLER]
+
+
+@pytest.mark.asyncio
+async def test_modes_are_exclusive(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+
+    with pytest.raises(StarkException, match="batch auction, commit a bid"):
+        await starknet.state.invoke_raw(
+            dutch.contract_address, "buy", [auction_id, *to_uint(STARTING_PRICE)], BIDDERS[0])
+
+    # a single token auction of a token the batch does not include
+    await starknet.state.invoke_raw(
+        erc721.contract_address, "mint", [SELLER, *to_uint(FIRST_TOKEN + UNITS)], OWNER)
+    execution_info = await starknet.state.invoke_raw(dutch.contract_address, "initialize", [
+        erc721.contract_address, *to_uint(FIRST_TOKEN + UNITS), erc20.contract_address,
+        *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS], SELLER)
+    single_id, = execution_info.retdata
+    with pytest.raises(StarkException, match="not a batch auction"):
+        await commit(starknet, dutch, single_id, BIDDERS[0], 1, 2)
+    with pytest.raises(StarkException, match="not a batch auction"):
+        await starknet.state.invoke_raw(dutch.contract_address, "settle", [single_id], SELLER)
+
+
+@pytest.mark.asyncio
+async def test_withdraw_undeliverable_bids(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+
+    await commit(starknet, dutch, auction_id, BIDDERS[0], 1, 3)
+    await commit(starknet, dutch, auction_id, BIDDERS[1], 2, 20)
+
+    # the seller revokes the approval, so no unit can be delivered
+    await starknet.state.invoke_raw(
+        erc721.contract_address, "setApprovalForAll", [dutch.contract_address, 0], SELLER)
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + 1)
+    with pytest.raises(StarkException):
+        await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+    with pytest.raises(StarkException, match="settlement window open"):
+        await starknet.state.invoke_raw(
+            dutch.contract_address, "withdrawBid", [auction_id, 0], BIDDERS[0])
+
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + GRACE_BLOCKS + 1)
+    with pytest.raises(StarkException, match="settlement window closed"):
+        await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+
+    # anyone can withdraw a bid, its whole escrow goes back to the bidder
+    execution_info = await starknet.state.invoke_raw(
+        dutch.contract_address, "withdrawBid", [auction_id, 1], SELLER)
+    assert await balance(starknet, erc20, BIDDERS[1]) == FUNDS
+    assert await balance(starknet, erc20, BIDDERS[0]) == FUNDS - price(3)
+    withdrawals = [
+        event.data for event in raw_events(execution_info)
+        if event.keys == [get_selector("BidWithdrawn")]
+    ]
+    assert withdrawals == [[auction_id, 1, BIDDERS[1], *to_uint(2 * price(20))]]
+
+    await starknet.state.invoke_raw(
+        dutch.contract_address, "withdrawBid", [auction_id, 0], BIDDERS[0])
+    assert await balance(starknet, erc20, BIDDERS[0]) == FUNDS
+    assert await balance(starknet, erc20, dutch.contract_address) == 0
+
+    with pytest.raises(StarkException, match="bid already withdrawn"):
+        await starknet.state.invoke_raw(
+            dutch.contract_address, "withdrawBid", [auction_id, 0], BIDDERS[0])
+    with pytest.raises(StarkException, match="bid out of range"):
+        await starknet.state.invoke_raw(
+            dutch.contract_address, "withdrawBid", [auction_id, 2], BIDDERS[0])
+    owners = [await owner(starknet, erc721, token) for token in TOKENS]
+    assert owners == [SELLER] * UNITS
+
+
+@pytest.mark.asyncio
+async def test_settled_bids_cannot_be_withdrawn(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+
+    await commit(starknet, dutch, auction_id, BIDDERS[0], 1, 3)
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + GRACE_BLOCKS)
+    await starknet.state.invoke_raw(dutch.contract_address, "settle", [auction_id], SELLER)
+
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + GRACE_BLOCKS + 1)
+    with pytest.raises(StarkException, match="auction already settled"):
+        await starknet.state.invoke_raw(
+            dutch.contract_address, "withdrawBid", [auction_id, 0], BIDDERS[0])
+    assert await owner(starknet, erc721, FIRST_TOKEN) == BIDDERS[0]
+
+
+@pytest.mark.asyncio
+async def test_seller_owns_every_unit(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    await starknet.state.invoke_raw(
+        erc721.contract_address, "transferFrom",
+        [SELLER, BIDDERS[0], *to_uint(FIRST_TOKEN + 2)], SELLER)
+
+    with pytest.raises(StarkException, match="seller does not own every unit"):
+        await initialize_batch(starknet, dutch, erc721, erc20)
+    # the unit after the last one was never minted
+    with pytest.raises(StarkException):
+        await starknet.state.invoke_raw(dutch.contract_address, "initializeBatch", [
+            erc721.contract_address, *to_uint(FIRST_TOKEN + 3), erc20.contract_address,
+            *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS, 2], SELLER)
+
+    # the units the seller still owns can be batched
+    execution_info = await starknet.state.invoke_raw(dutch.contract_address, "initializeBatch", [
+        erc721.contract_address, *to_uint(FIRST_TOKEN), erc20.contract_address,
+        *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS, 2], SELLER)
+    auction_id, = execution_info.retdata
+    observed = await dutch.getBatch(auction_id).call()
+    assert observed.result.res == (2, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_units_cannot_be_relisted(contract_factory):
+    starknet, dutch, erc721, erc20 = contract_factory
+    auction_id = await initialize_batch(starknet, dutch, erc721, erc20)
+    await starknet.state.invoke_raw(
+        erc721.contract_address, "mint", [SELLER, *to_uint(FIRST_TOKEN + UNITS)], OWNER)
+
+    async def relist(first_token, units=None):
+        if units is None:
+            return await starknet.state.invoke_raw(dutch.contract_address, "initialize", [
+                erc721.contract_address, *to_uint(first_token), erc20.contract_address,
+                *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS], SELLER)
+        return await starknet.state.invoke_raw(dutch.contract_address, "initializeBatch", [
+            erc721.contract_address, *to_uint(first_token), erc20.contract_address,
+            *to_uint(STARTING_PRICE), *to_uint(DISCOUNT_RATE), DURATION_BLOCKS, units], SELLER)
+
+    # every unit is registered to the batch, not only the first one
+    for token in TOKENS:
+        observed = await dutch.getAuctionId(erc721.contract_address, to_uint(token)).call()
+        assert observed.result.auctionId == auction_id
+    with pytest.raises(StarkException, match="auction already initialized"):
+        await relist(FIRST_TOKEN + 2)
+    with pytest.raises(StarkException, match="auction already initialized"):
+        await relist(FIRST_TOKEN + UNITS - 1, units=2)
+
+    # the batch stays live until its settlement window closes
+    await commit(starknet, dutch, auction_id, BIDDERS[0], 1, 3)
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + GRACE_BLOCKS)
+    with pytest.raises(StarkException, match="auction already initialized"):
+        await relist(FIRST_TOKEN)
+    with pytest.raises(StarkException, match="auction already initialized"):
+        await relist(FIRST_TOKEN + 1)
+
+    set_block(starknet.state, block_number=1 + DURATION_BLOCKS + GRACE_BLOCKS + 1)
+    execution_info = await relist(FIRST_TOKEN + 1, units=2)
+    relisted_id, = execution_info.retdata
+    assert relisted_id == auction_id + 1
@@ -0,0 +1,145 @@
+import pytest
+
+from tests.bench import CONTINUOUS_PARAMS, DISCRETE_PARAMS
+from tests.checkpoint import checkpointed
+from tests.fanout import FanoutClient, ViewCall
+from tests.utils import TRUE, empty_starknet, get_contract_def, str_to_felt, to_uint
+
+
+OWNER = 0x1001
+SELLER = 0x1002
+
+TOKEN = 5042
+STARTING_PRICE = 500
+DURATION_BLOCKS = 30
+
+PATHS = {
+    "dutch": "contracts/dutch.cairo",
+    "discrete": "contracts/discreteGDA.cairo",
+    "continuous": "contracts/continuousGDA.cairo",
+}
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    defs = {kind: get_contract_def(path) for kind, path in PATHS.items()}
+    erc721_def = get_contract_def("openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo")
+
+    erc721 = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("Non Fungible Token"), str_to_felt("NFT"), OWNER],
+    )
+    contracts = [(erc721_def, erc721)]
+    for _ in range(3):
+        contracts.append((defs["dutch"], await starknet.deploy(contract_def=defs["dutch"])))
+    for kind, params in (("discrete", DISCRETE_PARAMS), ("continuous", CONTINUOUS_PARAMS)):
+        for _ in range(2):
+            gda = await starknet.deploy(
+                contract_def=defs[kind],
+                constructor_calldata=[str_to_felt("GDA"), str_to_felt("GDA"), OWNER, *params],
+            )
+            contracts.append((defs[kind], gda))
+
+    # one live auction on the first dutch contract
+    state = starknet.state
+    dutch = contracts[1][1]
+    await state.invoke_raw(erc721.contract_address, "mint", [SELLER, *to_uint(TOKEN)], OWNER)
+    await state.invoke_raw(
+        erc721.contract_address, "setApprovalForAll", [dutch.contract_address, TRUE], SELLER)
+    await state.invoke_raw(dutch.contract_address, "initialize", [
+        erc721.contract_address, *to_uint(TOKEN), erc721.contract_address,
+        *to_uint(STARTING_PRICE), *to_uint(1), DURATION_BLOCKS], SELLER)
+
+    return starknet, contracts
+
+
+# kind of each auction contract, in deployment order
+KINDS = ["dutch"] * 3 + ["discrete"] * 2 + ["continuous"] * 2
+
+
+def sweep_calls(erc721, auctions):
+    calls = []
+    for kind, contract in zip(KINDS, auctions):
+        address = contract.contract_address
+        if kind == "dutch":
+            calls.append(ViewCall(address, "isInitialized", [1]))
+            calls.append(ViewCall(address, "getAuctionId", [erc721.contract_address, TOKEN]))
+        else:
+            calls.append(ViewCall(address, "purchase_price", [5]))
+            calls.append(ViewCall(address, "purchase_price_batch", [[1, 2], [0, 10]]))
+    return calls
+
+
+def fanout_client(starknet, auctions, concurrency=8):
+    abis = {
+        contract.contract_address: get_contract_def(PATHS[kind]).abi
+        for kind, contract in zip(KINDS, auctions)
+    }
+    return FanoutClient(starknet.state, abis, concurrency=concurrency)
+
+
+@pytest.mark.asyncio
+async def test_sweep_matches_calls(contract_factory):
+    starknet, erc721, *auctions = contract_factory
+    client = fanout_client(starknet, auctions)
+    calls = sweep_calls(erc721, auctions)
+
+    results = [result async for result in client.sweep(calls)]
+    assert sorted(id(result.call) for result in results) == sorted(id(call) for call in calls)
+
+    contracts = {contract.contract_address: contract for contract in auctions}
+    by_function = {}
+    for result in results:
+        assert result.error is None
+        call = result.call
+        contract = contracts[call.address]
+        if call.function == "isInitialized":
+            observed = await contract.isInitialized(*call.args).call()
+            assert result.value == {"res": observed.result.res}
+        elif call.function == "getAuctionId":
+            observed = await contract.getAuctionId(erc721.contract_address, to_uint(TOKEN)).call()
+            assert result.value == {"auctionId": observed.result.auctionId}
+        elif call.function == "purchase_price":
+            observed = await contract.purchase_price(*call.args).call()
+            assert result.value == {"res": observed.result.res[0]}
+        else:
+            observed = await contract.purchase_price_batch(*call.args).call()
+            prices = [felt for price in observed.result.prices for felt in price]
+            assert result.value == {"prices_len": 4, "prices": prices}
+        by_function.setdefault(call.function, []).append(list(result.value.values())[0])
+
+    # only the first dutch contract has an auction
+    assert sorted(by_function["isInitialized"]) == [0, 0, 1]
+    assert sorted(by_function["getAuctionId"]) == [0, 0, 1]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_bound(contract_factory):
+    starknet, erc721, *auctions = contract_factory
+    client = fanout_client(starknet, auctions, concurrency=3)
+    calls = sweep_calls(erc721, auctions)
+
+    results = [result async for result in client.sweep(calls * 4)]
+    assert len(results) == len(calls) * 4
+    assert client.peak_in_flight == 3
+    assert client.in_flight == 0
+    # one parsed class per contract definition
+    assert len(client._classes) == 3
+
+
+@pytest.mark.asyncio
+async def test_revert_is_reported(contract_factory):
+    starknet, erc721, *auctions = contract_factory
+    client = fanout_client(starknet, auctions)
+    continuous = auctions[-1].contract_address
+
+    # e^(decayConstant * quantity / emissionRate) overflows 64.61
+    calls = [ViewCall(continuous, "purchase_price", [10 ** 6]),
+             ViewCall(continuous, "purchase_price", [1])]
+    results = {result.call.args[0]: result async for result in client.sweep(calls)}
+    assert results[10 ** 6].value is None
+    assert results[10 ** 6].error is not None
+    assert results[1].error is None
+
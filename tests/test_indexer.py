@@ -0,0 +1,126 @@
+import pytest
+
+from tests.checkpoint import checkpointed
+from tests.indexer import EventIndexer
+from tests.pricing import ONE, PRECISE
+from tests.utils import MAX_UINT256, TRUE, empty_starknet, get_contract_def, str_to_felt, to_uint
+
+
+OWNER = 0x1001
+SELLER = 0x1002
+BUYER = 0x1003
+
+TOKEN = to_uint(5042)
+STARTING_PRICE = 500
+DURATION_BLOCKS = 30
+# initialPrice, scaleFactor, decayConstant, precision
+DISCRETE_PARAMS = (1000 * ONE, 11 * ONE // 10, ONE // 2, PRECISE)
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    dutch_def = get_contract_def("contracts/dutch.cairo")
+    gda_def = get_contract_def("contracts/discreteGDA.cairo")
+    erc721_def = get_contract_def("openzeppelin/token/erc721/ERC721_Mintable_Burnable.cairo")
+    erc20_def = get_contract_def("openzeppelin/token/erc20/ERC20_Mintable.cairo")
+
+    dutch = await starknet.deploy(contract_def=dutch_def)
+    gda = await starknet.deploy(
+        contract_def=gda_def,
+        constructor_calldata=[str_to_felt("NFT"), str_to_felt("NFT"), OWNER, *DISCRETE_PARAMS],
+    )
+    erc721 = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("Non Fungible Token"), str_to_felt("NFT"), OWNER],
+    )
+    erc20 = await starknet.deploy(
+        contract_def=erc20_def,
+        constructor_calldata=[
+            str_to_felt("Mintable Token"), str_to_felt("MTKN"), 18, *to_uint(STARTING_PRICE),
+            BUYER, OWNER,
+        ],
+    )
+
+    state = starknet.state
+    await state.invoke_raw(erc721.contract_address, "mint", [SELLER, *TOKEN], OWNER)
+    await state.invoke_raw(
+        erc721.contract_address, "setApprovalForAll", [dutch.contract_address, TRUE], SELLER)
+    await state.invoke_raw(
+        erc20.contract_address, "approve", [dutch.contract_address, *to_uint(STARTING_PRICE)],
+        BUYER)
+
+    return starknet, [(dutch_def, dutch), (gda_def, gda), (erc721_def, erc721), (erc20_def, erc20)]
+
+
+async def run_auctions(starknet, dutch, gda, erc721, erc20):
+    """Returns the (block_number, transaction_index, execution_info) of an auction session"""
+    state = starknet.state
+    block_number = state.state.block_info.block_number
+    calls = [
+        (dutch, "initialize", [
+            erc721.contract_address, *TOKEN, erc20.contract_address, *to_uint(STARTING_PRICE),
+            *to_uint(1), DURATION_BLOCKS], SELLER),
+        (gda, "purchaseTokens", [3, BUYER, *MAX_UINT256], BUYER),
+        (dutch, "buy", [1, *to_uint(STARTING_PRICE)], BUYER),
+        (gda, "purchaseTokens", [2, OWNER, *MAX_UINT256], BUYER),
+    ]
+    transactions = []
+    for transaction_index, (contract, selector, calldata, caller) in enumerate(calls):
+        execution_info = await state.invoke_raw(
+            contract.contract_address, selector, calldata, caller)
+        transactions.append((block_number, transaction_index, execution_info))
+    return transactions
+
+
+def abis(dutch, gda):
+    return {
+        dutch.contract_address: get_contract_def("contracts/dutch.cairo").abi,
+        gda.contract_address: get_contract_def("contracts/discreteGDA.cairo").abi,
+    }
+
+
+@pytest.mark.asyncio
+async def test_index_events(contract_factory, tmp_path):
+    starknet, dutch, gda, erc721, erc20 = contract_factory
+    transactions = await run_auctions(starknet, dutch, gda, erc721, erc20)
+    indexer = EventIndexer(str(tmp_path / "events.sqlite"), abis(dutch, gda))
+
+    # the token contracts are not indexed, but the GDA mints are
+    assert indexer.index(transactions) == 1 + (3 + 1) + 2 + (2 + 1)
+    assert indexer.cursor == transactions[-1][:2]
+
+    created, = indexer.events("AuctionCreated", dutch.contract_address)
+    assert created.data["tokenId"] == 5042
+    assert created.data["startingPrice"] == STARTING_PRICE
+    assert created.data["durationBlocks"] == DURATION_BLOCKS
+
+    purchase, = indexer.events("Purchase", dutch.contract_address)
+    assert purchase.data == {
+        "auctionId": 1, "buyer": BUYER, "quantity": 1, "price": STARTING_PRICE, "sold": TRUE}
+    completed, = indexer.events("SaleCompleted")
+    assert completed.data == {"auctionId": 1}
+
+    purchases = indexer.events("Purchase", gda.contract_address)
+    assert [(event.data["to"], event.data["quantity"], event.data["sold"]) for event in purchases] \
+        == [(BUYER, 3, 3), (OWNER, 2, 5)]
+    assert purchases[1].data["price"] > purchases[0].data["price"] * 2 // 3
+    assert len(indexer.events("Transfer", gda.contract_address)) == 5
+
+
+@pytest.mark.asyncio
+async def test_resume(contract_factory, tmp_path):
+    """Indexing the stream again should only store the transactions after the cursor"""
+    starknet, dutch, gda, erc721, erc20 = contract_factory
+    transactions = await run_auctions(starknet, dutch, gda, erc721, erc20)
+    path = str(tmp_path / "events.sqlite")
+
+    with EventIndexer(path, abis(dutch, gda), batch_size=1) as indexer:
+        first = indexer.index(transactions[:2])
+        assert indexer.cursor == transactions[1][:2]
+
+    with EventIndexer(path, abis(dutch, gda), batch_size=1) as indexer:
+        assert indexer.index(transactions) + first == 10
+        assert indexer.index(transactions) == 0
+        assert len(indexer.events()) == 10
@@ -0,0 +1,49 @@
+import pytest
+
+from tests.bench import CONTINUOUS_PARAMS
+from tests.load import GDAMarket, percentile, poisson_arrivals, read_arrivals, run_load, summarize
+
+
+def test_poisson_arrivals():
+    arrivals = poisson_arrivals(rate=2, duration=100, quantity=3, seed=7)
+
+    assert arrivals == poisson_arrivals(rate=2, duration=100, quantity=3, seed=7)
+    assert 150 < len(arrivals) < 250
+    offsets = [offset for offset, _ in arrivals]
+    assert offsets == sorted(offsets)
+    assert 0 <= offsets[0] and offsets[-1] < 100
+    assert {quantity for _, quantity in arrivals} == {3}
+
+
+def test_read_arrivals(tmp_path):
+    path = tmp_path / "arrivals.csv"
+    path.write_text("offset,quantity\n5,2\n1.5,\n3,4\n")
+
+    assert read_arrivals(str(path)) == [(1, 1), (3, 4), (5, 2)]
+
+
+def test_summarize():
+    records = [
+        {"status": "ok", "latency_ms": latency} for latency in range(1, 9)
+    ] + [{"status": "insufficient payment", "latency_ms": 100}] * 2
+
+    summary = summarize(records, wall_seconds=5, duration=20)
+    assert summary["submitted"] == 10
+    assert summary["reverts"] == {"insufficient payment": 2}
+    assert summary["revert_rate"] == pytest.approx(0.2)
+    assert summary["transactions_per_second"] == 2
+    assert summary["purchases_per_simulated_second"] == pytest.approx(0.4)
+    assert summary["latency_ms"] == {"p50": 5, "p90": 100, "p99": 100, "max": 100}
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_continuous_exhaustion():
+    """Buyers arriving before any emission is available should revert"""
+    market = GDAMarket("contracts/continuousGDA.cairo", CONTINUOUS_PARAMS)
+    records = await run_load(market, [(0, 1), (2, 1)], n_accounts=2)
+
+    assert [(record["offset"], record["status"]) for record in records] == [
+        (0, "insufficient available tokens"), (2, "ok")]
+    assert records[0]["price"] is None
+    assert records[1]["price"] > 0
@@ -0,0 +1,387 @@
+import numpy as np
+import pytest
+from starkware.starknet.business_logic.state import BlockInfo
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests import pricing
+from tests.checkpoint import checkpointed
+from tests.pricing import FAST, ONE, PRECISE, PRIME
+from tests.utils import empty_starknet, get_contract_def, str_to_felt, to_uint
+
+
+START_TIME = 1000
+BUYER = 123
+
+# (initialPrice, scaleFactor, decayConstant): the raw felts the other test
+# modules use, and a curve with sensible 64.61 parameters
+DISCRETE_PARAMS = [(1000, 10, 1), (1000 * ONE, 3 * ONE // 2, ONE // 10)]
+# (initialPrice, emissionRate, decayConstant)
+CONTINUOUS_PARAMS = [(1000, 10, 5), (1000 * ONE, 10 * ONE, ONE // 2)]
+
+# the curves with 64.61 parameters, deployed again at the fast tier
+FAST_PARAMS = [("discrete", DISCRETE_PARAMS[1]), ("continuous", CONTINUOUS_PARAMS[1])]
+
+# documented maximum relative error of Math64x61_exp2_fast
+EXP_FAST_ERROR = 8.56e-5
+
+QUANTITIES = [1, 2, 5]
+# tokens bought from the discrete auctions before quoting
+PURCHASES = [1, 2]
+ELAPSED = [0, 3, 10]
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    discrete_def = get_contract_def("contracts/discreteGDA.cairo")
+    continuous_def = get_contract_def("contracts/continuousGDA.cairo")
+    math_def = get_contract_def("tests/mocks/Math64x61_mock.cairo")
+
+    set_block_timestamp(starknet.state, START_TIME)
+    contracts = []
+    deployments = [(discrete_def, params, PRECISE) for params in DISCRETE_PARAMS]
+    deployments += [(continuous_def, params, PRECISE) for params in CONTINUOUS_PARAMS]
+    deployments += [
+        (discrete_def if kind == "discrete" else continuous_def, params, FAST)
+        for kind, params in FAST_PARAMS
+    ]
+    for contract_def, params, precision in deployments:
+        contract = await starknet.deploy(
+            contract_def=contract_def,
+            constructor_calldata=[
+                str_to_felt("GDA"), str_to_felt("GDA"), BUYER, *params, precision],
+        )
+        contracts.append((contract_def, contract))
+    math = await starknet.deploy(contract_def=math_def)
+    contracts.append((math_def, math))
+
+    return starknet, contracts
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", range(len(DISCRETE_PARAMS)))
+async def test_discrete_matches_contract(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    params = DISCRETE_PARAMS[index]
+
+    # Sell a few tokens over separate purchases so currentId is not zero and the
+    # running price went through more than one batch. Invoked raw because
+    # StarknetContract cannot build the ERC721 Transfer event (`_from`).
+    for quantity in PURCHASES:
+        await starknet.state.invoke_raw(
+            contract_address=contract.contract_address,
+            selector="purchaseTokens",
+            calldata=[quantity, BUYER, *to_uint(2 ** 128 - 1)],
+            caller_address=BUYER,
+        )
+
+    timestamps = [START_TIME + elapsed for elapsed in ELAPSED]
+    expected = pricing.discrete_purchase_price(
+        np.array(QUANTITIES)[:, None], np.array(timestamps)[None, :], sum(PURCHASES),
+        *params, START_TIME * ONE,
+    )
+    assert expected.shape == (len(QUANTITIES), len(timestamps))
+
+    for i, quantity in enumerate(QUANTITIES):
+        for j, timestamp in enumerate(timestamps):
+            set_block_timestamp(starknet.state, timestamp)
+            observed = await contract.purchase_price(quantity).call()
+            assert observed.result == ((expected[i, j], 0),)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", range(len(CONTINUOUS_PARAMS)))
+async def test_continuous_matches_contract(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[len(DISCRETE_PARAMS) + index]
+    params = CONTINUOUS_PARAMS[index]
+
+    timestamps = [START_TIME + elapsed for elapsed in ELAPSED]
+    expected = pricing.continuous_purchase_price(
+        np.array(QUANTITIES)[:, None], np.array(timestamps)[None, :], START_TIME * ONE,
+        *params,
+    )
+
+    for i, quantity in enumerate(QUANTITIES):
+        for j, timestamp in enumerate(timestamps):
+            set_block_timestamp(starknet.state, timestamp)
+            observed = await contract.purchase_price(quantity).call()
+            assert observed.result == ((expected[i, j], 0),)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", range(len(DISCRETE_PARAMS) + len(CONTINUOUS_PARAMS)))
+async def test_batch_matches_mirror(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    quantities = np.array(QUANTITIES)[:, None]
+    timestamps = np.array([START_TIME + elapsed for elapsed in ELAPSED])[None, :]
+
+    if index < len(DISCRETE_PARAMS):
+        expected = pricing.discrete_purchase_price(
+            quantities, timestamps, 0, *DISCRETE_PARAMS[index], START_TIME * ONE)
+    else:
+        expected = pricing.continuous_purchase_price(
+            quantities, timestamps, START_TIME * ONE,
+            *CONTINUOUS_PARAMS[index - len(DISCRETE_PARAMS)])
+    assert not expected.mask.any()
+
+    set_block_timestamp(starknet.state, START_TIME)
+    observed = await contract.purchase_price_batch(QUANTITIES, ELAPSED).call()
+    assert observed.result.prices == [(price, 0) for price in expected.flat]
+
+
+@pytest.mark.asyncio
+async def test_revert_is_masked(contract_factory):
+    starknet, *contracts = contract_factory
+    contract = contracts[len(DISCRETE_PARAMS) + 1]
+    # exp(decay * quantity / emission rate) overflows 64.61
+    quantity = 10 ** 6
+
+    expected = pricing.continuous_purchase_price(
+        [1, quantity], START_TIME, START_TIME * ONE, *CONTINUOUS_PARAMS[1])
+    assert list(expected.mask) == [False, True]
+
+    with pytest.raises(StarkException):
+        await contract.purchase_price(quantity).call()
+
+
+def mirror_quotes(index, quantities, timestamp):
+    """Mirror quotes of the contract at index, which has not sold anything yet"""
+    if index < len(DISCRETE_PARAMS):
+        return pricing.discrete_purchase_price(
+            quantities, timestamp, 0, *DISCRETE_PARAMS[index], START_TIME * ONE)
+    if index < len(DISCRETE_PARAMS) + len(CONTINUOUS_PARAMS):
+        return pricing.continuous_purchase_price(
+            quantities, timestamp, START_TIME * ONE,
+            *CONTINUOUS_PARAMS[index - len(DISCRETE_PARAMS)])
+    kind, params = FAST_PARAMS[index - len(DISCRETE_PARAMS) - len(CONTINUOUS_PARAMS)]
+    if kind == "discrete":
+        return pricing.discrete_purchase_price(
+            quantities, timestamp, 0, *params, START_TIME * ONE, precision=FAST)
+    return pricing.continuous_purchase_price(
+        quantities, timestamp, START_TIME * ONE, *params, precision=FAST)
+
+
+def bisect_quantity(quotes, budget):
+    """Largest quantity the budget affords, by bisection over increasing quotes"""
+    low, high = 0, len(quotes)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if quotes.mask[mid] or quotes[mid] > budget:
+            high = mid
+        else:
+            low = mid
+    return low
+
+
+# the curves with 64.61 parameters, raw felts make a scale factor below one
+INVERSE_INDICES = [1, len(DISCRETE_PARAMS) + 1]
+FAST_INDICES = [len(DISCRETE_PARAMS) + len(CONTINUOUS_PARAMS) + i for i in range(len(FAST_PARAMS))]
+# kind of the contract at each index
+KINDS = (
+    ["discrete"] * len(DISCRETE_PARAMS) + ["continuous"] * len(CONTINUOUS_PARAMS)
+    + [kind for kind, _ in FAST_PARAMS])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", INVERSE_INDICES + FAST_INDICES)
+@pytest.mark.parametrize("elapsed", ELAPSED)
+async def test_max_purchasable_matches_bisection(contract_factory, index, elapsed):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    timestamp = START_TIME + elapsed
+    set_block_timestamp(starknet.state, timestamp)
+
+    quotes = mirror_quotes(index, np.arange(200), timestamp)
+    if KINDS[index] == "continuous":
+        # 10 tokens are emitted per second
+        quotes.mask[10 * elapsed + 1:] = True
+
+    budgets = {0, 2 ** 100}
+    for quantity in (1, 2, 5, 17, 30):
+        if not quotes.mask[quantity]:
+            budgets.update({quotes[quantity] - 1, quotes[quantity], quotes[quantity] + 1})
+    for budget in sorted(budgets):
+        observed = await contract.max_purchasable(to_uint(budget)).call()
+        assert observed.result.quantity == bisect_quantity(quotes, budget)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", INVERSE_INDICES + FAST_INDICES)
+@pytest.mark.parametrize("elapsed", ELAPSED + [60])
+async def test_max_purchasable_huge_budget(contract_factory, index, elapsed):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    timestamp = START_TIME + elapsed
+    set_block_timestamp(starknet.state, timestamp)
+
+    # the discrete quotes overflow long before 1000 tokens, the continuous ones are capped first
+    quotes = mirror_quotes(index, np.arange(1000), timestamp)
+    if KINDS[index] == "continuous":
+        quotes.mask[10 * elapsed + 1:] = True
+    assert quotes.mask[-1]
+
+    for budget in (2 ** 125 - 1, 2 ** 126, 2 ** 128 - 1):
+        observed = await contract.max_purchasable(to_uint(budget)).call()
+        assert observed.result.quantity == bisect_quantity(quotes, budget)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", INVERSE_INDICES)
+async def test_purchase_for_huge_budget(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    timestamp = START_TIME + 10
+    set_block_timestamp(starknet.state, timestamp)
+    quotes = mirror_quotes(index, np.arange(1000), timestamp)
+    if KINDS[index] == "continuous":
+        quotes.mask[10 * 10 + 1:] = True
+    expected = bisect_quantity(quotes, 2 ** 128 - 1)
+
+    execution_info = await starknet.state.invoke_raw(
+        contract_address=contract.contract_address,
+        selector="purchaseForBudget",
+        calldata=[BUYER, *to_uint(2 ** 128 - 1)],
+        caller_address=BUYER,
+    )
+    assert execution_info.retdata == [expected]
+    balance = await contract.balanceOf(BUYER).call()
+    assert balance.result == ((expected, 0),)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", INVERSE_INDICES)
+async def test_purchase_for_budget(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    timestamp = START_TIME + 10
+    set_block_timestamp(starknet.state, timestamp)
+    quotes = mirror_quotes(index, np.arange(10), timestamp)
+
+    with pytest.raises(StarkException, match="budget too small"):
+        await starknet.state.invoke_raw(
+            contract_address=contract.contract_address,
+            selector="purchaseForBudget",
+            calldata=[BUYER, *to_uint(quotes[1] - 1)],
+            caller_address=BUYER,
+        )
+
+    execution_info = await starknet.state.invoke_raw(
+        contract_address=contract.contract_address,
+        selector="purchaseForBudget",
+        calldata=[BUYER, *to_uint(quotes[7] + 1)],
+        caller_address=BUYER,
+    )
+    assert execution_info.retdata == [7]
+    balance = await contract.balanceOf(BUYER).call()
+    assert balance.result == ((7, 0),)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name, args", [
+    ("exp", [ONE // 3, 7 * ONE, -ONE // 2, -5 * ONE, 0, 50 * ONE]),
+    ("exp2", [ONE - 1, 64 * ONE, 64 * ONE + ONE // 2, 65 * ONE, -63 * ONE - ONE // 3, -64 * ONE]),
+    ("log2", [ONE // 3, ONE - 1, ONE, 3 * ONE // 2, 12345 * ONE + 17, 2 ** 62 * ONE - 1, 0]),
+    ("ln", [1, ONE + 1, 7 * ONE]),
+    ("exp2_fast", [ONE - 1, 64 * ONE + ONE // 2, 65 * ONE, -63 * ONE - ONE // 3]),
+    ("exp_fast", [ONE // 3, 7 * ONE, -5 * ONE, 0, 50 * ONE]),
+    ("log2_fast", [ONE // 3, ONE - 1, ONE, 3 * ONE // 2, 12345 * ONE + 17, 0]),
+    ("ln_fast", [1, ONE + 1, 7 * ONE]),
+])
+async def test_math_matches_contract(contract_factory, name, args):
+    starknet, *contracts = contract_factory
+    math = contracts[-1]
+
+    expected, ok = getattr(pricing, name)(args)
+    for x, res, valid in zip(args, expected, ok):
+        if valid:
+            observed = await getattr(math, name)(x % PRIME).call()
+            assert observed.result == (res % PRIME,)
+        else:
+            with pytest.raises(StarkException):
+                await getattr(math, name)(x % PRIME).call()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", FAST_INDICES)
+async def test_fast_tier_matches_mirror(contract_factory, index):
+    starknet, *contracts = contract_factory
+    contract = contracts[index]
+    quantities = np.array(QUANTITIES)[:, None]
+    timestamps = np.array([START_TIME + elapsed for elapsed in ELAPSED])[None, :]
+
+    expected = mirror_quotes(index, quantities, timestamps)
+    set_block_timestamp(starknet.state, START_TIME)
+    observed = await contract.purchase_price_batch(QUANTITIES, ELAPSED).call()
+    assert observed.result.prices == [(price, 0) for price in expected.flat]
+
+    # The same curve at the precise tier quotes within the error of exp_fast, once for each exp
+    # in the price. The continuous numerator e^x - 1 amplifies it by e^x / (e^x - 1).
+    precise = mirror_quotes(INVERSE_INDICES[FAST_INDICES.index(index)], quantities, timestamps)
+    error = np.array([int(f) / int(p) - 1 for f, p in zip(expected.flat, precise.flat)])
+    bound = np.full(error.shape, 2 * EXP_FAST_ERROR)
+    kind, params = FAST_PARAMS[FAST_INDICES.index(index)]
+    if kind == "continuous":
+        _, emission_rate, decay_constant = params
+        x = np.repeat(decay_constant / emission_rate * np.array(QUANTITIES), len(ELAPSED))
+        bound += EXP_FAST_ERROR * np.exp(x) / np.expm1(x)
+    assert (np.abs(error) <= bound).all()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("contract", ["discreteGDA", "continuousGDA"])
+async def test_unknown_precision_tier(contract):
+    starknet = await empty_starknet()
+    params = DISCRETE_PARAMS[1] if contract == "discreteGDA" else CONTINUOUS_PARAMS[1]
+    with pytest.raises(StarkException, match="unknown precision tier"):
+        await starknet.deploy(
+            contract_def=get_contract_def("contracts/%s.cairo" % contract),
+            constructor_calldata=[str_to_felt("GDA"), str_to_felt("GDA"), BUYER, *params, 2],
+        )
+
+
+def test_exp2_error_bound():
+    """exp2 should stay within its documented 1.069e-7 relative error"""
+    xs = [int(x * ONE) for x in np.linspace(-20, 40, 6001)]
+    res, ok = pricing.exp2(xs)
+    assert ok.all()
+    error = np.array([int(r) / ONE for r in res]) / np.exp2([x / ONE for x in xs]) - 1
+    assert np.abs(error).max() <= 1.069e-7
+
+
+def test_fast_error_bounds():
+    """exp2_fast and log2_fast should stay within their documented maximum errors"""
+    xs = [int(x * ONE) for x in np.linspace(-20, 40, 6001)]
+    res, ok = pricing.exp2_fast(xs)
+    assert ok.all()
+    error = np.array([int(r) / ONE for r in res]) / np.exp2([x / ONE for x in xs]) - 1
+    assert np.abs(error).max() <= EXP_FAST_ERROR
+
+    xs = [int(x * ONE) for x in np.geomspace(1e-3, 1e9, 6001)]
+    res, ok = pricing.log2_fast(xs)
+    assert ok.all()
+    error = np.array([int(r) / ONE for r in res]) - np.log2([x / ONE for x in xs])
+    assert np.abs(error).max() <= 1.431e-5
+
+
+@pytest.mark.asyncio
+async def test_fractional_pow_matches_contract(contract_factory):
+    starknet, *contracts = contract_factory
+    math = contracts[-1]
+
+    xs = [3 * ONE // 2, 2 * ONE, 5 * ONE]
+    ys = [ONE // 2, -3 * ONE, 5 * ONE // 4]
+    expected, ok = pricing.pow(xs, ys)
+    assert ok.all()
+    for x, y, res in zip(xs, ys, expected):
+        observed = await math.pow(x % PRIME, y % PRIME).call()
+        assert observed.result == (res % PRIME,)
+
+
+def set_block_timestamp(starknet_state, timestamp):
+    starknet_state.state.block_info = BlockInfo(
+        starknet_state.state.block_info.block_number, timestamp
+    )
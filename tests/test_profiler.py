@@ -0,0 +1,69 @@
+import pytest
+
+from tests.bench import DISCRETE_PARAMS, measure
+from tests.checkpoint import checkpointed
+from tests.profiler import profiling
+from tests.utils import MAX_UINT256, Signer, empty_starknet, get_contract_def, str_to_felt
+
+
+signer = Signer(123456789987654321)
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    gda_def = get_contract_def("contracts/discreteGDA.cairo")
+
+    account = await starknet.deploy(
+        contract_def=account_def,
+        constructor_calldata=[signer.public_key],
+    )
+    gda = await starknet.deploy(
+        contract_def=gda_def,
+        constructor_calldata=[
+            str_to_felt("NFT"), str_to_felt("NFT"), account.contract_address, *DISCRETE_PARAMS],
+    )
+    return starknet, [(account_def, account), (gda_def, gda)]
+
+
+@pytest.mark.asyncio
+async def test_steps_match_usage(contract_factory):
+    """Every step of the run should be attributed to exactly one stack"""
+    starknet, account, gda = contract_factory
+
+    with profiling() as profile:
+        usage = await measure(starknet.state, gda.contract_address, "purchase_price", [5])
+
+    functions = profile.functions()
+    assert sum(profile.samples.values()) == usage["n_steps"]
+    assert sum(exclusive for _, exclusive in functions.values()) == usage["n_steps"]
+    assert functions["__wrappers__.purchase_price"][0] == usage["n_steps"]
+    inclusive, exclusive = functions["contracts.Math64x61.Math64x61_exp"]
+    assert 0 < exclusive < inclusive < usage["n_steps"]
+
+    for line in profile.folded().splitlines():
+        stack, steps = line.rsplit(" ", 1)
+        assert stack.split(";")[0] == "__wrappers__.purchase_price"
+        assert int(steps) > 0
+
+
+@pytest.mark.asyncio
+async def test_nested_calls(contract_factory):
+    """Calls into another contract should be nested under the account that made them"""
+    starknet, account, gda = contract_factory
+
+    with profiling() as profile:
+        await signer.send_transaction(
+            account=account,
+            to=gda.contract_address,
+            selector_name="purchaseTokens",
+            calldata=[1, account.contract_address, *MAX_UINT256],
+        )
+
+    nested = [stack for stack in profile.samples if "__wrappers__.purchaseTokens" in stack]
+    assert nested
+    for stack in nested:
+        assert stack[0] == "__wrappers__.__execute__"
+        assert "starkware.starknet.common.syscalls.call_contract" in stack
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from tests.bench import CONTINUOUS_PARAMS, DISCRETE_PARAMS, START_TIME, set_block
+from tests.checkpoint import checkpointed
+from tests.quotes import QuoteClient
+from tests.utils import MAX_UINT256, empty_starknet, get_contract_def, str_to_felt
+
+
+OWNER = 0x1001
+BUYER = 0x1003
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    set_block(starknet.state, block_number=1, timestamp=START_TIME)
+    discrete_def = get_contract_def("contracts/discreteGDA.cairo")
+    continuous_def = get_contract_def("contracts/continuousGDA.cairo")
+
+    discrete = await starknet.deploy(
+        contract_def=discrete_def,
+        constructor_calldata=[str_to_felt("NFT"), str_to_felt("NFT"), OWNER, *DISCRETE_PARAMS],
+    )
+    continuous = await starknet.deploy(
+        contract_def=continuous_def,
+        constructor_calldata=[str_to_felt("TKN"), str_to_felt("TKN"), OWNER, *CONTINUOUS_PARAMS],
+    )
+    return starknet, [(discrete_def, discrete), (continuous_def, continuous)]
+
+
+@pytest.mark.asyncio
+async def test_hits_within_block(contract_factory):
+    starknet, discrete, continuous = contract_factory
+    quotes = QuoteClient(discrete, "discrete")
+
+    first = await quotes.purchase_price(5)
+    assert await quotes.purchase_price(5) == first
+    observed = await discrete.purchase_price(5).call()
+    assert first == observed.result.res
+    assert (quotes.hits, quotes.misses) == (1, 1)
+
+    # concurrent identical requests share one view call
+    prices = await asyncio.gather(*[quotes.purchase_price(2) for _ in range(3)])
+    assert len(set(prices)) == 1
+    assert (quotes.hits, quotes.misses) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_invalidated_by_purchase(contract_factory):
+    starknet, discrete, continuous = contract_factory
+    quotes = QuoteClient(discrete, "discrete")
+
+    before = await quotes.purchase_price(1)
+    await starknet.state.invoke_raw(
+        discrete.contract_address, "purchaseTokens", [3, BUYER, *MAX_UINT256], BUYER)
+    assert quotes.cursor() == 3
+
+    after = await quotes.purchase_price(1)
+    observed = await discrete.purchase_price(1).call()
+    assert after == observed.result.res != before
+    assert quotes.stats["invalidations"] == 1
+    assert quotes.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_time_buckets(contract_factory):
+    starknet, discrete, continuous = contract_factory
+    quotes = QuoteClient(continuous, "continuous", bucket_seconds=10)
+    set_block(starknet.state, timestamp=START_TIME + 20)
+
+    await quotes.purchase_price(1)
+    set_block(starknet.state, timestamp=START_TIME + 25)
+    await quotes.purchase_price(1)
+    # the first quote is still in the current bucket
+    assert quotes.stats["size"] == 2
+
+    set_block(starknet.state, timestamp=START_TIME + 30)
+    latest = await quotes.purchase_price(1)
+    assert quotes.stats["expirations"] == 2
+    assert quotes.stats["size"] == 1
+    observed = await continuous.purchase_price(1).call()
+    assert latest == observed.result.res
+
+
+@pytest.mark.asyncio
+async def test_lru(contract_factory):
+    starknet, discrete, continuous = contract_factory
+    quotes = QuoteClient(discrete, "discrete", maxsize=2)
+
+    await quotes.purchase_price(1)
+    await quotes.purchase_price(2)
+    await quotes.purchase_price(1)
+    await quotes.purchase_price(3)
+    assert quotes.evictions == 1
+
+    await quotes.purchase_price(1)
+    await quotes.purchase_price(2)
+    assert (quotes.hits, quotes.misses) == (2, 4)
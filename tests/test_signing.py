@@ -0,0 +1,61 @@
+import functools
+import random
+
+import pytest
+from starkware.crypto.signature.signature import EC_ORDER, private_to_stark_key, sign, verify
+
+from tests.client import signing
+from tests.utils import Signer
+
+
+PRIVATE_KEY = 123456789987654321
+# cache_info() of a generator_table() not built yet
+EMPTY_CACHE = functools._CacheInfo(hits=0, misses=0, maxsize=None, currsize=0)
+
+
+def message_hashes(count, seed=0):
+    rng = random.Random(seed)
+    # short hashes too, generate_k_rfc6979 pads some lengths
+    return [rng.randrange(2 ** 251) >> rng.randrange(0, 251) for _ in range(count)]
+
+
+@pytest.mark.parametrize("table", [False, True])
+def test_table_matches_starkware(monkeypatch, table):
+    if table:
+        signing.generator_table()
+    else:
+        monkeypatch.setattr(signing.generator_table, "cache_info", lambda: EMPTY_CACHE)
+    rng = random.Random(1)
+    backend = signing.TableBackend()
+    for message_hash in message_hashes(50) + [1, 2 ** 251 - 1]:
+        private_key = rng.randrange(1, EC_ORDER)
+        signature = backend.sign(message_hash, private_key)
+        assert signature == sign(message_hash, private_key)
+        assert verify(message_hash, *signature, private_to_stark_key(private_key))
+
+    for private_key in (1, 2, EC_ORDER - 1, PRIVATE_KEY):
+        assert backend.public_key(private_key) == private_to_stark_key(private_key)
+
+
+def test_multiply_with_table_edges():
+    # every digit of the scalar set, and only its top digit set
+    for k in (2 ** 248 - 1, 2 ** 248, 8 * 2 ** 248, EC_ORDER - 1):
+        assert signing._multiply_with_table(k) == private_to_stark_key(k)
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_sign_many(monkeypatch, max_workers):
+    monkeypatch.setattr(signing, "POOL_MIN_BATCH", 2)
+    hashes = message_hashes(7, seed=2)
+    signer = Signer(PRIVATE_KEY)
+
+    signatures = signer.sign_many(hashes, max_workers=max_workers)
+    assert signatures == [sign(message_hash, PRIVATE_KEY) for message_hash in hashes]
+
+
+def test_signer_backends_agree():
+    table = Signer(PRIVATE_KEY)
+    reference = Signer(PRIVATE_KEY, backend=signing.StarkwareBackend())
+    assert table.public_key == reference.public_key
+    assert table.sign_transaction(1, [(2, "purchaseTokens", [1, 2, 3])], 0) == (
+        reference.sign_transaction(1, [(2, "purchaseTokens", [1, 2, 3])], 0))
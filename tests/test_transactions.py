@@ -0,0 +1,84 @@
+import pytest
+from starkware.cairo.common.hash_state import compute_hash_on_elements
+from starkware.starkware_utils.error_handling import StarkException
+
+from tests.checkpoint import checkpointed
+from tests.pricing import ONE, PRECISE
+from tests.utils import (
+    MAX_UINT256, TRANSACTION_VERSION, NonceManager, Signer, TransactionBuilder, empty_starknet,
+    get_contract_def, hash_multicall, str_to_felt, to_uint,
+)
+
+
+signer = Signer(123456789987654321)
+
+# initialPrice, scaleFactor, decayConstant, precision
+DISCRETE_PARAMS = (1000 * ONE, 11 * ONE // 10, ONE // 2, PRECISE)
+
+
+@pytest.fixture(scope="session")
+@checkpointed
+async def base_world():
+    starknet = await empty_starknet()
+    account_def = get_contract_def("openzeppelin/account/Account.cairo")
+    gda_def = get_contract_def("contracts/discreteGDA.cairo")
+
+    account = await starknet.deploy(
+        contract_def=account_def,
+        constructor_calldata=[signer.public_key],
+    )
+    gda = await starknet.deploy(
+        contract_def=gda_def,
+        constructor_calldata=[
+            str_to_felt("NFT"), str_to_felt("NFT"), account.contract_address, *DISCRETE_PARAMS],
+    )
+    return starknet, [(account_def, account), (gda_def, gda)]
+
+
+def purchase(gda, account, value=MAX_UINT256):
+    return [(gda.contract_address, "purchaseTokens", [1, account.contract_address, *value])]
+
+
+@pytest.mark.asyncio
+async def test_send_many(contract_factory):
+    starknet, account, gda = contract_factory
+    builder = TransactionBuilder(signer, account)
+
+    await builder.send_many([purchase(gda, account) for _ in range(3)])
+    await builder.send(purchase(gda, account))
+
+    observed = await gda.balanceOf(account.contract_address).call()
+    assert observed.result == (to_uint(4),)
+    observed = await account.get_nonce().call()
+    assert observed.result == (4,)
+
+
+@pytest.mark.asyncio
+async def test_resync_after_failure(contract_factory):
+    """A failed transaction should not leave the local nonce ahead of the account"""
+    starknet, account, gda = contract_factory
+    nonces = NonceManager()
+    builder = TransactionBuilder(signer, account, nonces)
+
+    with pytest.raises(StarkException):
+        await builder.send_many([purchase(gda, account), purchase(gda, account, to_uint(0))])
+
+    await builder.send(purchase(gda, account))
+    observed = await gda.balanceOf(account.contract_address).call()
+    assert observed.result == (to_uint(2),)
+    assert await nonces.reserve(account) == 2
+
+
+def test_hash_multicall_cache():
+    """Repeated calls should hash the same as fresh ones"""
+    calls = [(0x1234, 0x5678, [1, 2, 3]), (0x1234, 0x5678, [1, 2, 3]), (0x99, 0x5678, [])]
+    first = hash_multicall(0x42, calls, 0, 0)
+    call_hashes = [
+        compute_hash_on_elements([to, selector, compute_hash_on_elements(calldata)])
+        for to, selector, calldata in calls]
+    assert first == compute_hash_on_elements([
+        str_to_felt("StarkNet Transaction"), 0x42, compute_hash_on_elements(call_hashes), 0, 0,
+        TRANSACTION_VERSION])
+    assert hash_multicall(0x42, calls, 0, 0) == first
+    assert hash_multicall(0x42, calls, 1, 0) != first
+    assert hash_multicall(0x42, calls[:1] + [(0x1234, 0x5678, [1, 2, 4])], 0, 0) != first
@@ -1,31 +1,45 @@
 """Utilities for testing Cairo contracts."""
 
-import math
-from starkware.cairo.common.hash_state import compute_hash_on_elements
-from starkware.crypto.signature.signature import private_to_stark_key, sign
+import copy
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import dill
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
 from starkware.starknet.public.abi import get_selector_from_name
 from starkware.starknet.compiler.compile import compile_starknet_files
 from starkware.starkware_utils.error_handling import StarkException
-from starkware.starknet.testing.starknet import StarknetContract
+from starkware.starknet.testing.starknet import Starknet, StarknetContract
+from starkware.starknet.testing.state import StarknetState
 from starkware.starknet.business_logic.transaction_execution_objects import Event
 
-
-MAX_UINT256 = (2**128 - 1, 2**128 - 1)
-ZERO_ADDRESS = 0
-TRUE = 1
-FALSE = 0
-
-TRANSACTION_VERSION = 0
-
-
-def str_to_felt(text):
-    b_text = bytes(text, "ascii")
-    return int.from_bytes(b_text, "big")
-
-
-def felt_to_str(felt):
-    b_felt = felt.to_bytes(31, "big")
-    return b_felt.decode()
+# the client helpers, re-exported for the tests
+from tests.client.felt import (  # noqa: F401
+    FALSE,
+    MAX_UINT256,
+    TRUE,
+    ZERO_ADDRESS,
+    add_uint,
+    div_rem_uint,
+    felt_to_str,
+    from_uint,
+    mul_uint,
+    str_to_felt,
+    sub_uint,
+    to_uint,
+    uint,
+)
+from tests.client.signer import Signer  # noqa: F401
+from tests.client.transactions import (  # noqa: F401
+    TRANSACTION_VERSION,
+    NonceManager,
+    TransactionBuilder,
+    from_call_to_call_array,
+    get_selector,
+    hash_multicall,
+)
 
 
 def assert_event_emitted(tx_exec_info, from_address, name, data):
@@ -36,53 +50,6 @@ def assert_event_emitted(tx_exec_info, from_address, name, data):
     ) in tx_exec_info.raw_events
 
 
-def uint(a):
-    return(a, 0)
-
-
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
-def from_uint(uint):
-    """Takes in uint256-ish tuple, returns value."""
-    return uint[0] + (uint[1] << 128)
-
-
-def add_uint(a, b):
-    """Returns the sum of two uint256-ish tuples."""
-    a = from_uint(a)
-    b = from_uint(b)
-    c = a + b
-    return to_uint(c)
-
-
-def sub_uint(a, b):
-    """Returns the difference of two uint256-ish tuples."""
-    a = from_uint(a)
-    b = from_uint(b)
-    c = a - b
-    return to_uint(c)
-
-
-def mul_uint(a, b):
-    """Returns the product of two uint256-ish tuples."""
-    a = from_uint(a)
-    b = from_uint(b)
-    c = a * b
-    return to_uint(c)
-
-
-def div_rem_uint(a, b):
-    """Returns the quotient and remainder of two uint256-ish tuples."""
-    a = from_uint(a)
-    b = from_uint(b)
-    c = math.trunc(a / b)
-    m = a % b
-    return (to_uint(c), to_uint(m))
-
-
 async def assert_revert(fun, reverted_with=None):
     try:
         await fun
@@ -101,101 +68,142 @@ def assert_event_emitted(tx_exec_info, from_address, name, data):
     ) in tx_exec_info.raw_events
 
 
-def get_contract_def(path):
-    """Returns the contract definition from the contract path"""
-    contract_def = compile_starknet_files(
+CONTRACT_CACHE_DIR = os.environ.get(
+    "CONTRACT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".contract_cache"),
+)
+
+_CAIRO_IMPORT = re.compile(r"^\s*from\s+([\w.]+)\s+import", re.MULTILINE)
+
+
+def _compile_contract(path):
+    return compile_starknet_files(
         files=[path],
         debug_info=True
     )
-    return contract_def
 
 
-def cached_contract(state, definition, deployed):
-    """Returns the cached contract"""
-    contract = StarknetContract(
-        state=state,
-        abi=definition.abi,
-        contract_address=deployed.contract_address,
-        deploy_execution_info=deployed.deploy_execution_info
-    )
-    return contract
+def contract_sources(path):
+    """Returns the contract path and every local file it transitively imports"""
+    seen = set()
+    pending = [path]
+    while pending:
+        current = os.path.normpath(pending.pop())
+        if current in seen:
+            continue
+        seen.add(current)
+        with open(current) as f:
+            source = f.read()
+        for module in _CAIRO_IMPORT.findall(source):
+            dependency = module.replace(".", os.sep) + ".cairo"
+            # starkware.* imports are pinned by the cairo-lang version
+            if os.path.exists(dependency):
+                pending.append(dependency)
+    return sorted(seen)
+
+
+def contract_hash(path):
+    """Returns a content hash of the contract, its imports and the compiler version"""
+    digest = hashlib.sha256(CAIRO_LANG_VERSION.encode())
+    for source in contract_sources(path):
+        digest.update(source.encode())
+        with open(source, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _cache_path(path):
+    return os.path.join(CONTRACT_CACHE_DIR, contract_hash(path) + ".pickle")
+
+
+def _load_cached(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            return dill.load(f)
+    except (OSError, EOFError, dill.UnpicklingError):
+        return None
 
 
-class Signer():
-    """
-    Utility for sending signed transactions to an Account on Starknet.
+def _store_cached(cache_path, contract_def):
+    os.makedirs(CONTRACT_CACHE_DIR, exist_ok=True)
+    # write then rename so concurrent workers never read a partial file
+    tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        dill.dump(contract_def, f)
+    os.replace(tmp_path, cache_path)
+
+
+# definitions already loaded by this process, keyed by cache path
+_contract_defs = {}
+
+
+def get_contract_def(path):
+    """Returns the contract definition from the contract path"""
+    cache_path = _cache_path(path)
+    contract_def = _contract_defs.get(cache_path) or _load_cached(cache_path)
+    if contract_def is None:
+        contract_def = _compile_contract(path)
+        _store_cached(cache_path, contract_def)
+    _contract_defs[cache_path] = contract_def
+    return contract_def
 
-    Parameters
-    ----------
 
-    private_key : int
+def get_contract_defs(paths, max_workers=None):
+    """Returns {path: contract definition}, compiling cache misses in parallel"""
+    cache_paths = {path: _cache_path(path) for path in paths}
+    contract_defs = {path: _load_cached(cache_paths[path]) for path in paths}
+    missing = [path for path, contract_def in contract_defs.items() if contract_def is None]
+    if len(missing) == 1:
+        contract_defs[missing[0]] = _compile_contract(missing[0])
+    elif missing:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for path, contract_def in zip(missing, executor.map(_compile_contract, missing)):
+                contract_defs[path] = contract_def
+    for path in missing:
+        _store_cached(cache_paths[path], contract_defs[path])
+    for path in paths:
+        _contract_defs[cache_paths[path]] = contract_defs[path]
+    return contract_defs
+
+
+class ForkableStarknetState(StarknetState):
+    """StarknetState whose copies share the immutable contract definitions.
+
+    Deep-copying the compiled programs dominates StarknetState.copy(), which
+    runs on every fork and every view `.call()`.
+    """
+
+    def copy(self):
+        memo = {
+            id(contract_def): contract_def
+            for contract_def in self.state.contract_definitions.values()
+        }
+        return copy.deepcopy(self, memo)
 
-    Examples
-    ---------
-    Constructing a Signer object
 
-    >>> signer = Signer(1234)
+async def empty_starknet():
+    """Returns an empty Starknet whose state can be forked cheaply"""
+    return Starknet(state=await ForkableStarknetState.empty())
 
-    Sending a transaction
 
-    >>> await signer.send_transaction(account,
-                                      account.contract_address,
-                                      'set_public_key',
-                                      [other.public_key]
-                                     )
+def fork(starknet, contracts):
+    """Returns a copy of starknet followed by contracts rebound to the copy
 
+    contracts is a list of (definition, deployed) pairs
     """
+    forked = Starknet(state=starknet.state.copy())
+    return (forked, *[
+        cached_contract(forked.state, definition, deployed)
+        for definition, deployed in contracts
+    ])
 
-    def __init__(self, private_key):
-        self.private_key = private_key
-        self.public_key = private_to_stark_key(private_key)
-
-    def sign(self, message_hash):
-        return sign(msg_hash=message_hash, priv_key=self.private_key)
-
-    async def send_transaction(self, account, to, selector_name, calldata, nonce=None, max_fee=0):
-        return await self.send_transactions(account, [(to, selector_name, calldata)], nonce, max_fee)
-
-    async def send_transactions(self, account, calls, nonce=None, max_fee=0):
-        if nonce is None:
-            execution_info = await account.get_nonce().call()
-            nonce, = execution_info.result
-
-        calls_with_selector = [
-            (call[0], get_selector_from_name(call[1]), call[2]) for call in calls]
-        (call_array, calldata) = from_call_to_call_array(calls)
-
-        message_hash = hash_multicall(
-            account.contract_address, calls_with_selector, nonce, max_fee)
-        sig_r, sig_s = self.sign(message_hash)
-
-        return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
-
-
-def from_call_to_call_array(calls):
-    call_array = []
-    calldata = []
-    for i, call in enumerate(calls):
-        assert len(call) == 3, "Invalid call parameters"
-        entry = (call[0], get_selector_from_name(
-            call[1]), len(calldata), len(call[2]))
-        call_array.append(entry)
-        calldata.extend(call[2])
-    return (call_array, calldata)
-
-
-def hash_multicall(sender, calls, nonce, max_fee):
-    hash_array = []
-    for call in calls:
-        call_elements = [call[0], call[1], compute_hash_on_elements(call[2])]
-        hash_array.append(compute_hash_on_elements(call_elements))
-
-    message = [
-        str_to_felt('StarkNet Transaction'),
-        sender,
-        compute_hash_on_elements(hash_array),
-        nonce,
-        max_fee,
-        TRANSACTION_VERSION
-    ]
-    return compute_hash_on_elements(message)
+
+def cached_contract(state, definition, deployed):
+    """Returns the cached contract"""
+    contract = StarknetContract(
+        state=state,
+        abi=definition.abi,
+        contract_address=deployed.contract_address,
+        deploy_execution_info=deployed.deploy_execution_info
+    )
+    return contract